@@ -0,0 +1,143 @@
+/*
+ * Callbacks run in the browser, without a round trip to the server (see figure_callback in visualization.py)
+ */
+(function () {
+    /*
+     * Figures drawn from the series of a chart (see bar_chart and sunburst_chart in visualization.py), exactly as
+     * plotly express draws them on the server
+     */
+    const charts = {
+        draw: function (chart, template) {
+            const figure = chart.chart === 'sunburst' ? charts.sunburst(chart) : charts.bar(chart, template);
+            figure.layout.template = template;
+            return figure;
+        },
+
+        bar: function (chart, template) {
+            const columns = chart.columns;
+            const layout = {
+                xaxis: {anchor: 'y', domain: [0.0, 1.0], title: {text: chart.x}},
+                yaxis: {anchor: 'x', domain: [0.0, 1.0], title: {text: chart.y}},
+                legend: {tracegroupgap: 0},
+                margin: {t: 60},
+                barmode: 'relative',
+            };
+            if (chart.categories !== null) {
+                layout.xaxis.categoryorder = 'array';
+                layout.xaxis.categoryarray = chart.categories;
+            }
+            const hovertemplate = chart.x + '=%{x}<br>' + chart.y + '=%{y}';
+            const colorway = template.layout.colorway;
+            if (chart.color === null) {
+                const trace = charts.barTrace(columns[chart.x], columns[chart.y], colorway[0]);
+                trace.hovertemplate = hovertemplate + '<extra></extra>';
+                return {data: [trace], layout: layout};
+            }
+            if (columns[chart.color].length === 0) {  // Without any value the color column is taken to be numbers
+                const trace = charts.barTrace([], [], []);
+                trace.hovertemplate = hovertemplate + '<br>' + chart.color + '=%{marker.color}<extra></extra>';
+                trace.marker.coloraxis = 'coloraxis';
+                layout.coloraxis = {colorbar: {title: {text: chart.color}}, colorscale: template.layout.colorscale.sequential};
+                return {data: [trace], layout: layout};
+            }
+
+            const traces = [];
+            const tracesByName = new Map();
+            columns[chart.color].forEach(function (value, row) {
+                const name = String(value);
+                let trace = tracesByName.get(name);
+                if (trace === undefined) {
+                    trace = charts.barTrace([], [], colorway[traces.length % colorway.length]);
+                    trace.hovertemplate = chart.color + '=' + name + '<br>' + hovertemplate + '<extra></extra>';
+                    trace.legendgroup = name;
+                    trace.name = name;
+                    trace.showlegend = true;
+                    tracesByName.set(name, trace);
+                    traces.push(trace);
+                }
+                trace.x.push(columns[chart.x][row]);
+                trace.y.push(columns[chart.y][row]);
+            });
+            layout.legend.title = {text: chart.color};
+            return {data: traces, layout: layout};
+        },
+
+        barTrace: function (x, y, color) {
+            return {
+                legendgroup: '',
+                marker: {color: color, pattern: {shape: ''}},
+                name: '',
+                orientation: 'v',
+                showlegend: false,
+                textposition: 'auto',
+                x: x,
+                xaxis: 'x',
+                y: y,
+                yaxis: 'y',
+                type: 'bar',
+            };
+        },
+
+        /*
+         * Every node of the tree of `path` columns with the total of its rows, leaves first and each level in order of
+         * first appearance
+         */
+        sunburst: function (chart) {
+            const columns = chart.columns;
+            const values = columns[chart.values];
+            const trace = {
+                branchvalues: 'total',
+                domain: {x: [0.0, 1.0], y: [0.0, 1.0]},
+                hovertemplate: 'labels=%{label}<br>' + chart.values + '=%{value}<br>parent=%{parent}<br>id=%{id}<extra></extra>',
+                ids: [],
+                labels: [],
+                name: '',
+                parents: [],
+                values: [],
+                type: 'sunburst',
+            };
+            for (let depth = chart.path.length; depth > 0; depth--) {
+                const nodesById = new Map();
+                values.forEach(function (value, row) {
+                    const names = chart.path.slice(0, depth).map(function (column) {
+                        return String(columns[column][row]);
+                    });
+                    const id = names.join('/');
+                    let node = nodesById.get(id);
+                    if (node === undefined) {
+                        node = trace.ids.length;
+                        nodesById.set(id, node);
+                        trace.ids.push(id);
+                        trace.labels.push(names[depth - 1]);
+                        trace.parents.push(names.slice(0, depth - 1).join('/'));
+                        trace.values.push(0);
+                    }
+                    trace.values[node] += value;
+                });
+            }
+            return {data: [trace], layout: {legend: {tracegroupgap: 0}, margin: {t: 60}}};
+        },
+    };
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        bundles: {
+            /*
+             * Outputs for the selected inputs, from the bundle of outputs by inputs the server sent for the whole tab,
+             * with their charts drawn. The arguments are the inputs, then the page's path, then the bundle.
+             */
+            select: function () {
+                const inputs = Array.prototype.slice.call(arguments, 0, arguments.length - 2);
+                const pathname = arguments[arguments.length - 2];
+                const bundle = arguments[arguments.length - 1];
+                const outputs = bundle && bundle.pathname === pathname ? bundle.outputs[JSON.stringify(inputs)] : undefined;
+                if (outputs === undefined) {  // Still waiting for the bundle of this page
+                    throw window.dash_clientside.PreventUpdate;
+                }
+                return outputs.map(function (output) {
+                    return output !== null && typeof output === 'object' && 'chart' in output ? charts.draw(output, bundle.template) : output;
+                });
+            },
+        },
+        charts: charts,
+    });
+})();
@@ -0,0 +1,281 @@
+"""
+Writes synthetic exports in the same layout and formats as the real ones, so the parsers can be measured without
+anybody's personal data. The same seed and number of records always give byte for byte the same files.
+
+    python3 -m benchmarks.generate --records 100000 --output /tmp/year-in-review
+
+writes `/tmp/year-in-review/data/...`; run the dashboard or the benchmarks from `/tmp/year-in-review`.
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List
+
+DEFAULT_SEED = 2020
+DEFAULT_START_YEAR = 2016
+DEFAULT_END_YEAR = 2020
+SPOTIFY_RECORDS_PER_FILE = 10000  # Spotify splits streaming history into files of about this many streams
+CHUNK_SIZE = 10000
+
+# Relative activity for each hour of the day, busiest in the evening
+HOURLY_ACTIVITY = [3, 2, 1, 1, 1, 1, 2, 4, 5, 5, 5, 6, 7, 6, 6, 6, 7, 8, 9, 10, 10, 9, 7, 5]
+SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'ne', 'so', 'ti', 'va', 'zu', 'an', 'el', 'or', 'ys', 'be', 'da', 'fi', 'go', 'hu']
+NETFLIX_PROFILES = ['Alex', 'Sam', 'Kids', 'Guest']
+NETFLIX_PROFILE_WEIGHTS = [6, 3, 2, 1]
+NETFLIX_DEVICES = ['Apple iPhone', 'Chrome PC (Cadmium)', 'Samsung 2018 TV', 'Sony PS4', 'Roku 4K Stick']
+NETFLIX_SUPPLEMENTAL_VIDEO_TYPES = ['TRAILER', 'HOOK', 'TEASER_TRAILER', 'RECAP']
+NETFLIX_COLUMNS = [
+    'Profile Name', 'Start Time', 'Duration', 'Attributes', 'Title', 'Supplemental Video Type', 'Device Type',
+    'Bookmark', 'Latest Bookmark', 'Country',
+]
+
+
+def get_name(rng: random.Random, min_words: int = 1, max_words: int = 3) -> str:
+    words = [
+        ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4))).capitalize()
+        for _ in range(rng.randint(min_words, max_words))
+    ]
+    return ' '.join(words)
+
+
+def get_zipf_weights(n: int, exponent: float = 1.1) -> List[float]:
+    """
+    Cumulative weights where item i is picked about 1 / (i + 1)^exponent as often as the first one, the way a few
+    favourite artists or shows make up most of anyone's history
+    """
+    cumulative_weights = []
+    total = 0.0
+    for i in range(n):
+        total += 1 / (i + 1) ** exponent
+        cumulative_weights.append(total)
+    return cumulative_weights
+
+
+def iter_timestamps(rng: random.Random, n: int, start_year: int, end_year: int) -> Iterator[int]:
+    """
+    `n` UTC epoch seconds in increasing order, spread over the years and weighted towards busy hours of the day
+    """
+    start = int(datetime(start_year, 1, 1, tzinfo=timezone.utc).timestamp())
+    end = int(datetime(end_year + 1, 1, 1, tzinfo=timezone.utc).timestamp())
+    max_activity = max(HOURLY_ACTIVITY)
+    num_chunks = max(1, -(-n // CHUNK_SIZE))
+    for chunk in range(num_chunks):
+        size = min(CHUNK_SIZE, n - chunk * CHUNK_SIZE)
+        chunk_start = start + (end - start) * chunk // num_chunks
+        chunk_end = start + (end - start) * (chunk + 1) // num_chunks
+        timestamps = []
+        while len(timestamps) < size:
+            timestamp = rng.randrange(chunk_start, chunk_end)
+            if rng.random() * max_activity < HOURLY_ACTIVITY[timestamp // 3600 % 24]:
+                timestamps.append(timestamp)
+        timestamps.sort()
+        yield from timestamps
+
+
+def format_timestamp(timestamp: int, layout: str) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime(layout)
+
+
+def write_json_array(path: str, items: Iterable[Any]) -> None:
+    """
+    Writes items one at a time so exports of millions of records never have to be held in memory
+    """
+    with open(path, 'w') as file:
+        file.write('[')
+        for i, item in enumerate(items):
+            file.write(',\n  ' if i else '\n  ')
+            file.write(json.dumps(item))
+        file.write('\n]')
+
+
+def make_directory(root: str, relative_path: str) -> str:
+    path = os.path.join(root, relative_path)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def write_spotify(root: str, n: int, rng: random.Random, start_year: int, end_year: int) -> None:
+    directory = make_directory(root, 'data/spotify/MyData')
+    num_artists = max(10, int(n ** 0.6))
+    artists = [get_name(rng) for _ in range(num_artists)]
+    titles = [get_name(rng, max_words=4) for _ in range(max(20, num_artists * 4))]  # Shared so some songs have the same name
+    tracks_by_artist = [rng.sample(titles, rng.randint(1, 20)) for _ in range(num_artists)]
+    artist_weights = get_zipf_weights(num_artists)
+
+    def iter_streams(timestamps: Iterator[int], size: int) -> Iterator[Dict[str, Any]]:
+        for _ in range(size):
+            artist = rng.choices(range(num_artists), cum_weights=artist_weights)[0]
+            tracks = tracks_by_artist[artist]
+            skipped = rng.random() < 0.2
+            yield {
+                'endTime': format_timestamp(next(timestamps), '%Y-%m-%d %H:%M'),
+                'artistName': artists[artist],
+                'trackName': tracks[min(int(rng.expovariate(0.3)), len(tracks) - 1)],
+                'msPlayed': rng.randint(0, 10000) if skipped else rng.randint(90000, 330000),
+            }
+
+    for filename in os.listdir(directory):
+        if filename.startswith('StreamingHistory'):
+            os.remove(os.path.join(directory, filename))  # Left over from a bigger run
+    timestamps = iter_timestamps(rng, n, start_year, end_year)
+    for i in range(-(-n // SPOTIFY_RECORDS_PER_FILE)):
+        size = min(SPOTIFY_RECORDS_PER_FILE, n - i * SPOTIFY_RECORDS_PER_FILE)
+        write_json_array(os.path.join(directory, 'StreamingHistory{0}.json'.format(i)), iter_streams(timestamps, size))
+
+
+def write_netflix(root: str, n: int, rng: random.Random, start_year: int, end_year: int) -> None:
+    directory = make_directory(root, 'data/netflix/netflix-report/Content_Interaction')
+    shows = [(get_name(rng), rng.randint(1, 6)) for _ in range(max(5, int(n ** 0.5)))]
+    movies = [get_name(rng, max_words=4) for _ in range(max(5, int(n ** 0.5)))]
+    show_weights = get_zipf_weights(len(shows))
+
+    with open(os.path.join(directory, 'ViewingActivity.csv'), 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(NETFLIX_COLUMNS)
+        for timestamp in iter_timestamps(rng, n, start_year, end_year):
+            if rng.random() < 0.75:
+                show, num_seasons = shows[rng.choices(range(len(shows)), cum_weights=show_weights)[0]]
+                title = '{0}: Season {1}: {2} (Episode {3})'.format(show, rng.randint(1, num_seasons), get_name(rng), rng.randint(1, 12))
+                duration = rng.randint(0, 3600)
+            else:
+                title = rng.choice(movies)
+                duration = rng.randint(0, 9000)
+            supplemental_video_type = rng.choice(NETFLIX_SUPPLEMENTAL_VIDEO_TYPES) if rng.random() < 0.05 else ''
+            writer.writerow([
+                rng.choices(NETFLIX_PROFILES, weights=NETFLIX_PROFILE_WEIGHTS)[0],
+                format_timestamp(timestamp, '%Y-%m-%d %H:%M:%S'),
+                '{0:02d}:{1:02d}:{2:02d}'.format(duration // 3600, duration // 60 % 60, duration % 60),
+                '',
+                title,
+                supplemental_video_type,
+                rng.choice(NETFLIX_DEVICES),
+                '00:00:00',
+                'Not latest view',
+                'US (United States)',
+            ])
+
+
+def write_youtube(root: str, n: int, rng: random.Random, start_year: int, end_year: int) -> None:
+    directory = make_directory(root, 'data/google/Takeout/YouTube and YouTube Music/history')
+    channels = [get_name(rng) for _ in range(max(10, int(n ** 0.6)))]
+    channel_weights = get_zipf_weights(len(channels))
+
+    def iter_views() -> Iterator[Dict[str, Any]]:
+        for timestamp in iter_timestamps(rng, n, start_year, end_year):
+            view: Dict[str, Any] = {
+                'header': 'YouTube',
+                'title': 'Watched {0}'.format(get_name(rng, max_words=6)),
+            }
+            if rng.random() > 0.03:  # Removed videos have no link or channel
+                view['titleUrl'] = 'https://www.youtube.com/watch?v={0:011x}'.format(rng.getrandbits(44))
+                if rng.random() > 0.02:
+                    channel = rng.choices(range(len(channels)), cum_weights=channel_weights)[0]
+                    view['subtitles'] = [{'name': channels[channel], 'url': 'https://www.youtube.com/channel/UC{0:022x}'.format(channel)}]
+            view['time'] = format_timestamp(timestamp, '%Y-%m-%dT%H:%M:%S.') + '{0:03d}Z'.format(rng.randint(0, 999))
+            view['products'] = ['YouTube']
+            yield view
+
+    write_json_array(os.path.join(directory, 'watch-history.json'), iter_views())
+
+
+def write_hinge(root: str, n: int, rng: random.Random, start_year: int, end_year: int) -> None:
+    directory = make_directory(root, 'data/hinge/export')
+
+    def iter_matches() -> Iterator[Dict[str, Any]]:
+        for timestamp in iter_timestamps(rng, n, start_year, end_year):
+            match: Dict[str, Any] = {}
+            liked = rng.random() < 0.5
+            match_made = rng.random() < (0.3 if liked else 0.5)
+            if liked:
+                match['like'] = [{'timestamp': format_timestamp(timestamp, '%Y-%m-%d %H:%M:%S'), 'like': [{'timestamp': format_timestamp(timestamp, '%Y-%m-%d %H:%M:%S')}]}]
+            if match_made:
+                match['match'] = [{'timestamp': format_timestamp(timestamp + rng.randint(0, 86400), '%Y-%m-%d %H:%M:%S')}]
+            if not match_made or rng.random() < 0.3:
+                match['block'] = [{'block_type': 'remove', 'timestamp': format_timestamp(timestamp + rng.randint(0, 86400), '%Y-%m-%d %H:%M:%S')}]
+            if match_made and rng.random() < 0.7:
+                chat_timestamp = timestamp
+                chats = []
+                for _ in range(1 + int(rng.expovariate(1 / 8))):
+                    chat_timestamp += int(rng.expovariate(1 / 7200))
+                    chats.append({'body': get_name(rng, max_words=12).lower(), 'timestamp': format_timestamp(chat_timestamp, '%Y-%m-%d %H:%M:%S')})
+                match['chats'] = chats
+            yield match
+
+    write_json_array(os.path.join(directory, 'matches.json'), iter_matches())
+
+
+def write_instagram(root: str, n: int, rng: random.Random, start_year: int, end_year: int) -> None:
+    directory = make_directory(root, 'data/instagram')
+    users = ['{0}_{1}'.format(get_name(rng, max_words=1).lower(), i) for i in range(max(10, int(n ** 0.7)))]
+    user_weights = get_zipf_weights(len(users), exponent=0.8)
+    layout = '%Y-%m-%dT%H:%M:%S+00:00'
+
+    connections = {
+        kind: {
+            '{0}_{1}'.format(kind, i): format_timestamp(timestamp, layout)
+            for i, timestamp in enumerate(iter_timestamps(rng, size, start_year, end_year))
+        }
+        for kind, size in [('followers', n // 2), ('following', n - n // 2)]
+    }
+    with open(os.path.join(directory, 'connections.json'), 'w') as file:
+        json.dump(connections, file, indent=2)
+
+    with open(os.path.join(directory, 'likes.json'), 'w') as file:
+        file.write('{\n"media_likes": [')
+        for i, timestamp in enumerate(iter_timestamps(rng, n, start_year, end_year)):
+            user = users[rng.choices(range(len(users)), cum_weights=user_weights)[0]]
+            file.write(',\n  ' if i else '\n  ')
+            file.write(json.dumps([format_timestamp(timestamp, layout), user]))
+        file.write('\n],\n"comment_likes": []\n}')
+
+
+WRITERS: Dict[str, Callable[[str, int, random.Random, int, int], None]] = {
+    'spotify': write_spotify,
+    'netflix': write_netflix,
+    'youtube': write_youtube,
+    'hinge': write_hinge,
+    'instagram': write_instagram,
+}
+
+
+def generate(
+    root: str,
+    records: int,
+    seed: int = DEFAULT_SEED,
+    start_year: int = DEFAULT_START_YEAR,
+    end_year: int = DEFAULT_END_YEAR,
+    sources: Iterable[str] = tuple(WRITERS),
+) -> None:
+    """
+    Writes `records` records for every source under `root`/data: streams, views, matches, and Instagram likes as well
+    as followers and following (half each). Each source has its own random generator, so generating one source never
+    changes another.
+    """
+    for source in sources:
+        rng = random.Random('{0}-{1}'.format(seed, source))
+        WRITERS[source](root, records, rng, start_year, end_year)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Write synthetic exports for every source')
+    parser.add_argument('--records', type=int, default=10000, help='Records per source, from 1000 to 10000000')
+    parser.add_argument('--output', default='.', help='Directory to write data/ into')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--start-year', type=int, default=DEFAULT_START_YEAR)
+    parser.add_argument('--end-year', type=int, default=DEFAULT_END_YEAR)
+    parser.add_argument('--sources', nargs='+', choices=list(WRITERS), default=list(WRITERS))
+    args = parser.parse_args()
+
+    for source in args.sources:
+        start = time.time()
+        generate(root=args.output, records=args.records, seed=args.seed, start_year=args.start_year, end_year=args.end_year, sources=[source])
+        print('{0}: {1} records written in {2} seconds'.format(source, args.records, round(time.time() - start, 2)))
+
+
+if __name__ == '__main__':
+    main()
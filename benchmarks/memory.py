@@ -0,0 +1,116 @@
+"""
+Bytes taken up by each record model, compared with the plain dataclass the same record was held in before (which keeps
+a __dict__ per instance, a timezone-aware datetime instead of an epoch timestamp, and its own copy of every name
+instead of an id in the symbol table). The values each record holds on to are counted with it, so a timestamp costs
+what its integer or datetime does, and a name costs its own copy unless the model keeps its id instead.
+
+    python3 -m benchmarks.memory --records 100000
+"""
+
+import argparse
+import sys
+import tracemalloc
+from dataclasses import fields, make_dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+from models.spotify.stream import Stream
+from models.netflix.view import View as NetflixView
+from models.youtube.view import View as YoutubeView
+from models.hinge.chat import Chat
+from models.hinge.match import Match
+from models.instagram.like import Like
+from models.instagram.connection import Connection
+
+MODELS: Dict[str, Type] = {
+    'spotify.Stream': Stream,
+    'netflix.View': NetflixView,
+    'youtube.View': YoutubeView,
+    'hinge.Chat': Chat,
+    'hinge.Match': Match,
+    'instagram.Like': Like,
+    'instagram.Connection': Connection,
+}
+ORIGINAL_FIELDS: Dict[str, List[Tuple[str, Any]]] = {  # Fields of each model before timestamps and symbols
+    'spotify.Stream': [('end_time', datetime), ('artist_name', str), ('track_name', str), ('duration_milliseconds', int)],
+    'netflix.View': [
+        ('profile', str),
+        ('start_time', datetime),
+        ('duration_seconds', int),
+        ('title', str),
+        ('device', str),
+        ('supplemental_video_type', Optional[str]),
+    ],
+    'youtube.View': [('title', str), ('url', Optional[str]), ('date', datetime), ('channel_name', Optional[str])],
+    'hinge.Chat': [('body', str), ('date', datetime)],
+    'hinge.Match': [('liked', bool), ('blocked', bool), ('match_made', bool), ('date', datetime), ('chats', List[Chat])],
+    'instagram.Like': [('name', str), ('date', datetime)],
+    'instagram.Connection': [('name', str), ('date', datetime)],
+}
+FIRST_TIMESTAMP = 1577836800
+SYMBOLS = 100  # Different names, such as artists or channels, in an export
+LOCAL_TIMEZONE = datetime.now(timezone.utc).astimezone().tzinfo
+
+
+def get_original(name: str) -> Type:
+    return make_dataclass(name.split('.')[-1], ORIGINAL_FIELDS[name])
+
+
+def get_values(model: Type, n: int) -> List[Dict[str, Any]]:
+    """
+    Realistic values for every field: a distinct integer or datetime per record for timestamps and durations, a copy
+    of a string per record (as decoding an export makes one), a new list per record, and symbol ids and flags shared
+    between records
+    """
+    values = []
+    for i in range(n):
+        record = {}
+        for field in fields(model):
+            if field.name.endswith('_id'):
+                record[field.name] = i % SYMBOLS
+            elif field.type is int:
+                record[field.name] = FIRST_TIMESTAMP + i
+            elif field.type is datetime:
+                record[field.name] = datetime.fromtimestamp(FIRST_TIMESTAMP + i, tz=LOCAL_TIMEZONE)
+            elif field.type is bool:
+                record[field.name] = i % 2 == 0
+            elif getattr(field.type, '__origin__', None) is list:
+                record[field.name] = []
+            else:
+                record[field.name] = 'Value {0}'.format(i % SYMBOLS)
+        values.append(record)
+    return values
+
+
+def measure_bytes_per_record(model: Type, n: int) -> float:
+    """
+    Memory still taken up once `n` records are created and the values they were created from are dropped, so what
+    each record holds on to is counted but not the dictionaries it was built from
+    """
+    tracemalloc.start()
+    values = get_values(model, n)
+    records = [model(**record) for record in values]
+    del values
+    size_bytes = tracemalloc.get_traced_memory()[0] - sys.getsizeof(records)
+    tracemalloc.stop()
+    return size_bytes / len(records)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Measure the memory taken up by each record model')
+    parser.add_argument('--records', type=int, default=100000)
+    args = parser.parse_args()
+
+    print('{0:<22} {1:>18} {2:>18} {3:>8}'.format('Model', 'Original', 'Current', 'Saved'))
+    for name, model in MODELS.items():
+        before = measure_bytes_per_record(get_original(name), args.records)
+        after = measure_bytes_per_record(model, args.records)
+        print('{0:<22} {1:>9.0f} B/record {2:>9.0f} B/record {3:>7.0f}%'.format(
+            name,
+            before,
+            after,
+            100 * (1 - after / before),
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+"""
+Measures how the parsers scale with the size of an export. For every size, synthetic exports are generated (once,
+then reused) and every source goes through the same phases:
+
+- parse: decode the raw export and write its snapshot
+- open: read the snapshot back
+- models: create the model objects from the snapshot
+- years: split the records by year and build the yearly aggregates
+- every public get_* method of the parser, on a new parser instance for the selected year
+
+Each phase is timed on its own and, unless --no-memory is passed, run again under tracemalloc to find its peak memory.
+Memory used by worker processes is not included.
+
+    python3 -m benchmarks.run --records 1000 100000 1000000
+"""
+
+import argparse
+import glob
+import inspect
+import json
+import os
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Type
+from benchmarks.generate import generate
+from models.timestamps import set_timezone
+from parsers import Parser
+from parsers.cache import dataset_cache
+from parsers.youtube.views_parser import ViewsParser as YoutubeViewsParser
+from parsers.netflix.views_parser import ViewsParser as NetflixViewsParser
+from parsers.hinge.matches_parser import MatchesParser as HingeMatchesParser
+from parsers.instagram.connections_parser import ConnectionsParser as InstagramConnectionsParser
+from parsers.instagram.likes_parser import LikesParser as InstagramLikesParser
+from parsers.spotify.streaming_history_parser import StreamingHistoryParser, ColumnarStreamingHistoryParser
+
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'output')
+DEFAULT_YEAR = 2020
+LOAD_PHASES = ('parse', 'open', 'models', 'years')  # Throughput is reported in records of the export per second
+
+
+@dataclass
+class Source:
+    parser_class: Type[Parser]
+    load: Callable[[Any], Any]  # Creates the models of a parser
+
+
+@dataclass
+class Result:
+    records: int
+    source: str
+    phase: str
+    seconds: float
+    records_per_second: Optional[float]
+    peak_bytes: Optional[int]
+
+
+SOURCES: Dict[str, Source] = {
+    'spotify': Source(
+        parser_class=StreamingHistoryParser,
+        load=lambda parser: parser.load_streams(),
+    ),
+    'spotify-columnar': Source(
+        parser_class=ColumnarStreamingHistoryParser,
+        load=lambda parser: parser.stream_columns,
+    ),
+    'netflix': Source(
+        parser_class=NetflixViewsParser,
+        load=lambda parser: parser.load_cached('views', parser.load_views),
+    ),
+    'youtube': Source(
+        parser_class=YoutubeViewsParser,
+        load=lambda parser: parser.load_cached('views', parser.load_views),
+    ),
+    'hinge': Source(
+        parser_class=HingeMatchesParser,
+        load=lambda parser: parser.load_cached('matches', parser.load_matches),
+    ),
+    'instagram-connections': Source(
+        parser_class=InstagramConnectionsParser,
+        load=lambda parser: [
+            *parser.load_cached('followers', lambda: parser.load_connections(kind='followers')),
+            *parser.load_cached('following', lambda: parser.load_connections(kind='following')),
+        ],
+    ),
+    'instagram-likes': Source(
+        parser_class=InstagramLikesParser,
+        load=lambda parser: parser.load_cached('likes', parser.load_likes),
+    ),
+}
+
+
+def get_public_methods(parser_class: Type[Parser]) -> List[str]:
+    """
+    get_* methods that can be called without arguments
+    """
+    names = []
+    for name, function in inspect.getmembers(parser_class, inspect.isfunction):
+        parameters = list(inspect.signature(function).parameters.values())[1:]
+        if name.startswith('get_') and all(parameter.default is not parameter.empty for parameter in parameters):
+            names.append(name)
+    return names
+
+
+def delete_snapshots(parser: Parser) -> None:
+    for path in glob.glob(os.path.join(glob.escape(parser.directory_path), '.*.snapshot')):
+        os.remove(path)
+
+
+def measure(run: Callable[[], Any], prepare: Callable[[], None], memory: bool) -> Dict[str, Any]:
+    prepare()
+    start = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - start
+
+    peak_bytes = None
+    if memory:
+        prepare()
+        tracemalloc.start()
+        run()
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {'seconds': seconds, 'peak_bytes': peak_bytes}
+
+
+def benchmark_source(name: str, source: Source, records: int, year: int, memory: bool) -> List[Result]:
+    parser_class = source.parser_class
+
+    def reset() -> None:
+        dataset_cache.clear()
+
+    def reset_snapshot() -> None:
+        reset()
+        delete_snapshots(parser_class())
+
+    def open_snapshot() -> None:
+        reset()
+        parser_class().snapshot
+
+    def load_models() -> None:
+        open_snapshot()
+        source.load(parser_class())
+
+    phases: List[Any] = [
+        ('parse', lambda: parser_class().snapshot, reset_snapshot),
+        ('open', lambda: parser_class().snapshot, reset),
+        ('models', lambda: source.load(parser_class()), open_snapshot),
+        ('years', lambda: parser_class().years, load_models),
+    ]
+    for method in get_public_methods(parser_class):
+        phases.append((method, lambda method=method: getattr(parser_class(year=year), method)(), lambda: None))
+
+    results = []
+    for phase, run, prepare in phases:
+        try:
+            measurement = measure(run=run, prepare=prepare, memory=memory)
+        except Exception as exception:
+            print('{0} {1}: failed with {2!r}'.format(name, phase, exception))
+            continue
+        seconds = measurement['seconds']
+        results.append(Result(
+            records=records,
+            source=name,
+            phase=phase,
+            seconds=seconds,
+            records_per_second=records / seconds if phase in LOAD_PHASES and seconds > 0 else None,
+            peak_bytes=measurement['peak_bytes'],
+        ))
+    return results
+
+
+def print_result(result: Result) -> None:
+    print('{0:>10}  {1:<22} {2:<46} {3:>10.4f} s {4:>14} {5:>10}'.format(
+        result.records,
+        result.source,
+        result.phase,
+        result.seconds,
+        '{0:,.0f}/s'.format(result.records_per_second) if result.records_per_second else '',
+        '{0:.1f} MB'.format(result.peak_bytes / 1024 / 1024) if result.peak_bytes is not None else '',
+    ))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark every parser on synthetic exports')
+    parser.add_argument('--records', type=int, nargs='+', default=[1000, 10000, 100000], help='Records per source')
+    parser.add_argument('--sources', nargs='+', choices=list(SOURCES), default=list(SOURCES))
+    parser.add_argument('--root', default=DEFAULT_ROOT, help='Where generated exports are kept between runs')
+    parser.add_argument('--year', type=int, default=DEFAULT_YEAR, help='Year passed to the parsers for every method')
+    parser.add_argument('--timezone', default='UTC', help='Display timezone, so results do not depend on the machine')
+    parser.add_argument('--no-memory', action='store_true', help='Skip measuring peak memory, which runs every phase twice')
+    parser.add_argument('--output', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    set_timezone(args.timezone)
+    working_directory = os.getcwd()
+    results: List[Result] = []
+    try:
+        for records in args.records:
+            root = os.path.join(os.path.abspath(args.root), str(records))
+            if not os.path.isdir(os.path.join(root, 'data')):
+                print('Generating {0} records per source in {1}'.format(records, root))
+                generate(root=root, records=records)
+            os.chdir(root)  # Parsers read from data/ in the working directory
+            for name in args.sources:
+                for result in benchmark_source(name=name, source=SOURCES[name], records=records, year=args.year, memory=not args.no_memory):
+                    print_result(result)
+                    results.append(result)
+            os.chdir(working_directory)
+    finally:
+        os.chdir(working_directory)
+        dataset_cache.clear()
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump([asdict(result) for result in results], file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,15 @@
+import dash
+import dash_core_components as dcc
+import dash_html_components as html
+from typing import List, Optional
+
+
+def dropdown(id: str, placeholder: Optional[str], options: List[str]):
+    return html.Div(className='input-wrapper', children=[
+        dcc.Dropdown(
+            id=id,
+            className='dropdown',
+            options=[{'label': option, 'value': option} for option in options],
+            placeholder=placeholder,
+        ),
+    ])
@@ -0,0 +1,42 @@
+"""
+Writes a binary snapshot of every export found under data/, so the dashboard never has to decode the raw files.
+Parsers rebuild their snapshot on their own when the export changes, running this ahead of time just avoids paying
+for it on the first page load.
+"""
+
+import argparse
+import time
+from typing import Optional
+from parsers.youtube.views_parser import ViewsParser as YoutubeViewsParser
+from parsers.netflix.views_parser import ViewsParser as NetflixViewsParser
+from parsers.hinge.matches_parser import MatchesParser as HingeMatchesParser
+from parsers.instagram.connections_parser import ConnectionsParser as InstagramConnectionsParser
+from parsers.instagram.likes_parser import LikesParser as InstagramLikesParser
+from parsers.spotify.streaming_history_parser import StreamingHistoryParser as SpotifyStreamingHistoryParser
+
+PARSERS = {
+    'YouTube': YoutubeViewsParser,
+    'Netflix': NetflixViewsParser,
+    'Hinge': HingeMatchesParser,
+    'Instagram connections': InstagramConnectionsParser,
+    'Instagram likes': InstagramLikesParser,
+    'Spotify': SpotifyStreamingHistoryParser,
+}
+
+
+def ingest(data_root: Optional[str] = None) -> None:
+    for name, parser_class in PARSERS.items():
+        start = time.time()
+        try:
+            parser_class(data_root=data_root).snapshot
+        except FileNotFoundError:
+            print('{0}: no export found, skipping'.format(name))
+            continue
+        print('{0}: snapshot ready in {1} seconds'.format(name, round(time.time() - start, 2)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the snapshot of every export')
+    parser.add_argument('--data-root', help='Directory holding the data/ folder, the working directory by default')
+    args = parser.parse_args()
+    ingest(data_root=args.data_root)
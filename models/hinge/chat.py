@@ -1,20 +1,24 @@
-import pytz
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Dict, Any
-from models import utc_timestamp_to_datetime
+from models.timestamps import parse_timestamp, to_datetime
 
 
 @dataclass
 class Chat:
+    __slots__ = ('body', 'timestamp')
     body: str
-    date: datetime
+    timestamp: int  # UTC epoch seconds
+
+    @property
+    def date(self) -> datetime:
+        return to_datetime(self.timestamp)
 
     @staticmethod
     def from_json(data: Dict[str, Any]) -> 'Chat':
         return Chat(
             body=data["body"],
-            date=utc_timestamp_to_datetime(timestamp=data["timestamp"]),
+            timestamp=parse_timestamp(data["timestamp"]),
         )
 
     def __str__(self) -> str:
@@ -1,19 +1,19 @@
-import pytz
 from dataclasses import dataclass
 from datetime import datetime
 from statistics import median
 from cached_property import cached_property
 from typing import Dict, Any, List, Optional
 from models.hinge.chat import Chat
-from models import utc_timestamp_to_datetime
+from models.timestamps import parse_timestamp, to_datetime
 
 
 @dataclass
 class Match:
+    __slots__ = ('liked', 'blocked', 'match_made', 'timestamp', 'chats')
     liked: bool
     blocked: bool
     match_made: bool
-    date: datetime
+    timestamp: int  # UTC epoch seconds
     chats: List[Chat]
 
     @staticmethod
@@ -35,10 +35,14 @@ class Match:
             liked=liked,
             blocked=blocked,
             match_made=match_made,
-            date=utc_timestamp_to_datetime(timestamp=timestamp),
+            timestamp=parse_timestamp(timestamp),
             chats=[Chat.from_json(data=chat_data) for chat_data in data.get('chats', [])],
         )
 
+    @property
+    def date(self) -> datetime:
+        return to_datetime(self.timestamp)
+
     @property
     def like_accepted(self) -> bool:
         """
@@ -89,8 +93,7 @@ class Match:
 
         first_chat = self.chats[0]
         last_chat = self.chats[-1]
-        difference = last_chat.date - first_chat.date
-        return difference.total_seconds()
+        return last_chat.timestamp - first_chat.timestamp
 
     def get_frequency_by_hour(self) -> List[int]:
         frequency = [0]*24
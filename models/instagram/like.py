@@ -2,14 +2,20 @@ from dataclasses import dataclass
 from datetime import datetime
 from dataclasses import dataclass
 from cached_property import cached_property
-from models import utc_timestamp_to_datetime
+from typing import Union
+from models.timestamps import parse_timestamp, to_datetime
 
 
 @dataclass
 class Like:
+    __slots__ = ('name', 'timestamp')
     name: str
-    date: datetime
+    timestamp: int  # UTC epoch seconds
 
-    def __init__(self, name: str, timestamp: str) -> None:
+    def __init__(self, name: str, timestamp: Union[str, int]) -> None:
         self.name = name
-        self.date = utc_timestamp_to_datetime(timestamp=timestamp)
+        self.timestamp = parse_timestamp(timestamp) if isinstance(timestamp, str) else timestamp
+
+    @property
+    def date(self) -> datetime:
+        return to_datetime(self.timestamp)
@@ -1,14 +1,17 @@
 from dataclasses import dataclass
-from typing import List
+from typing import List, Optional
 from models.netflix.view import View
 
 @dataclass
 class Show:
     title: str
     views: List[View]
+    view_duration_seconds: Optional[int] = None  # Precomputed when grouping views
 
     @property
     def duration_seconds(self) -> int:
+        if self.view_duration_seconds is not None:
+            return self.view_duration_seconds
         return sum([view.duration_seconds for view in self.views])
 
     @property
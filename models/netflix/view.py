@@ -1,35 +1,64 @@
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Dict, Any, List, Optional
-from models import utc_timestamp_to_datetime
+from models.symbols import symbols
+from models.timestamps import parse_timestamp, to_datetime
+
+DEFAULT_SHOW_TITLE = 'Other (i.e. Movie)'
 
 
 @dataclass
 class View:
-    profile: str
-    start_time: datetime
+    __slots__ = ('profile_id', 'start_timestamp', 'duration_seconds', 'title', 'show_id', 'device_id', 'supplemental_video_type')
+    profile_id: int  # Ids in the shared symbol table
+    start_timestamp: int  # UTC epoch seconds
     duration_seconds: int
-    title: str
-    device: str
+    title: str  # Mostly unique per episode, so only the show it belongs to goes in the symbol table
+    show_id: int
+    device_id: int
     supplemental_video_type: Optional[str]
 
+    @property
+    def profile(self) -> str:
+        return symbols[self.profile_id]
+
+    @property
+    def device(self) -> str:
+        return symbols[self.device_id]
+
+    @property
+    def start_time(self) -> datetime:
+        return to_datetime(self.start_timestamp)
+
     @property
     def show_title(self) -> Optional[str]:
-        colon_index = self.title.find(':')
-        if colon_index > 0:
-            return self.title[:colon_index]
+        return get_show_title(self.title)
 
     @staticmethod
     def from_csv(columns: Dict[str, int], data: List[str]) -> 'View':
-        start_time = utc_timestamp_to_datetime(timestamp=data[columns['Start Time']])
         h, m, s = data[columns['Duration']].split(':')
         duration_seconds = int(h) * 3600 + int(m) * 60 + int(s)
+        title = data[columns['Title']]
 
         return View(
-            profile=data[columns['Profile Name']],
-            title=data[columns['Title']],
-            device=data[columns['Device Type']],
+            profile_id=symbols.get_id(data[columns['Profile Name']]),
+            title=title,
+            show_id=get_show_id(title),
+            device_id=symbols.get_id(data[columns['Device Type']]),
             supplemental_video_type=data[columns['Supplemental Video Type']] or None,
-            start_time=start_time,
+            start_timestamp=parse_timestamp(data[columns['Start Time']]),
             duration_seconds=duration_seconds,
         )
+
+
+def get_show_title(title: str) -> Optional[str]:
+    colon_index = title.find(':')
+    if colon_index > 0:
+        return title[:colon_index]
+
+
+def get_show_id(title: str) -> int:
+    """
+    Symbol id of the show a title belongs to, with titles that aren't episodes (such as movies) grouped together
+    """
+    return symbols.get_id(get_show_title(title) or DEFAULT_SHOW_TITLE)
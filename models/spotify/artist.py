@@ -1,18 +1,21 @@
 from cached_property import cached_property
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Sequence
 from models.spotify.stream import Stream
 
 
 @dataclass
 class Artist:
     name: str
-    streams: List[Stream]
+    streams: Sequence[Stream]
+    streamed_duration_milliseconds: Optional[int] = None  # Optional, filled in by parsers that already know the total
 
     @cached_property
     def streamed_duration_seconds(self) -> int:
-        milliseconds = sum([stream.duration_milliseconds for stream in self.streams])
+        milliseconds = self.streamed_duration_milliseconds
+        if milliseconds is None:
+            milliseconds = sum([stream.duration_milliseconds for stream in self.streams])
         return int(round(milliseconds / 1000, 0))
 
     def __str__(self) -> str:
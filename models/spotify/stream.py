@@ -1,25 +1,39 @@
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Dict, Any, List, Optional
-from models import utc_timestamp_to_datetime
+from models.symbols import symbols
+from models.timestamps import parse_timestamp, to_datetime
 
 
 @dataclass
 class Stream:
-    end_time: datetime
-    artist_name: str
-    track_name: str
+    __slots__ = ('end_timestamp', 'artist_id', 'track_id', 'duration_milliseconds')  # No __dict__ per stream, histories can have millions of them
+    end_timestamp: int  # UTC epoch seconds
+    artist_id: int  # Ids in the shared symbol table
+    track_id: int
     duration_milliseconds: int
 
     @staticmethod
     def from_json(data: Dict[str, Any]) -> 'Stream':
         return Stream(
-            end_time=utc_timestamp_to_datetime(data['endTime']),
-            artist_name=data['artistName'],
-            track_name=data['trackName'],
+            end_timestamp=parse_timestamp(data['endTime']),
+            artist_id=symbols.get_id(data['artistName']),
+            track_id=symbols.get_id(data['trackName']),
             duration_milliseconds=data['msPlayed']
         )
 
+    @property
+    def artist_name(self) -> str:
+        return symbols[self.artist_id]
+
+    @property
+    def track_name(self) -> str:
+        return symbols[self.track_id]
+
+    @property
+    def end_time(self) -> datetime:
+        return to_datetime(self.end_timestamp)
+
     @property
     def skipped(self) -> bool:
         return self.duration_milliseconds < 10000  # Is determined to be skipped if listened to less than 10 seconds
@@ -0,0 +1,133 @@
+"""
+Names that repeat across many records (artists, tracks, show titles, profiles, channels, devices) are stored once in a
+symbol table, and models hold their integer id instead. Grouping by id hashes a small int rather than the whole
+string. Ids are only meaningful within the process that assigned them, so snapshots keep their own string tables and
+are mapped onto ids when loaded.
+
+Every person whose exports are loaded gets their own table (see get_symbol_table), which lives only as long as the
+parsers and cached values using it, so their names are freed along with the rest of their data. Tables take their ids
+from one pool of blocks, so any id is looked up the same way, as `symbols[id]`, whichever table it came from. New
+names go into the table in use (see use_symbols), or the process' default table when there is none.
+"""
+
+import threading
+import weakref
+import numpy as np
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, Iterator, List, Optional
+
+BLOCK_BITS = 12  # A table takes ids 4096 at a time
+BLOCK_MASK = (1 << BLOCK_BITS) - 1
+
+blocks: List[Optional[List[str]]] = []  # Names by id, one list per block of ids, None once its table is freed
+free_block_numbers: List[int] = []
+blocks_lock = threading.Lock()
+
+
+def allocate_block() -> int:
+    with blocks_lock:
+        if free_block_numbers:
+            block_number = free_block_numbers.pop()
+            blocks[block_number] = []
+            return block_number
+        blocks.append([])
+        return len(blocks) - 1
+
+
+def release_blocks(block_numbers: List[int]) -> None:
+    with blocks_lock:
+        for block_number in block_numbers:
+            blocks[block_number] = None
+        free_block_numbers.extend(block_numbers)
+
+
+def get_symbol(id: int) -> str:
+    return blocks[id >> BLOCK_BITS][id & BLOCK_MASK]
+
+
+class SymbolTable:
+    ids_by_value: Dict[str, int]
+    block_numbers: List[int]
+
+    def __init__(self) -> None:
+        self.ids_by_value = {}
+        self.block_numbers = []
+        self.lock = threading.Lock()
+        weakref.finalize(self, release_blocks, self.block_numbers)
+
+    def __len__(self) -> int:
+        return len(self.ids_by_value)
+
+    def __getitem__(self, id: int) -> str:
+        return get_symbol(id)
+
+    def get_id(self, value: str) -> int:
+        id = self.ids_by_value.get(value)
+        if id is None:
+            with self.lock:
+                id = self.ids_by_value.get(value)
+                if id is None:
+                    if len(self.ids_by_value) == len(self.block_numbers) << BLOCK_BITS:
+                        self.block_numbers.append(allocate_block())
+                    block_number = self.block_numbers[-1]
+                    block = blocks[block_number]
+                    id = block_number << BLOCK_BITS | len(block)
+                    block.append(value)
+                    self.ids_by_value[value] = id
+        return id
+
+    def get_ids(self, values: Iterable[str]) -> np.ndarray:
+        """
+        Id of every value, such as every name in a string table, adding the ones not seen before
+        """
+        get_id = self.get_id
+        return np.array([get_id(value) for value in values], dtype=np.int32)
+
+
+default_table = SymbolTable()
+current_table: ContextVar[SymbolTable] = ContextVar('current_table', default=default_table)
+tables_by_group: 'weakref.WeakValueDictionary[str, SymbolTable]' = weakref.WeakValueDictionary()
+tables_lock = threading.Lock()
+
+
+def get_symbol_table(group: str) -> SymbolTable:
+    """
+    Table of the person whose exports are in `group`, shared by everything holding on to it and created again once
+    nothing does
+    """
+    with tables_lock:
+        table = tables_by_group.get(group)
+        if table is None:
+            table = tables_by_group[group] = SymbolTable()
+        return table
+
+
+@contextmanager
+def use_symbols(table: SymbolTable) -> Iterator[SymbolTable]:
+    """
+    Adds the names models are created with in this thread to `table` until the block ends
+    """
+    token = current_table.set(table)
+    try:
+        yield table
+    finally:
+        current_table.reset(token)
+
+
+class Symbols:
+    """
+    What models use: names of any table by id, and ids of names in the table in use
+    """
+
+    def __getitem__(self, id: int) -> str:
+        return get_symbol(id)
+
+    def get_id(self, value: str) -> int:
+        return current_table.get().get_id(value)
+
+    def get_ids(self, values: Iterable[str]) -> np.ndarray:
+        return current_table.get().get_ids(values)
+
+
+symbols = Symbols()
@@ -0,0 +1,109 @@
+"""
+Instants are stored as UTC epoch seconds. The display timezone is only applied when a timestamp is turned into a
+datetime or bucketed into days and months, so changing it with set_timezone does not require parsing anything again.
+"""
+
+import numpy as np
+import os
+import pytz
+import warnings
+from dataclasses import dataclass
+from dateutil.parser import parse
+from datetime import datetime, timezone, tzinfo
+from typing import Optional, Sequence, Union
+from tzlocal import get_localzone
+
+SECONDS_IN_A_DAY = 86400
+TIMEZONE_OFFSET_GRANULARITY_SECONDS = 30 * 60  # Every timezone transition falls on a half hour in UTC
+
+display_timezone: Optional[tzinfo] = None
+
+
+def get_timezone() -> tzinfo:
+    global display_timezone
+    if display_timezone is None:
+        name = os.environ.get('YEAR_IN_REVIEW_TIMEZONE')
+        display_timezone = parse_timezone(name) if name else get_localzone()
+    return display_timezone
+
+
+def set_timezone(tz: Union[str, tzinfo]) -> None:
+    global display_timezone
+    display_timezone = parse_timezone(tz) if isinstance(tz, str) else tz
+
+
+def parse_timezone(name: str) -> tzinfo:
+    return pytz.timezone(name)
+
+
+def strip_utc_suffix(timestamp: str) -> str:
+    if timestamp.endswith('Z'):
+        return timestamp[:-1]
+    if timestamp.endswith('+00:00'):
+        return timestamp[:-6]
+    return timestamp
+
+
+def parse_timestamp(timestamp: str) -> int:
+    """
+    UTC epoch seconds of a timestamp in any of the exports' layouts: Spotify's `2020-01-31 23:59`, Netflix's and
+    Hinge's `2020-01-31 23:59:59`, Instagram's `2020-01-31T23:59:59+00:00` and YouTube's `2020-01-31T23:59:59.999Z`.
+    Timestamps without an offset are UTC. Anything else falls back to dateutil.
+    """
+    try:
+        date = datetime.fromisoformat(strip_utc_suffix(timestamp))
+    except ValueError:
+        date = parse(timestamp)
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return int(date.timestamp())
+
+
+def parse_timestamps(timestamps: Sequence[str]) -> np.ndarray:
+    """
+    parse_timestamp for many timestamps at once. Layouts NumPy understands are converted in bulk, anything else (such
+    as non-UTC offsets) one at a time.
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            dates = np.array([strip_utc_suffix(timestamp) for timestamp in timestamps], dtype='datetime64[s]')
+        return dates.astype(np.int64)
+    except (ValueError, UserWarning):
+        return np.fromiter((parse_timestamp(timestamp) for timestamp in timestamps), dtype=np.int64, count=len(timestamps))
+
+
+def to_datetime(timestamp: int) -> datetime:
+    return datetime.fromtimestamp(timestamp, get_timezone())
+
+
+@dataclass
+class LocalTimeFields:
+    years: np.ndarray
+    months: np.ndarray  # 1 represents January, 12 represents December
+    weekdays: np.ndarray  # 0 represents Monday, 6 represents Sunday
+    hours: np.ndarray
+
+
+def get_local_time_fields(timestamps: np.ndarray) -> LocalTimeFields:
+    """
+    Breaks UTC epoch seconds into calendar fields in the display timezone, in bulk. The UTC offset is only looked up
+    once per half hour present in the data rather than once per timestamp.
+    """
+    tz = get_timezone()
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    periods, inverse = np.unique(timestamps // TIMEZONE_OFFSET_GRANULARITY_SECONDS, return_inverse=True)
+    offsets = np.array([
+        int(datetime.fromtimestamp(period * TIMEZONE_OFFSET_GRANULARITY_SECONDS, tz).utcoffset().total_seconds())
+        for period in periods.tolist()
+    ], dtype=np.int64)
+    local_timestamps = timestamps + offsets[inverse.reshape(-1)]
+
+    months_since_epoch = local_timestamps.astype('datetime64[s]').astype('datetime64[M]').astype(np.int64)
+    days_since_epoch = local_timestamps // SECONDS_IN_A_DAY
+    return LocalTimeFields(
+        years=months_since_epoch // 12 + 1970,
+        months=months_since_epoch % 12 + 1,
+        weekdays=(days_since_epoch + 3) % 7,  # January 1st 1970 was a Thursday
+        hours=local_timestamps % SECONDS_IN_A_DAY // 3600,
+    )
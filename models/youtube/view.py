@@ -1,27 +1,32 @@
-import pytz
 from dataclasses import dataclass
-from dateutil.parser import parse
 from datetime import datetime
-from tzlocal import get_localzone
 from typing import Dict, Any, List, Optional
+from models.symbols import symbols
+from models.timestamps import parse_timestamp, to_datetime
 
 
 @dataclass
 class View:
+    __slots__ = ('title', 'url', 'timestamp', 'channel_id')
     title: str
     url: Optional[str]
-    date: datetime
-    channel_name: Optional[str]
+    timestamp: int  # UTC epoch seconds
+    channel_id: Optional[int]  # Id in the shared symbol table
+
+    @property
+    def channel_name(self) -> Optional[str]:
+        return symbols[self.channel_id] if self.channel_id is not None else None
+
+    @property
+    def date(self) -> datetime:
+        return to_datetime(self.timestamp)
 
     @staticmethod
     def from_json(data: Dict[str, Any]) -> 'View':
-        date = parse(data['time'])
-        date = date.astimezone(get_localzone())
-
         subtitles = data.get('subtitles', [])
         return View(
             title=data['title'],
             url=data.get('titleUrl'),
-            date=date,
-            channel_name=subtitles[0]['name'] if len(subtitles) > 0 else None
+            timestamp=parse_timestamp(data['time']),
+            channel_id=symbols.get_id(subtitles[0]['name']) if len(subtitles) > 0 else None
         )
@@ -1,61 +1,321 @@
 import csv
 import json
+import multiprocessing
+import operator
 import os
-from abc import ABC
+import re
+from concurrent.futures import ProcessPoolExecutor
+from abc import ABC, abstractmethod
+from cached_property import cached_property
 from dataclasses import dataclass
-from typing import Dict, Any, Optional, List
+from typing import IO, Dict, Any, Optional, List, Callable, Iterator, Tuple, TypeVar
+from models.symbols import SymbolTable, get_symbol_table, use_symbols
+from models.timestamps import get_timezone
+from parsers.archives import find_file, get_snapshot_location, list_files, open_text
+from parsers.cache import dataset_cache
+from parsers.snapshot import Column, Snapshot, open_snapshot
+
+T = TypeVar('T')
+
+DEFAULT_WORKERS = int(os.environ.get('YEAR_IN_REVIEW_WORKERS', os.cpu_count() or 1))
+# Workers are never forked from the dashboard, whose other threads (such as the warm-up) may hold a lock the worker
+# would then wait on forever
+WORKER_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+JSON_CHUNK_SIZE = 64 * 1024
+JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+JSON_COMMA = re.compile(r'[ \t\n\r]*,[ \t\n\r]*')
+JSON_NUMBER_TAIL = re.compile(r'[0-9.eE+-]*')  # Text ending the buffer right after a number, which may continue it
 
 
 class Parser(ABC):
     year: Optional[int]
+    data_root: str  # Directory holding the `data/` folder of the person whose exports are read
+    symbols: SymbolTable  # That person's names, kept alive as long as the parser
     data: Dict[str, Any]
+    filepaths: List[str]
+    directory_path: str
+    snapshot_prefix: str = ''  # Tells apart the snapshots of exports read from archives in the same folder
 
-    def __init__(self, year: Optional[int] = None) -> None:
+    def __init__(self, year: Optional[int] = None, data_root: Optional[str] = None) -> None:
         self.year = year
+        self.data_root = data_root or os.getcwd()
+        self.symbols = get_symbol_table(self.data_root)
+
+    @property
+    @abstractmethod
+    def years(self) -> List[int]:
+        """
+        Every year with data in the export
+        """
+
+    def warm_up(self) -> None:
+        """
+        Loads the export and builds what every year's charts are computed from, so they are cache lookups afterwards
+        """
+        self.years
+
+    def load_cached(self, name: str, build: Callable[[], T], extend: Optional[Callable[[T, List[str]], Optional[T]]] = None) -> T:
+        """
+        Shares `build()` between every parser instance reading the same files until they change on disk. See
+        DatasetCache.get for `extend`, which updates the value when files are only added. Names the value is built
+        with go into this person's symbol table.
+        """
+        with use_symbols(self.symbols):
+            return dataset_cache.get(self.filepaths, name, build, extend=extend, group=self.data_root, symbols=self.symbols)
+
+    def load_by_year(self, name: str, build: Callable[[], T], extend: Optional[Callable[[T, List[str]], Optional[T]]] = None) -> T:
+        """
+        load_cached for data split by year, which is split again when the display timezone changes
+        """
+        return self.load_cached('{0}_by_year_{1}'.format(name, get_timezone()), build, extend=extend)
+
+    def load_snapshot(
+        self,
+        name: str,
+        build: Callable[[], Dict[str, Column]],
+        append: Optional[Callable[[Snapshot, List[str]], Dict[str, Column]]] = None,
+    ) -> Snapshot:
+        """
+        Columns saved in a memory mapped snapshot next to the export, so the raw files are only decoded again when
+        they change. `build` turns the raw data into columns, and `append` (when given) adds the data of new files to
+        the columns of an existing snapshot.
+        """
+        path = '{0}/.{1}{2}.snapshot'.format(self.directory_path, self.snapshot_prefix, name)
+        return self.load_cached(
+            '{0}_snapshot'.format(name),
+            lambda: open_snapshot(path=path, filepaths=self.filepaths, build=build, append=append),
+        )
+
+
+def load_json(filepath: str) -> Any:
+    try:
+        with open_text(filepath) as file:
+            return json.load(file)
+    except Exception:
+        print('There was a problem loading {0}'.format(filepath))
+        raise
+
+
+class JsonBuffer:
+    """
+    Text of a JSON file read a chunk at a time, and the position of the next character to decode in it
+    """
+
+    def __init__(self, file: IO[str], chunk_size: int) -> None:
+        self.file = file
+        self.chunk_size = chunk_size
+        self.text = ''
+        self.position = 0
+        self.end_of_file = False
+
+    def read(self, size: int) -> bool:
+        """
+        Appends the next `size` characters of the file, dropping those already decoded
+        """
+        chunk = self.file.read(size)
+        self.end_of_file = not chunk
+        self.text = self.text[self.position:] + chunk
+        self.position = 0
+        return not self.end_of_file
+
+    def peek(self) -> str:
+        """
+        Skips whitespace, however many chunks it takes up, and returns the next character ('' at the end of the file)
+        """
+        while True:
+            self.position = JSON_WHITESPACE.match(self.text, self.position).end()
+            if self.position < len(self.text) or not self.read(self.chunk_size):
+                return self.text[self.position:self.position + 1]
+
+    def decode(self, decoder: json.JSONDecoder) -> Any:
+        """
+        Decodes the value starting at the current position, reading more of the file until it is complete
+        """
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.text, self.position)
+                if self.end_of_file or not (isinstance(value, (int, float)) and JSON_NUMBER_TAIL.fullmatch(self.text, end)):
+                    self.position = end
+                    return value
+            except ValueError:
+                if self.end_of_file:
+                    raise
+            self.read(max(self.chunk_size, len(self.text) - self.position))
+
+
+def iter_json_array(filepath: str, chunk_size: int = JSON_CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Yields the elements of the JSON array in a file one at a time, only holding the current chunk of the file and the
+    element being decoded in memory. Anything json.load would reject raises ValueError.
+    """
+    decoder = json.JSONDecoder()
+    try:
+        with open_text(filepath) as file:
+            buffer = JsonBuffer(file, chunk_size=chunk_size)
+            if buffer.peek() != '[':
+                raise ValueError('Expected a JSON array')
+            buffer.position += 1
+            if buffer.peek() == ']':
+                buffer.position += 1
+            else:
+                while True:
+                    try:  # Decoding is tried here first, as calling JsonBuffer.decode for every element is much slower
+                        value, end = decoder.raw_decode(buffer.text, buffer.position)
+                        if not buffer.end_of_file and (end == len(buffer.text) or isinstance(value, (int, float))):
+                            value = buffer.decode(decoder)
+                        else:
+                            buffer.position = end
+                    except ValueError:
+                        value = buffer.decode(decoder)
+                    yield value
+                    match = JSON_COMMA.match(buffer.text, buffer.position)
+                    if match is not None and match.end() < len(buffer.text):  # The next element starts in this chunk
+                        buffer.position = match.end()
+                        continue
+                    delimiter = buffer.peek()
+                    buffer.position += 1
+                    if delimiter == ']':
+                        break
+                    if delimiter != ',':
+                        raise ValueError('Expected , or ] after an element of the array')
+                    buffer.peek()
+            if buffer.peek() != '':
+                raise ValueError('Extra data after the array')
+    except Exception:
+        print('There was a problem loading {0}'.format(filepath))
+        raise
+
+
+def load_csv(filepath: str) -> Tuple[List[str], List[List[str]]]:
+    try:
+        with open_text(filepath) as file:
+            data = list(csv.reader(file, delimiter=','))
+            return data[0], data[1:]
+    except Exception:
+        print('There was a problem loading {0}'.format(filepath))
+        raise
+
+
+def iter_csv_rows(filepath: str, names: List[str]) -> Iterator[Tuple[str, ...]]:
+    """
+    Values of the named columns in every row of a CSV file, read one row at a time
+    """
+    try:
+        with open_text(filepath) as file:
+            reader = csv.reader(file, delimiter=',')
+            header = next(reader)
+            indices = [header.index(name) for name in names]
+            get_values = operator.itemgetter(*indices) if len(indices) > 1 else lambda row: (row[indices[0]],)
+            yield from map(get_values, reader)
+    except Exception:
+        print('There was a problem loading {0}'.format(filepath))
+        raise
+
+
+def load_csv_columns(filepath: str, names: List[str]) -> Dict[str, List[str]]:
+    """
+    Only the named columns of a CSV file, as a list of values per column. The other fields of each row are dropped as
+    soon as the row is read.
+    """
+    try:
+        with open_text(filepath) as file:
+            reader = csv.reader(file, delimiter=',')
+            header = next(reader)
+            columns: Dict[str, List[str]] = {name: [] for name in names}
+            appends = [(header.index(name), columns[name].append) for name in names]
+            for row in reader:
+                for index, append in appends:
+                    append(row[index])
+            return columns
+    except Exception:
+        print('There was a problem loading {0}'.format(filepath))
+        raise
 
 
 class JsonParser(Parser):
-    def __init__(self, relative_path: str, year: Optional[int] = None) -> None:
-        super().__init__(year=year)
-        filepath = '{0}/{1}'.format(os.getcwd(), relative_path)
+    def __init__(self, relative_path: str, year: Optional[int] = None, data_root: Optional[str] = None) -> None:
+        super().__init__(year=year, data_root=data_root)
+        filepath = find_file(self.data_root, relative_path)
+        self.filepaths = [filepath]
+        self.directory_path, self.snapshot_prefix = get_snapshot_location(filepath)
 
-        try:
-            with open(filepath) as file:
-                self.data = json.load(file)
-        except:
-            print('There was a problem loading {0}'.format(filepath))
-            raise
+    @cached_property
+    def data(self) -> Any:
+        return self.load_cached('data', lambda: load_json(self.filepaths[0]))
+
+    def iter_data(self) -> Iterator[Any]:
+        """
+        Elements of an export whose top level is an array, decoded one at a time
+        """
+        return iter_json_array(self.filepaths[0])
 
 
 class MultiJsonParser(Parser):
-    def __init__(self, relative_path_to_directory: str, filename_prefix: str, year: Optional[int] = None) -> None:
-        super().__init__(year=year)
-        directory_path = '{0}/{1}'.format(os.getcwd(), relative_path_to_directory)
-        data = []
-        for filename in os.listdir(directory_path):
-            if filename.startswith(filename_prefix) and filename.endswith('.json'):
-                filepath = '{0}/{1}'.format(directory_path, filename)
-                try:
-                    with open(filepath) as file:
-                        data += json.load(file)
-                except:
-                    print('There was a problem loading {0}'.format(filepath))
-                    raise
-        self.data = data
+    workers: int
+
+    def __init__(
+        self,
+        relative_path_to_directory: str,
+        filename_prefix: str,
+        year: Optional[int] = None,
+        workers: Optional[int] = None,
+        data_root: Optional[str] = None,
+    ) -> None:
+        super().__init__(year=year, data_root=data_root)
+        self.workers = workers or DEFAULT_WORKERS
+        self.filepaths = list_files(
+            self.data_root,
+            relative_path_to_directory,
+            lambda filename: filename.startswith(filename_prefix) and filename.endswith('.json'),
+        )
+        if self.filepaths:
+            self.directory_path, self.snapshot_prefix = get_snapshot_location(self.filepaths[0])
+        else:
+            self.directory_path = '{0}/{1}'.format(self.data_root, relative_path_to_directory)
+
+    @cached_property
+    def data(self) -> List[Any]:
+        return self.load_cached('data', lambda: list(self.iter_data()))
+
+    def iter_data(self) -> Iterator[Any]:
+        """
+        Records of every file, decoded one at a time so they can be filtered and converted without ever holding the
+        whole raw export in memory
+        """
+        for filepath in self.filepaths:
+            yield from iter_json_array(filepath)
+
+    def map_files(self, load: Callable[[str], T], filepaths: Optional[List[str]] = None) -> List[T]:
+        """
+        Calls `load` on every file (or only on `filepaths`) in a pool of `workers` processes, returning the results in
+        the same order as the files whichever worker finishes first. `load` must be a module level function so it can
+        be pickled.
+        """
+        filepaths = self.filepaths if filepaths is None else filepaths
+        workers = min(self.workers, len(filepaths))
+        if workers <= 1:
+            return [load(filepath) for filepath in filepaths]
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(WORKER_START_METHOD)) as executor:
+            return list(executor.map(load, filepaths))
 
 
 class CsvParser(Parser):
-    columns: List[str]
-
-    def __init__(self, relative_path: str, year: Optional[int] = None) -> None:
-        super().__init__(year=year)
-        filepath = '{0}/{1}'.format(os.getcwd(), relative_path)
-
-        try:
-            with open(filepath) as file:
-                data = list(csv.reader(file, delimiter=','))
-                self.columns = data[0]
-                self.data = data[1:]
-        except:
-            print('There was a problem loading {0}'.format(filepath))
-            raise
+    def __init__(self, relative_path: str, year: Optional[int] = None, data_root: Optional[str] = None) -> None:
+        super().__init__(year=year, data_root=data_root)
+        filepath = find_file(self.data_root, relative_path)
+        self.filepaths = [filepath]
+        self.directory_path, self.snapshot_prefix = get_snapshot_location(filepath)
+
+    @property
+    def columns(self) -> List[str]:
+        return self.load_cached('data', lambda: load_csv(self.filepaths[0]))[0]
+
+    @property
+    def data(self) -> List[List[str]]:
+        return self.load_cached('data', lambda: load_csv(self.filepaths[0]))[1]
+
+    def read_columns(self, names: List[str]) -> Dict[str, List[str]]:
+        return load_csv_columns(self.filepaths[0], names=names)
+
+    def iter_rows(self, names: List[str]) -> Iterator[Tuple[str, ...]]:
+        return iter_csv_rows(self.filepaths[0], names=names)
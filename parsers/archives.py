@@ -0,0 +1,174 @@
+"""
+Reading exports straight from what was downloaded, without unzipping them first: a `.zip` archive placed in the folder
+it would have been unzipped into (or named after the folder it stands for), and single files compressed as `.json.gz`
+or `.csv.gz`. A file inside an archive has the path it would have if the archive were a folder, for example
+`data/spotify/my_spotify_data.zip/MyData/StreamingHistory0.json`, so it can be listed, fingerprinted and handed to
+worker processes like any other file. Only the files a parser reads are decompressed, a chunk at a time as they are
+decoded, and nothing is written to disk.
+"""
+
+import functools
+import gzip
+import io
+import os
+import re
+import zipfile
+from typing import IO, Any, Callable, Dict, List, Optional, Tuple
+
+ARCHIVE_EXTENSION = '.zip'
+COMPRESSED_EXTENSION = '.gz'
+DIGITS = re.compile(r'(\d+)')
+
+
+def split_member_path(filepath: str) -> Tuple[str, Optional[str]]:
+    """
+    Path of the archive holding `filepath` and the file's name inside it, or `filepath` and None for a file on disk
+    """
+    start = 0
+    while True:
+        end = filepath.find(ARCHIVE_EXTENSION + '/', start)
+        if end == -1:
+            return filepath, None
+        archive_path = filepath[:end + len(ARCHIVE_EXTENSION)]
+        if os.path.isfile(archive_path):  # Not a folder that happens to end with .zip
+            return archive_path, filepath[len(archive_path) + 1:]
+        start = end + 1
+
+
+def open_text(filepath: str) -> IO[str]:
+    """
+    Opens a file for reading text, decompressing it as it is read if it is inside an archive or compressed
+    """
+    archive_path, member = split_member_path(filepath)
+    if member is not None:
+        with zipfile.ZipFile(archive_path) as archive:  # Stays open until the member is closed
+            try:
+                return io.TextIOWrapper(archive.open(member), encoding='utf-8')
+            except KeyError:
+                raise FileNotFoundError('No {0} in {1}'.format(member, archive_path))
+    if filepath.endswith(COMPRESSED_EXTENSION):
+        return gzip.open(filepath, 'rt', encoding='utf-8')
+    return open(filepath)
+
+
+def get_file_stat(filepath: str) -> Tuple[int, int]:
+    """
+    Modification time and decompressed size of a file. Files inside an archive change whenever the archive does.
+    """
+    archive_path, member = split_member_path(filepath)
+    stat = os.stat(archive_path)
+    if member is not None:
+        sizes = get_member_sizes(archive_path, stat.st_mtime_ns, stat.st_size)
+        if member not in sizes:
+            raise FileNotFoundError('No {0} in {1}'.format(member, archive_path))
+        return stat.st_mtime_ns, sizes[member]
+    if filepath.endswith(COMPRESSED_EXTENSION):
+        return stat.st_mtime_ns, get_decompressed_size(filepath, stat.st_mtime_ns, stat.st_size)
+    return stat.st_mtime_ns, stat.st_size
+
+
+@functools.lru_cache(maxsize=64)
+def get_member_sizes(archive_path: str, mtime_ns: int, size: int) -> Dict[str, int]:
+    """
+    Size of every file in an archive, read from its table of contents once per version of the archive
+    """
+    with zipfile.ZipFile(archive_path) as archive:
+        return {info.filename: info.file_size for info in archive.infolist() if not info.is_dir()}
+
+
+@functools.lru_cache(maxsize=64)
+def get_decompressed_size(filepath: str, mtime_ns: int, size: int) -> int:
+    """
+    Size a gzip file decompresses to, stored (modulo 4 GB) in its last four bytes
+    """
+    with open(filepath, 'rb') as file:
+        file.seek(max(size - 4, 0))
+        return int.from_bytes(file.read(4), 'little')
+
+
+def get_snapshot_location(filepath: str) -> Tuple[str, str]:
+    """
+    Folder to save the snapshots of a file in, and a prefix for their names. Snapshots of a file inside an archive go
+    next to the archive, named after it.
+    """
+    archive_path, member = split_member_path(filepath)
+    if member is None:
+        return os.path.dirname(filepath), ''
+    return os.path.dirname(archive_path), '{0}.'.format(os.path.basename(archive_path))
+
+
+def find_file(data_root: str, relative_path: str) -> str:
+    """
+    Path of the export file at `relative_path`: the file itself, compressed or not, or the file inside the most
+    recently downloaded archive holding it. If there is none, the path of the missing file, so reading it fails as
+    usual.
+    """
+    filepath = '{0}/{1}'.format(data_root, relative_path)
+    for candidate in [filepath, filepath + COMPRESSED_EXTENSION]:
+        if os.path.isfile(candidate):
+            return candidate
+    relative_directory, filename = relative_path.rsplit('/', 1)
+    filepaths = list_archived_files(data_root, relative_directory, lambda name: name == filename)
+    return filepaths[-1] if filepaths else filepath
+
+
+def list_files(data_root: str, relative_directory: str, accept: Callable[[str], bool]) -> List[str]:
+    """
+    Paths of the export files directly in `relative_directory` whose name (without .gz) is accepted, in natural order
+    (StreamingHistory2 before StreamingHistory10). Only when the folder doesn't exist are they looked for in archives,
+    the oldest archive's files first.
+    """
+    directory_path = '{0}/{1}'.format(data_root, relative_directory)
+    if os.path.isdir(directory_path):
+        return [
+            '{0}/{1}'.format(directory_path, filename)
+            for filename in sorted(os.listdir(directory_path), key=get_natural_sort_key)
+            if accept(strip_compression(filename))
+        ]
+    filepaths = list_archived_files(data_root, relative_directory, accept)
+    if not filepaths:
+        raise FileNotFoundError('No such directory or archive holding it: {0}'.format(directory_path))
+    return filepaths
+
+
+def list_archived_files(data_root: str, relative_directory: str, accept: Callable[[str], bool]) -> List[str]:
+    """
+    Files directly in `relative_directory` of every archive in one of its parent folders, oldest archive first and in
+    natural order within each archive. An archive holds either the contents of the folder it is in
+    (`data/spotify/my_spotify_data.zip` holding `MyData/...`) or those of the folder it is named after
+    (`data/netflix/netflix-report.zip` holding `Content_Interaction/...`).
+    """
+    folders = relative_directory.split('/')
+    archives: List[Tuple[int, str, str]] = []
+    for depth in range(len(folders), 0, -1):
+        parent_path = '{0}/{1}'.format(data_root, '/'.join(folders[:depth]))
+        if not os.path.isdir(parent_path):
+            continue
+        for filename in sorted(os.listdir(parent_path)):
+            archive_path = '{0}/{1}'.format(parent_path, filename)
+            if not filename.endswith(ARCHIVE_EXTENSION) or not os.path.isfile(archive_path):
+                continue
+            mtime_ns = os.stat(archive_path).st_mtime_ns
+            archives.append((mtime_ns, archive_path, '/'.join(folders[depth:])))
+            if folders[depth:depth + 1] == [filename[:-len(ARCHIVE_EXTENSION)]]:
+                archives.append((mtime_ns, archive_path, '/'.join(folders[depth + 1:])))
+
+    filepaths = []
+    for _, archive_path, member_directory in sorted(archives):
+        stat = os.stat(archive_path)
+        for member in sorted(get_member_sizes(archive_path, stat.st_mtime_ns, stat.st_size), key=get_natural_sort_key):
+            member_directory_path, _, name = member.rpartition('/')
+            if member_directory_path == member_directory and accept(name):
+                filepaths.append('{0}/{1}'.format(archive_path, member))
+    return filepaths
+
+
+def strip_compression(filename: str) -> str:
+    return filename[:-len(COMPRESSED_EXTENSION)] if filename.endswith(COMPRESSED_EXTENSION) else filename
+
+
+def get_natural_sort_key(filename: str) -> List[Any]:
+    """
+    Sorts runs of digits in a file name by their value rather than character by character
+    """
+    return [int(part) if part.isdigit() else part for part in DIGITS.split(filename)]
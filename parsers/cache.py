@@ -0,0 +1,306 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple, TypeVar
+from models.symbols import SymbolTable
+from parsers.archives import get_file_stat
+
+T = TypeVar('T')
+
+DEFAULT_MAX_BYTES = int(os.environ.get('YEAR_IN_REVIEW_CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+DEFAULT_GROUP_MAX_BYTES = int(os.environ['YEAR_IN_REVIEW_TENANT_CACHE_MAX_BYTES']) if 'YEAR_IN_REVIEW_TENANT_CACHE_MAX_BYTES' in os.environ else None
+DEFAULT_IDLE_SECONDS = float(os.environ['YEAR_IN_REVIEW_CACHE_IDLE_SECONDS']) if 'YEAR_IN_REVIEW_CACHE_IDLE_SECONDS' in os.environ else None
+DECODED_SIZE_FACTOR = 8  # Decoded Python objects take up roughly this many times the size of the raw export
+DEFAULT_MAX_FIGURES = int(os.environ.get('YEAR_IN_REVIEW_FIGURE_CACHE_SIZE', 256))
+DEFAULT_GROUP_MAX_FIGURES = int(os.environ['YEAR_IN_REVIEW_TENANT_FIGURE_CACHE_SIZE']) if 'YEAR_IN_REVIEW_TENANT_FIGURE_CACHE_SIZE' in os.environ else None
+
+Fingerprint = Tuple[Tuple[int, int], ...]
+
+
+def get_fingerprint(filepaths: List[str]) -> Fingerprint:
+    """
+    Modification time and size of every file, used to detect when an export was replaced on disk
+    """
+    fingerprint = []
+    for filepath in filepaths:
+        fingerprint.append(get_file_stat(filepath))
+    return tuple(fingerprint)
+
+
+@dataclass
+class CacheEntry:
+    fingerprint: Fingerprint
+    size_bytes: int
+    group: Optional[str] = None
+    symbols: Optional[SymbolTable] = None  # Table the ids in the values point into, kept alive as long as they are
+    last_used: float = field(default_factory=time.monotonic)
+    values: Dict[str, Any] = field(default_factory=dict)
+
+
+class DatasetCache:
+    """
+    Process-wide LRU cache of decoded exports and the models built from them. Entries are keyed by the
+    export's file paths, so every parser instance reading the same files shares one copy regardless of year.
+
+    Entries can belong to a group, such as the person whose exports they were built from when serving several. All
+    groups share `max_bytes`, least recently used entries going first whichever group they belong to, and no group
+    may take up more than `group_max_bytes`. Entries unused for `idle_seconds` are dropped even when there is room.
+    """
+    max_bytes: int
+    group_max_bytes: Optional[int]
+    idle_seconds: Optional[float]
+    entries: 'OrderedDict[Tuple[str, ...], CacheEntry]'
+    loads: Dict[Tuple[Tuple[str, ...], Fingerprint, str], 'Future[Any]']  # Values being built right now
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        group_max_bytes: Optional[int] = DEFAULT_GROUP_MAX_BYTES,
+        idle_seconds: Optional[float] = DEFAULT_IDLE_SECONDS,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.group_max_bytes = group_max_bytes
+        self.idle_seconds = idle_seconds
+        self.entries = OrderedDict()
+        self.loads = {}
+        self.lock = threading.RLock()
+
+    @property
+    def size_bytes(self) -> int:
+        with self.lock:
+            return sum([entry.size_bytes for entry in self.entries.values()])
+
+    @property
+    def size_bytes_by_group(self) -> Dict[Optional[str], int]:
+        with self.lock:
+            size_bytes_by_group: Dict[Optional[str], int] = {}
+            for entry in self.entries.values():
+                size_bytes_by_group[entry.group] = size_bytes_by_group.get(entry.group, 0) + entry.size_bytes
+            return size_bytes_by_group
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'size_bytes': self.size_bytes,
+            'max_bytes': self.max_bytes,
+            'entries': len(self.entries),
+            'size_bytes_by_group': {str(group): size_bytes for group, size_bytes in self.size_bytes_by_group.items()},
+        }
+
+    def get(
+        self,
+        filepaths: List[str],
+        name: str,
+        build: Callable[[], T],
+        extend: Optional[Callable[[T, List[str]], Optional[T]]] = None,
+        group: Optional[str] = None,
+        symbols: Optional[SymbolTable] = None,
+    ) -> T:
+        """
+        Returns the value called `name` for these files, calling `build` if it is missing or the files changed.
+
+        When files were added since the value was last built, and `extend` is given, it is called with the old value and
+        the files it was built from to bring it up to date instead, returning None if it can't. The old value is handed
+        over to `extend` rather than copied, so it may be changed in place.
+
+        `symbols` is the table holding the names of the ids in the value. The entry keeps it, so a person's names are
+        only freed once every value built from their exports is evicted.
+
+        Only one thread builds a given value at a time: any other thread asking for it meanwhile (such as a callback
+        arriving while the value is being warmed up in the background) waits for that build and gets its result.
+        """
+        key = tuple(filepaths)
+        fingerprint = get_fingerprint(filepaths)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.fingerprint == fingerprint and name in entry.values:
+                self.entries.move_to_end(key)
+                entry.last_used = time.monotonic()
+                return entry.values[name]
+            load_key = (key, fingerprint, name)
+            load = self.loads.get(load_key)
+            if load is None:
+                self.loads[load_key] = Future()
+        if load is not None:
+            return load.result()
+
+        try:
+            value = self.load(
+                key=key,
+                filepaths=filepaths,
+                fingerprint=fingerprint,
+                name=name,
+                build=build,
+                extend=extend,
+                group=group,
+                symbols=symbols,
+            )
+        except BaseException as error:
+            with self.lock:
+                self.loads.pop(load_key).set_exception(error)
+            raise
+        with self.lock:
+            self.loads.pop(load_key).set_result(value)
+        return value
+
+    def load(
+        self,
+        key: Tuple[str, ...],
+        filepaths: List[str],
+        fingerprint: Fingerprint,
+        name: str,
+        build: Callable[[], T],
+        extend: Optional[Callable[[T, List[str]], Optional[T]]],
+        group: Optional[str],
+        symbols: Optional[SymbolTable],
+    ) -> T:
+        """
+        Builds the value, or extends the previous one, and stores it
+        """
+        value = None
+        if extend is not None:
+            previous = self.take_previous(filepaths=filepaths, fingerprint=fingerprint, name=name)
+            if previous is not None:
+                value = extend(*previous)
+        if value is None:
+            value = build()
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry.fingerprint != fingerprint:
+                size_bytes = sum([size for _, size in fingerprint]) * DECODED_SIZE_FACTOR
+                entry = CacheEntry(fingerprint=fingerprint, size_bytes=size_bytes, group=group, symbols=symbols)
+                self.entries[key] = entry
+            if entry.symbols is None:
+                entry.symbols = symbols
+            value = entry.values.setdefault(name, value)
+            self.entries.move_to_end(key)
+            entry.last_used = time.monotonic()
+            self.evict()
+            return value
+
+    def take_previous(self, filepaths: List[str], fingerprint: Fingerprint, name: str) -> Optional[Tuple[Any, List[str]]]:
+        """
+        Removes the value called `name` built from the most files that are all among `filepaths` and unchanged, and
+        returns it with those files
+        """
+        fingerprints_by_path = dict(zip(filepaths, fingerprint))
+        with self.lock:
+            previous_key = None
+            for key, entry in self.entries.items():
+                if name not in entry.values or len(key) >= len(filepaths):
+                    continue
+                if previous_key is not None and len(key) <= len(previous_key):
+                    continue
+                if all(fingerprints_by_path.get(path) == file_fingerprint for path, file_fingerprint in zip(key, entry.fingerprint)):
+                    previous_key = key
+            if previous_key is None:
+                return None
+            return self.entries[previous_key].values.pop(name), list(previous_key)
+
+    def evict(self) -> None:
+        """
+        Drops idle entries, then least recently used entries until every group and the whole cache fit their budgets,
+        always keeping the newest entry
+        """
+        with self.lock:
+            if not self.entries:
+                return
+            newest_key = next(reversed(self.entries))
+            if self.idle_seconds is not None:
+                idle_since = time.monotonic() - self.idle_seconds
+                for key in [key for key, entry in self.entries.items() if entry.last_used < idle_since and key != newest_key]:
+                    del self.entries[key]
+            if self.group_max_bytes is not None:
+                size_bytes_by_group = self.size_bytes_by_group
+                for key, entry in list(self.entries.items()):
+                    if size_bytes_by_group[entry.group] > self.group_max_bytes and key != newest_key:
+                        del self.entries[key]
+                        size_bytes_by_group[entry.group] -= entry.size_bytes
+            while len(self.entries) > 1 and self.size_bytes > self.max_bytes:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+class FigureCache:
+    """
+    LRU cache of rendered chart outputs, keyed by whatever identifies them (the callback, its inputs and the
+    fingerprint of the exports it reads), holding at most `max_entries` of them. Outputs of replaced exports are never
+    looked up again and age out on their own.
+
+    Outputs can belong to a group, such as the person whose exports they show when serving several. When the cache is
+    full, the least recently used output of whichever group holds the most goes first, so one person browsing every
+    year can't push everyone else's figures out, and no group may hold more than `group_max_entries`.
+    """
+    max_entries: int
+    group_max_entries: Optional[int]
+    entries_by_group: 'OrderedDict[Optional[str], OrderedDict[Hashable, Any]]'  # Least recently used group first
+    hits: int
+    misses: int
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_FIGURES, group_max_entries: Optional[int] = DEFAULT_GROUP_MAX_FIGURES) -> None:
+        self.max_entries = max_entries
+        self.group_max_entries = group_max_entries
+        self.entries_by_group = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum([len(entries) for entries in self.entries_by_group.values()])
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'entries': len(self),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries_by_group': {str(group): len(entries) for group, entries in self.entries_by_group.items()},
+            }
+
+    def get(self, key: Hashable, build: Callable[[], T], group: Optional[str] = None) -> T:
+        with self.lock:
+            entries = self.entries_by_group.get(group)
+            if entries is not None and key in entries:
+                self.hits += 1
+                entries.move_to_end(key)
+                self.entries_by_group.move_to_end(group)
+                return entries[key]
+            self.misses += 1
+
+        value = build()
+
+        with self.lock:
+            entries = self.entries_by_group.setdefault(group, OrderedDict())
+            entries[key] = value
+            entries.move_to_end(key)
+            self.entries_by_group.move_to_end(group)
+            if self.group_max_entries is not None:
+                while len(entries) > self.group_max_entries:
+                    entries.popitem(last=False)
+            size = len(self)
+            while size > self.max_entries:
+                largest = max(self.entries_by_group, key=lambda group: len(self.entries_by_group[group]))
+                self.entries_by_group[largest].popitem(last=False)
+                if not self.entries_by_group[largest]:
+                    del self.entries_by_group[largest]
+                size -= 1
+        return value
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries_by_group.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+dataset_cache = DatasetCache()
+figure_cache = FigureCache()
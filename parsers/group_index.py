@@ -0,0 +1,152 @@
+from datetime import datetime
+from typing import Callable, Dict, Generic, Hashable, Iterable, List, Optional, TypeVar
+from models.timestamps import to_datetime
+
+T = TypeVar('T')
+
+
+class GroupIndex(Generic[T]):
+    """
+    Groups items by month, weekday, each entity (such as artist or track) and each entity within a month, all in a
+    single pass. A running total of `get_value` is kept for every group so breakdowns never rescan the items.
+
+    Entities are keyed by whatever `get_entities` returns, usually a symbol id. Items whose entity is None are left out
+    of that entity's groups but still count towards months and weekdays.
+    """
+    items: List[T]
+    items_by_month: List[List[T]]
+    items_by_weekday: List[List[T]]
+    totals_by_month: List[int]
+    totals_by_weekday: List[int]
+    items_by_entity: Dict[str, Dict[Hashable, List[T]]]
+    totals_by_entity: Dict[str, Dict[Hashable, int]]
+    items_by_month_entity: Dict[str, List[Dict[Hashable, List[T]]]]
+    totals_by_month_entity: Dict[str, List[Dict[Hashable, int]]]
+
+    def __init__(
+        self,
+        items: Iterable[T],
+        get_timestamp: Callable[[T], int],
+        get_value: Callable[[T], int] = lambda item: 1,
+        get_entities: Optional[Dict[str, Callable[[T], Optional[Hashable]]]] = None,
+    ) -> None:
+        self.get_timestamp = get_timestamp
+        self.get_value = get_value
+        self.get_entities = get_entities or {}
+        self.items = []
+        self.items_by_month = [[] for _ in range(12)]
+        self.items_by_weekday = [[] for _ in range(7)]
+        self.totals_by_month = [0]*12
+        self.totals_by_weekday = [0]*7
+        self.items_by_entity = {entity: {} for entity in self.get_entities}
+        self.totals_by_entity = {entity: {} for entity in self.get_entities}
+        self.items_by_month_entity = {entity: [{} for _ in range(12)] for entity in self.get_entities}
+        self.totals_by_month_entity = {entity: [{} for _ in range(12)] for entity in self.get_entities}
+
+        for item in items:
+            self.add(item)
+
+    def add(self, item: T, date: Optional[datetime] = None) -> None:
+        """
+        `date` can be passed when the item's timestamp has already been converted
+        """
+        date = date or to_datetime(self.get_timestamp(item))
+        month = date.month - 1
+        weekday = date.weekday()
+        value = self.get_value(item)
+
+        self.items.append(item)
+        self.items_by_month[month].append(item)
+        self.items_by_weekday[weekday].append(item)
+        self.totals_by_month[month] += value
+        self.totals_by_weekday[weekday] += value
+
+        for entity, get_key in self.get_entities.items():
+            key = get_key(item)
+            if key is None:
+                continue
+            add(self.items_by_entity[entity], self.totals_by_entity[entity], key, item, value)
+            add(self.items_by_month_entity[entity][month], self.totals_by_month_entity[entity][month], key, item, value)
+
+    @property
+    def total(self) -> int:
+        return sum(self.totals_by_month)
+
+    @property
+    def count(self) -> int:
+        return len(self.items)
+
+    @property
+    def counts_by_month(self) -> List[int]:
+        return [len(items) for items in self.items_by_month]
+
+    @property
+    def counts_by_weekday(self) -> List[int]:
+        return [len(items) for items in self.items_by_weekday]
+
+
+class YearlyGroupIndex(Generic[T]):
+    """
+    A GroupIndex for every year present in the items, plus one covering all of them, built in a single pass so
+    switching years is a lookup. Years are in the display timezone.
+    """
+    indexes_by_year: Dict[Optional[int], GroupIndex[T]]
+
+    def __init__(
+        self,
+        items: Iterable[T],
+        get_timestamp: Callable[[T], int],
+        get_value: Callable[[T], int] = lambda item: 1,
+        get_entities: Optional[Dict[str, Callable[[T], Optional[Hashable]]]] = None,
+    ) -> None:
+        self.get_timestamp = get_timestamp
+        self.new_index = lambda: GroupIndex(items=[], get_timestamp=get_timestamp, get_value=get_value, get_entities=get_entities)
+        self.indexes_by_year = {None: self.new_index()}
+        for item in items:
+            self.add(item)
+
+    def add(self, item: T, date: Optional[datetime] = None) -> None:
+        date = date or to_datetime(self.get_timestamp(item))
+        index = self.indexes_by_year.get(date.year)
+        if index is None:
+            index = self.indexes_by_year[date.year] = self.new_index()
+        index.add(item, date=date)
+        self.indexes_by_year[None].add(item, date=date)
+
+    @property
+    def years(self) -> List[int]:
+        return sorted(year for year in self.indexes_by_year if year is not None)
+
+    def get(self, year: Optional[int]) -> GroupIndex[T]:
+        """
+        Index of the items in `year`, or of every item when `year` is None
+        """
+        index = self.indexes_by_year.get(year or None)
+        if index is None:
+            return self.new_index()
+        return index
+
+
+def partition_by_year(items: Iterable[T], get_timestamp: Callable[[T], int]) -> Dict[int, List[T]]:
+    """
+    Splits items by year in the display timezone in a single pass, keeping their order
+    """
+    items_by_year: Dict[int, List[T]] = {}
+    for item in items:
+        year = to_datetime(get_timestamp(item)).year
+        year_items = items_by_year.get(year)
+        if year_items is None:
+            items_by_year[year] = [item]
+        else:
+            year_items.append(item)
+    return items_by_year
+
+
+def add(items_by_key: Dict[Hashable, List[T]], totals_by_key: Dict[Hashable, int], key: Hashable, item: T, value: int) -> None:
+    items = items_by_key.get(key)
+    if items is None:
+        items_by_key[key] = [item]
+        totals_by_key[key] = value
+    else:
+        items.append(item)
+        totals_by_key[key] += value
@@ -0,0 +1,131 @@
+import numpy as np
+from statistics import StatisticsError
+from cached_property import cached_property
+from typing import Dict, List, Optional, Union
+from parsers.snapshot import Snapshot
+from models.timestamps import LocalTimeFields, get_local_time_fields
+
+OUTLIER_DEVIATIONS = 10
+
+
+class ChatTimeline:
+    """
+    Chat timestamps of every match stored back to back in one array, match i's chats being timestamps[offsets[i]] to
+    timestamps[offsets[i + 1]]. Every statistic about chats is computed once over the whole array rather than by
+    walking each match's chats.
+    """
+    timestamps: np.ndarray  # UTC epoch seconds
+    offsets: np.ndarray
+
+    def __init__(self, timestamps: np.ndarray, offsets: np.ndarray) -> None:
+        self.timestamps = timestamps
+        self.offsets = offsets
+
+    @staticmethod
+    def from_snapshot(snapshot: Snapshot) -> 'ChatTimeline':
+        return ChatTimeline(timestamps=snapshot['chat_timestamps'], offsets=snapshot['chat_offsets'])
+
+    @staticmethod
+    def empty() -> 'ChatTimeline':
+        return ChatTimeline(timestamps=np.zeros(0, dtype=np.int64), offsets=np.zeros(1, dtype=np.int64))
+
+    def __len__(self) -> int:
+        """
+        Number of matches, with or without chats
+        """
+        return len(self.offsets) - 1
+
+    def select(self, rows: np.ndarray) -> 'ChatTimeline':
+        """
+        Timeline of only the matches at `rows`, in that order
+        """
+        counts = self.chat_counts[rows]
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        chat_rows = np.repeat(self.offsets[:-1][rows] - offsets[:-1], counts) + np.arange(offsets[-1])
+        return ChatTimeline(timestamps=self.timestamps[chat_rows], offsets=offsets)
+
+    def partition_years(self, years: np.ndarray) -> Dict[Optional[int], 'ChatTimeline']:
+        """
+        Timelines of the matches made in each year, given the year of every match, plus this one under None
+        """
+        timelines: Dict[Optional[int], ChatTimeline] = {None: self}
+        for year in np.unique(years).tolist():
+            timelines[year] = self.select(np.flatnonzero(years == year))
+        return timelines
+
+    @cached_property
+    def chat_counts(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    @cached_property
+    def match_rows(self) -> np.ndarray:
+        """
+        Which match every chat belongs to
+        """
+        return np.repeat(np.arange(len(self)), self.chat_counts)
+
+    @cached_property
+    def gaps_seconds(self) -> np.ndarray:
+        """
+        Time between each chat and the previous one in the same match
+        """
+        same_match = self.match_rows[1:] == self.match_rows[:-1]
+        return np.diff(self.timestamps)[same_match]
+
+    @cached_property
+    def durations_seconds(self) -> np.ndarray:
+        """
+        Time between the first and last chat of every match with more than one chat, leaving out matches whose chats
+        were all sent at the same time
+        """
+        rows = np.flatnonzero(self.chat_counts > 1)
+        durations_seconds = self.timestamps[self.offsets[rows + 1] - 1] - self.timestamps[self.offsets[rows]]
+        return durations_seconds[durations_seconds != 0]
+
+    @cached_property
+    def valid_matches(self) -> np.ndarray:
+        """
+        False for the matches with far more chats than usual, which would swamp the other matches in histograms
+        """
+        if len(self) == 0:
+            return np.zeros(0, dtype=np.bool_)
+        counts = self.chat_counts
+        return np.abs(counts - counts.mean()) < OUTLIER_DEVIATIONS * counts.std()
+
+    @cached_property
+    def local_time(self) -> LocalTimeFields:
+        return get_local_time_fields(self.timestamps)
+
+    def count_by_weekday(self, exclude_outliers: bool = False) -> List[int]:
+        """
+        Index 0 represents Monday, 6 represents Sunday
+        """
+        return self.count(self.local_time.weekdays, 7, exclude_outliers=exclude_outliers)
+
+    def count_by_month(self, exclude_outliers: bool = False) -> List[int]:
+        """
+        Index 0 represents January, 11 represents December
+        """
+        return self.count(self.local_time.months - 1, 12, exclude_outliers=exclude_outliers)
+
+    def count_by_hour(self, exclude_outliers: bool = False) -> List[int]:
+        return self.count(self.local_time.hours, 24, exclude_outliers=exclude_outliers)
+
+    def count(self, buckets: np.ndarray, length: int, exclude_outliers: bool) -> List[int]:
+        if exclude_outliers:
+            buckets = buckets[self.valid_matches[self.match_rows]]
+        return np.bincount(buckets, minlength=length).tolist()
+
+
+def get_median(values: np.ndarray) -> Union[int, float]:
+    """
+    Same as statistics.median: the middle value for an odd number of values, otherwise the mean of the two middle ones
+    """
+    if len(values) == 0:
+        raise StatisticsError('no median for empty data')
+    middle = len(values) // 2
+    ordered = np.partition(values, [middle - 1, middle] if len(values) % 2 == 0 else middle)
+    if len(values) % 2 == 1:
+        return ordered[middle].item()
+    return (ordered[middle - 1].item() + ordered[middle].item()) / 2
@@ -0,0 +1,98 @@
+import numpy as np
+from cached_property import cached_property
+from typing import Dict, List, Optional
+from parsers.snapshot import Snapshot
+from models.timestamps import LocalTimeFields, get_local_time_fields
+
+OUTCOMES = ['like_accepted', 'like_rejected', 'user_accepted', 'user_rejected', 'no_chat', 'chatted']  # Bit i of a flag is OUTCOMES[i]
+FLAG_VALUES = 1 << len(OUTCOMES)
+FLAG_BITS = (np.arange(FLAG_VALUES)[:, np.newaxis] >> np.arange(len(OUTCOMES))) & 1  # Row f holds the outcomes of flag f
+
+
+class MatchOutcomes:
+    """
+    Outcome flags of every match, classified once from the snapshot columns. Outcomes overlap (a like that was
+    accepted may also have been chatted), so each match has one bit per outcome rather than a single category.
+    """
+    flags: np.ndarray
+    local_time: LocalTimeFields
+
+    def __init__(self, flags: np.ndarray, local_time: LocalTimeFields) -> None:
+        self.flags = flags
+        self.local_time = local_time
+
+    @staticmethod
+    def from_snapshot(snapshot: Snapshot) -> 'MatchOutcomes':
+        liked = snapshot['liked']
+        blocked = snapshot['blocked']
+        match_made = snapshot['match_made']
+        chatted = np.diff(snapshot['chat_offsets']) > 0
+        masks = {
+            'like_accepted': liked & match_made,
+            'like_rejected': liked & ~match_made,
+            'user_accepted': ~liked & match_made,
+            'user_rejected': ~match_made & blocked,
+            'no_chat': match_made & ~chatted,
+            'chatted': chatted,
+        }
+        flags = np.zeros(len(liked), dtype=np.uint8)
+        for bit, outcome in enumerate(OUTCOMES):
+            flags |= masks[outcome].astype(np.uint8) << bit
+        return MatchOutcomes(flags=flags, local_time=get_local_time_fields(snapshot['timestamps']))
+
+    @staticmethod
+    def empty() -> 'MatchOutcomes':
+        empty = np.zeros(0, dtype=np.int64)
+        return MatchOutcomes(flags=np.zeros(0, dtype=np.uint8), local_time=LocalTimeFields(years=empty, months=empty, weekdays=empty, hours=empty))
+
+    def __len__(self) -> int:
+        return len(self.flags)
+
+    def select(self, rows: np.ndarray) -> 'MatchOutcomes':
+        fields = self.local_time
+        return MatchOutcomes(
+            flags=self.flags[rows],
+            local_time=LocalTimeFields(years=fields.years[rows], months=fields.months[rows], weekdays=fields.weekdays[rows], hours=fields.hours[rows]),
+        )
+
+    def partition_years(self) -> Dict[Optional[int], 'MatchOutcomes']:
+        """
+        Outcomes of the matches made in each year, plus these under None
+        """
+        years = self.local_time.years
+        outcomes_by_year: Dict[Optional[int], MatchOutcomes] = {None: self}
+        for year in np.unique(years).tolist():
+            outcomes_by_year[year] = self.select(np.flatnonzero(years == year))
+        return outcomes_by_year
+
+    def has(self, outcome: str) -> np.ndarray:
+        return (self.flags >> OUTCOMES.index(outcome)) & 1 == 1
+
+    @cached_property
+    def counts(self) -> Dict[str, int]:
+        return dict(zip(OUTCOMES, self.count_by(np.zeros(len(self.flags), dtype=np.int64), 1)[0]))
+
+    @cached_property
+    def counts_by_weekday(self) -> Dict[str, List[int]]:
+        """
+        Index 0 represents Monday, 6 represents Sunday
+        """
+        return self.transpose(self.count_by(self.local_time.weekdays, 7))
+
+    @cached_property
+    def counts_by_month(self) -> Dict[str, List[int]]:
+        """
+        Index 0 represents January, 11 represents December
+        """
+        return self.transpose(self.count_by(self.local_time.months - 1, 12))
+
+    def count_by(self, buckets: np.ndarray, length: int) -> List[List[int]]:
+        """
+        Number of matches of every outcome in every bucket, from a single count of the (bucket, flag) pairs
+        """
+        flag_counts = np.bincount(buckets * FLAG_VALUES + self.flags, minlength=length * FLAG_VALUES)
+        return (flag_counts.reshape(length, FLAG_VALUES) @ FLAG_BITS).tolist()
+
+    @staticmethod
+    def transpose(counts_by_bucket: List[List[int]]) -> Dict[str, List[int]]:
+        return {outcome: [counts[i] for counts in counts_by_bucket] for i, outcome in enumerate(OUTCOMES)}
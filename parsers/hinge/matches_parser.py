@@ -1,97 +1,155 @@
 import math
+from itertools import compress
 import numpy as np
 from cached_property import cached_property
-from statistics import median
 from typing import Dict, Any, List, Optional
 from parsers import JsonParser
+from parsers.group_index import partition_by_year
+from parsers.hinge.chat_timeline import ChatTimeline, get_median
+from parsers.hinge.match_outcomes import MatchOutcomes
+from parsers.snapshot import Column, Snapshot
 from models.hinge.match import Match
 from models.hinge.chat import Chat
 
 SECONDS_IN_A_DAY = 86400
 
-def reject_outliers(matches: List[Match], m=10) -> List[bool]:
-    """
-    This is to filter out extremely long conversations. Lowering m will include more outliers, highering m will exclude.
-    """
-    chat_lengths: List[int] = [len(match.chats) for match in matches]
-    return abs(chat_lengths - np.mean(chat_lengths)) < m * np.std(chat_lengths)
-
 
 class MatchesParser(JsonParser):
 
-    def __init__(self, year: Optional[int] = None) -> None:
-        super().__init__(relative_path='data/hinge/export/matches.json', year=year)
+    def __init__(self, year: Optional[int] = None, data_root: Optional[str] = None) -> None:
+        super().__init__(relative_path='data/hinge/export/matches.json', year=year, data_root=data_root)
 
     @cached_property
     def matches(self) -> List[Match]:
-        matches = [Match.from_json(data=match_data) for match_data in self.data]
         if self.year:
-            return [match for match in matches if match.date.year == self.year]
-        return matches
+            return self.matches_by_year.get(self.year, [])
+        return self.load_cached('matches', self.load_matches)
 
     @property
-    def like_accepted_matches(self) -> List[Match]:
-        return [match for match in self.matches if match.like_accepted]
+    def matches_by_year(self) -> Dict[int, List[Match]]:
+        return self.load_by_year('matches', lambda: partition_by_year(
+            items=self.load_cached('matches', self.load_matches),
+            get_timestamp=lambda match: match.timestamp,
+        ))
 
     @property
-    def like_rejected_matches(self) -> List[Match]:
-        return [match for match in self.matches if match.like_rejected]
+    def years(self) -> List[int]:
+        return sorted(self.matches_by_year)
+
+    def warm_up(self) -> None:
+        super().warm_up()
+        self.outcomes_by_year
+        self.chat_timelines_by_year
 
     @property
-    def user_accepted_matches(self) -> List[Match]:
-        return [match for match in self.matches if match.user_accepted]
+    def outcomes_by_year(self) -> Dict[Optional[int], MatchOutcomes]:
+        return self.load_by_year('outcomes', lambda: MatchOutcomes.from_snapshot(self.snapshot).partition_years())
+
+    @cached_property
+    def outcomes(self) -> MatchOutcomes:
+        """
+        Outcomes of the same matches as `matches`, in the same order
+        """
+        return self.outcomes_by_year.get(self.year or None) or MatchOutcomes.empty()
 
     @property
-    def user_rejected_matches(self) -> List[Match]:
-        return [match for match in self.matches if match.user_rejected]
+    def chat_timelines_by_year(self) -> Dict[Optional[int], ChatTimeline]:
+        return self.load_by_year('chat_timeline', lambda: ChatTimeline.from_snapshot(self.snapshot).partition_years(
+            years=self.outcomes_by_year[None].local_time.years,
+        ))
+
+    @cached_property
+    def chat_timeline(self) -> ChatTimeline:
+        """
+        Chats of the same matches as `matches`, in the same order
+        """
+        return self.chat_timelines_by_year.get(self.year or None) or ChatTimeline.empty()
 
     @property
+    def snapshot(self) -> Snapshot:
+        return self.load_snapshot('matches', lambda: matches_to_columns(self.parse_matches()))
+
+    def load_matches(self) -> List[Match]:
+        return matches_from_columns(self.snapshot)
+
+    def parse_matches(self) -> List[Match]:
+        return [Match.from_json(data=match_data) for match_data in self.iter_data()]
+
+    @cached_property
+    def like_accepted_matches(self) -> List[Match]:
+        return self.get_matches_with_outcome('like_accepted')
+
+    @cached_property
+    def like_rejected_matches(self) -> List[Match]:
+        return self.get_matches_with_outcome('like_rejected')
+
+    @cached_property
+    def user_accepted_matches(self) -> List[Match]:
+        return self.get_matches_with_outcome('user_accepted')
+
+    @cached_property
+    def user_rejected_matches(self) -> List[Match]:
+        return self.get_matches_with_outcome('user_rejected')
+
+    @cached_property
     def no_chat_matches(self) -> List[Match]:
-        return [match for match in self.matches if match.accepted and not match.chatted]
+        return self.get_matches_with_outcome('no_chat')
 
-    @property
+    @cached_property
     def chatted_matches(self) -> List[Match]:
-        return [match for match in self.matches if match.chatted]
+        return self.get_matches_with_outcome('chatted')
+
+    def get_matches_with_outcome(self, outcome: str) -> List[Match]:
+        return list(compress(self.matches, self.outcomes.has(outcome).tolist()))
+
+    def get_match_counts(self) -> Dict[str, int]:
+        """
+        Number of matches with each outcome, keyed by the names in OUTCOMES
+        """
+        return self.outcomes.counts
+
+    def get_match_counts_by_weekday(self) -> Dict[str, List[int]]:
+        return self.outcomes.counts_by_weekday
+
+    def get_match_counts_by_month(self) -> Dict[str, List[int]]:
+        return self.outcomes.counts_by_month
 
     @property
     def chat_durations_seconds(self) -> List[int]:
-        return [match.chat_duration_seconds for match in self.matches if match.chat_duration_seconds]
+        return self.chat_timeline.durations_seconds.tolist()
 
     def get_chat_lengths(self, exclude_empty_chats: bool=True) -> List[int]:
+        return self.get_chat_length_array(exclude_empty_chats=exclude_empty_chats).tolist()
+
+    def get_chat_length_array(self, exclude_empty_chats: bool=True) -> np.ndarray:
+        chat_counts = self.chat_timeline.chat_counts
         if exclude_empty_chats:
-            return [len(match.chats) for match in self.matches if len(match.chats) > 0]
-        return [len(match.chats) for match in self.matches]
+            return chat_counts[chat_counts > 0]
+        return chat_counts
 
     def get_average_days_between_first_and_last_chat(self) -> float:
-        return round(sum(self.chat_durations_seconds) / len(self.chat_durations_seconds) / SECONDS_IN_A_DAY, 2)
+        durations_seconds = self.chat_timeline.durations_seconds
+        return round(int(durations_seconds.sum()) / len(durations_seconds) / SECONDS_IN_A_DAY, 2)
 
     def get_median_days_between_first_and_last_chat(self) -> float:
-        return round(median(self.chat_durations_seconds) / SECONDS_IN_A_DAY, 2)
+        return round(get_median(self.chat_timeline.durations_seconds) / SECONDS_IN_A_DAY, 2)
 
     def get_seconds_between_chats(self) -> List[int]:
-        duration_seconds: List[int] = []
-        for match in self.matches:
-            for i in range(1, len(match.chats)):
-                first_chat = match.chats[i-1]
-                second_chat = match.chats[i]
-                duration_seconds.append((second_chat.date - first_chat.date).total_seconds())
-        return duration_seconds
+        return self.chat_timeline.gaps_seconds.tolist()
 
     def get_average_seconds_between_chats(self) -> float:
-        duration_seconds = self.get_seconds_between_chats()
-        return math.ceil(sum(duration_seconds) / len(duration_seconds))
+        gaps_seconds = self.chat_timeline.gaps_seconds
+        return math.ceil(int(gaps_seconds.sum()) / len(gaps_seconds))
 
     def get_median_seconds_between_chats(self) -> float:
-        duration_seconds = self.get_seconds_between_chats()
-        return median(duration_seconds)
+        return get_median(self.chat_timeline.gaps_seconds)
 
     def get_average_chats_sent(self, exclude_empty_chats: bool=True) -> float:
-        chat_lengths = self.get_chat_lengths(exclude_empty_chats=exclude_empty_chats)
-        return round(sum(chat_lengths) / len(chat_lengths), 0)
+        chat_lengths = self.get_chat_length_array(exclude_empty_chats=exclude_empty_chats)
+        return round(int(chat_lengths.sum()) / len(chat_lengths), 0)
 
     def get_median_chats_sent(self, exclude_empty_chats: bool=True) -> float:
-        chat_lengths = self.get_chat_lengths(exclude_empty_chats=exclude_empty_chats)
-        return median(chat_lengths)
+        return get_median(self.get_chat_length_array(exclude_empty_chats=exclude_empty_chats))
 
     def get_matches_by_weekday(self) -> List[List[Match]]:
         matches_by_weekday = [[] for _ in range(7)]
@@ -107,7 +165,7 @@ class MatchesParser(JsonParser):
 
     def get_chats_by_weekday(self) -> List[List[Chat]]:
         chats_by_weekday = [[] for _ in range(7)]
-        validity_map = reject_outliers(self.matches)
+        validity_map = self.chat_timeline.valid_matches
         for i in range(len(self.matches)):
             match = self.matches[i]
             if not validity_map[i]:
@@ -123,18 +181,65 @@ class MatchesParser(JsonParser):
                 chats_by_month[chat.date.month - 1].append(chat)
         return chats_by_month
 
+    def get_chat_counts_by_weekday(self) -> List[int]:
+        """
+        Number of chats in each list of get_chats_by_weekday, without creating the lists
+        """
+        return self.chat_timeline.count_by_weekday(exclude_outliers=True)
+
+    def get_chat_counts_by_month(self) -> List[int]:
+        return self.chat_timeline.count_by_month()
+
+    def get_chat_counts_by_hour(self) -> List[int]:
+        return self.chat_timeline.count_by_hour()
+
     def print(self) -> None:
-        print("Likes sent that were accepted: {0}".format(len(self.like_accepted_matches)))
-        print("Likes sent that were ignored or rejected: {0}".format(len(self.like_rejected_matches)))
-        print("Others acceptance rate of you {0}%".format(round(100 * len(self.like_accepted_matches) / (len(self.like_accepted_matches) + len(self.like_rejected_matches)), 1)))
-        print("Likes received that you accepted: {0}".format(len(self.user_accepted_matches)))
-        print("Likes received that you rejected: {0}".format(len(self.user_rejected_matches)))
-        print("Your acceptance rate {0}%".format(round(100 * len(self.user_accepted_matches) / (len(self.user_accepted_matches) + len(self.user_rejected_matches)), 1)))
-        print("Matches with no messages: {0}".format(len(self.no_chat_matches)))
-        print("Matches you sent a message to: {0}".format(len(self.chatted_matches)))
+        counts = self.get_match_counts()
+        print("Likes sent that were accepted: {0}".format(counts['like_accepted']))
+        print("Likes sent that were ignored or rejected: {0}".format(counts['like_rejected']))
+        print("Others acceptance rate of you {0}%".format(round(100 * counts['like_accepted'] / (counts['like_accepted'] + counts['like_rejected']), 1)))
+        print("Likes received that you accepted: {0}".format(counts['user_accepted']))
+        print("Likes received that you rejected: {0}".format(counts['user_rejected']))
+        print("Your acceptance rate {0}%".format(round(100 * counts['user_accepted'] / (counts['user_accepted'] + counts['user_rejected']), 1)))
+        print("Matches with no messages: {0}".format(counts['no_chat']))
+        print("Matches you sent a message to: {0}".format(counts['chatted']))
         print("Average time between first and last message sent to match: {0} days".format(self.get_average_days_between_first_and_last_chat()))
         print("Median time between first and last message sent to match: {0} days".format(self.get_median_days_between_first_and_last_chat()))
         print("Average time between messages: {0} hours".format(self.get_average_seconds_between_chats() / 60 / 60))
         print("Median time between messages: {0} seconds".format(self.get_median_seconds_between_chats()))
         print("Average chat messages sent to match (excluding ignored chats): {0}".format(self.get_average_chats_sent()))
         print("Median chat messages sent to match (excluding ignored chats): {0}".format(self.get_median_chats_sent()))
+
+
+def matches_to_columns(matches: List[Match]) -> Dict[str, Column]:
+    """
+    Chats of every match are stored back to back, match i's chats being chat_offsets[i] to chat_offsets[i + 1]
+    """
+    chat_offsets = np.zeros(len(matches) + 1, dtype=np.int64)
+    np.cumsum([len(match.chats) for match in matches], out=chat_offsets[1:])
+    return {
+        'liked': np.array([match.liked for match in matches], dtype=np.bool_),
+        'blocked': np.array([match.blocked for match in matches], dtype=np.bool_),
+        'match_made': np.array([match.match_made for match in matches], dtype=np.bool_),
+        'timestamps': np.array([match.timestamp for match in matches], dtype=np.int64),
+        'chat_offsets': chat_offsets,
+        'chat_timestamps': np.array([chat.timestamp for match in matches for chat in match.chats], dtype=np.int64),
+        'chat_bodies': [chat.body for match in matches for chat in match.chats],
+    }
+
+
+def matches_from_columns(snapshot: Snapshot) -> List[Match]:
+    chats = [
+        Chat(body=body, timestamp=timestamp)
+        for body, timestamp in zip(snapshot['chat_bodies'].tolist(), snapshot['chat_timestamps'].tolist())
+    ]
+    chat_offsets = snapshot['chat_offsets'].tolist()
+    return [
+        Match(liked=liked, blocked=blocked, match_made=match_made, timestamp=timestamp, chats=chats[chat_offsets[i]:chat_offsets[i + 1]])
+        for i, (liked, blocked, match_made, timestamp) in enumerate(zip(
+            snapshot['liked'].tolist(),
+            snapshot['blocked'].tolist(),
+            snapshot['match_made'].tolist(),
+            snapshot['timestamps'].tolist(),
+        ))
+    ]
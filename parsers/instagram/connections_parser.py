@@ -1,29 +1,52 @@
+import numpy as np
 from cached_property import cached_property
 from typing import Dict, Any, List, Optional
 from parsers import JsonParser
+from parsers.group_index import partition_by_year
+from parsers.snapshot import Column, Snapshot
 from models.instagram.connection import Connection
 
 
 class ConnectionsParser(JsonParser):
 
-    def __init__(self, year: Optional[int]=None) -> None:
-        super().__init__(relative_path='data/instagram/connections.json', year=year)
+    def __init__(self, year: Optional[int]=None, data_root: Optional[str]=None) -> None:
+        super().__init__(relative_path='data/instagram/connections.json', year=year, data_root=data_root)
 
     @cached_property
     def followers(self) -> List[Connection]:
-        followers_data = self.data["followers"]
-        connections = [Connection(name=name, timestamp=followers_data[name]) for name in list(followers_data.keys())]
         if self.year:
-            return [connection for connection in connections if connection.date.year == self.year]
-        return connections
+            return self.get_connections_by_year(kind='followers').get(self.year, [])
+        return self.load_cached('followers', lambda: self.load_connections(kind='followers'))
 
     @cached_property
     def following(self) -> List[Connection]:
-        following_data = self.data["following"]
-        connections = [Connection(name=name, timestamp=following_data[name]) for name in list(following_data.keys())]
         if self.year:
-            return [connection for connection in connections if connection.date.year == self.year]
-        return connections
+            return self.get_connections_by_year(kind='following').get(self.year, [])
+        return self.load_cached('following', lambda: self.load_connections(kind='following'))
+
+    def get_connections_by_year(self, kind: str) -> Dict[int, List[Connection]]:
+        return self.load_by_year(kind, lambda: partition_by_year(
+            items=self.load_cached(kind, lambda: self.load_connections(kind=kind)),
+            get_timestamp=lambda connection: connection.timestamp,
+        ))
+
+    @property
+    def years(self) -> List[int]:
+        return sorted(set(self.get_connections_by_year(kind='followers')) | set(self.get_connections_by_year(kind='following')))
+
+    @property
+    def snapshot(self) -> Snapshot:
+        return self.load_snapshot('connections', lambda: {
+            **connections_to_columns(kind='followers', connections=self.parse_connections(kind='followers')),
+            **connections_to_columns(kind='following', connections=self.parse_connections(kind='following')),
+        })
+
+    def load_connections(self, kind: str) -> List[Connection]:
+        return connections_from_columns(kind=kind, snapshot=self.snapshot)
+
+    def parse_connections(self, kind: str) -> List[Connection]:
+        connections_data = self.data[kind]
+        return [Connection(name=name, timestamp=connections_data[name]) for name in list(connections_data.keys())]
 
     def get_followers_by_month(self) -> List[List[Connection]]:
         connections_by_month = [[] for _ in range(12)]
@@ -36,3 +59,16 @@ class ConnectionsParser(JsonParser):
         for connection in self.following:
             connections_by_month[connection.date.month - 1].append(connection)
         return connections_by_month
+
+
+def connections_to_columns(kind: str, connections: List[Connection]) -> Dict[str, Column]:
+    return {
+        '{0}_names'.format(kind): [connection.name for connection in connections],
+        '{0}_timestamps'.format(kind): np.array([connection.timestamp for connection in connections], dtype=np.int64),
+    }
+
+
+def connections_from_columns(kind: str, snapshot: Snapshot) -> List[Connection]:
+    names = snapshot['{0}_names'.format(kind)].tolist()
+    timestamps = snapshot['{0}_timestamps'.format(kind)].tolist()
+    return [Connection(name=name, timestamp=timestamp) for name, timestamp in zip(names, timestamps)]
@@ -1,23 +1,63 @@
+import numpy as np
 from cached_property import cached_property
 from typing import Dict, Any, List, Optional
 from parsers import JsonParser
+from parsers.group_index import partition_by_year
+from parsers.snapshot import Column, Snapshot, encode_strings
 from models.instagram.like import Like
 
 
 class LikesParser(JsonParser):
 
-    def __init__(self, year: Optional[int]=None) -> None:
-        super().__init__(relative_path='data/instagram/likes.json', year=year)
+    def __init__(self, year: Optional[int]=None, data_root: Optional[str]=None) -> None:
+        super().__init__(relative_path='data/instagram/likes.json', year=year, data_root=data_root)
 
     @cached_property
     def likes(self) -> None:
-        likes = [Like(name=like_data[1], timestamp=like_data[0]) for like_data in self.data["media_likes"]]
         if self.year:
-            return [like for like in likes if like.date.year == self.year]
-        return likes
+            return self.likes_by_year.get(self.year, [])
+        return self.load_cached('likes', self.load_likes)
+
+    @property
+    def likes_by_year(self) -> Dict[int, List[Like]]:
+        return self.load_by_year('likes', lambda: partition_by_year(
+            items=self.load_cached('likes', self.load_likes),
+            get_timestamp=lambda like: like.timestamp,
+        ))
+
+    @property
+    def years(self) -> List[int]:
+        return sorted(self.likes_by_year)
+
+    @property
+    def snapshot(self) -> Snapshot:
+        return self.load_snapshot('likes', lambda: likes_to_columns(self.parse_likes()))
+
+    def load_likes(self) -> List[Like]:
+        return likes_from_columns(self.snapshot)
+
+    def parse_likes(self) -> List[Like]:
+        return [Like(name=like_data[1], timestamp=like_data[0]) for like_data in self.data["media_likes"]]
 
     def get_likes_by_month(self) -> List[List[Like]]:
         likes_by_month = [[] for _ in range(12)]
         for like in self.likes:
             likes_by_month[like.date.month - 1].append(like)
         return likes_by_month
+
+
+def likes_to_columns(likes: List[Like]) -> Dict[str, Column]:
+    name_codes, names = encode_strings(like.name for like in likes)
+    return {
+        'timestamps': np.array([like.timestamp for like in likes], dtype=np.int64),
+        'name_codes': name_codes,
+        'names': names,
+    }
+
+
+def likes_from_columns(snapshot: Snapshot) -> List[Like]:
+    names = snapshot['names'].tolist()
+    return [
+        Like(name=names[name_code], timestamp=timestamp)
+        for timestamp, name_code in zip(snapshot['timestamps'].tolist(), snapshot['name_codes'].tolist())
+    ]
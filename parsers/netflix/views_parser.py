@@ -1,59 +1,107 @@
 import math
+import numpy as np
+from itertools import compress
 from cached_property import cached_property
 from dateutil.parser import parse
 from datetime import datetime
-from typing import Dict, Any, List, Optional, Set, Tuple
+from typing import Dict, Any, Iterable, List, Optional, Set, Tuple
 from parsers import CsvParser
-from models.netflix.view import View
+from parsers.snapshot import Column, Snapshot, encode_strings
+from parsers.group_index import GroupIndex, YearlyGroupIndex
+from parsers.sketches import HeavyHitter, SketchIndex
+from models.netflix.view import DEFAULT_SHOW_TITLE, View, get_show_id, get_show_title
 from models.netflix.show import Show
+from models.symbols import symbols
+from models.timestamps import parse_timestamp, parse_timestamps, to_datetime
 
 FIVE_MINUTES_IN_SECONDS = 10 * 60
-DEFAULT_SHOW_TITLE = 'Other (i.e. Movie)'
+CSV_COLUMNS = ['Profile Name', 'Start Time', 'Duration', 'Title', 'Supplemental Video Type', 'Device Type']
 
 
 class ViewsParser(CsvParser):
     profile: Optional[str]
 
-    def __init__(self, profile: Optional[str] = None, year: Optional[int] = None) -> None:
+    def __init__(self, profile: Optional[str] = None, year: Optional[int] = None, data_root: Optional[str] = None) -> None:
         self.profile = profile
         super().__init__(
             relative_path='data/netflix/netflix-report/Content_Interaction/ViewingActivity.csv',
             year=year,
+            data_root=data_root,
         )
 
-    @property
-    def columns_to_index_map(self) -> Dict[str, int]:
-        map = {}
-        for i in range(len(self.columns)):
-            column_name = self.columns[i]
-            map[column_name] = i
-        return map
-
     @cached_property
     def views(self) -> List[View]:
-        views = []
-        for view_data in self.data:
-            views.append(View.from_csv(columns=self.columns_to_index_map, data=view_data))
+        return self.index.items
 
-        views = [view for view in views if not view.supplemental_video_type and view.duration_seconds > FIVE_MINUTES_IN_SECONDS]
-        if self.profile:
-            views = [view for view in views if view.profile == self.profile]
-        if self.year:
-            views = [view for view in views if view.start_time.year == self.year]
-        return views
+    @property
+    def snapshot(self) -> Snapshot:
+        return self.load_snapshot('views', self.parse_view_columns)
 
-    @cached_property
-    def shows(self) -> List[Show]:
-        map = {}
-        for view in self.views:
-            title = view.show_title or DEFAULT_SHOW_TITLE
-            map[title] = map.get(title, []) + [view]
+    def load_views(self) -> List[View]:
+        return views_from_columns(self.snapshot)
+
+    def parse_view_columns(self) -> Dict[str, Column]:
+        """
+        Views read straight into columns. Only the columns views use are kept, and supplemental videos and short views
+        are dropped before any start time is parsed.
+        """
+        data = self.read_columns(names=CSV_COLUMNS)
+        durations_seconds = parse_durations(data['Duration'])
+        supplemental = np.fromiter(map(bool, data['Supplemental Video Type']), dtype=np.bool_, count=len(durations_seconds))
+        keep = (durations_seconds > FIVE_MINUTES_IN_SECONDS) & ~supplemental
 
-        shows = []
-        for show_title in list(map.keys()):
-            shows.append(Show(title=show_title, views=map[show_title]))
+        profile_codes, profiles = encode_strings(compress(data['Profile Name'], keep))
+        title_codes, titles = encode_strings(compress(data['Title'], keep))
+        device_codes, devices = encode_strings(compress(data['Device Type'], keep))
+        return {
+            'start_timestamps': parse_timestamps(list(compress(data['Start Time'], keep))),
+            'durations_seconds': durations_seconds[keep],
+            'profile_codes': profile_codes,
+            'title_codes': title_codes,
+            'device_codes': device_codes,
+            'profiles': profiles,
+            'titles': titles,
+            'devices': devices,
+        }
 
-        return shows
+    @property
+    def indexes_by_profile(self) -> Dict[Optional[str], YearlyGroupIndex[View]]:
+        return self.load_by_year('indexes_by_profile', lambda: get_indexes_by_profile(self.load_cached('views', self.load_views)))
+
+    @property
+    def profiles(self) -> List[str]:
+        """
+        Every profile with views, most watched first
+        """
+        indexes_by_profile = self.indexes_by_profile
+        profiles = [profile for profile in indexes_by_profile if profile is not None]
+        profiles.sort(key=lambda profile: indexes_by_profile[profile].get(None).total, reverse=True)
+        return profiles
+
+    @property
+    def yearly_index(self) -> YearlyGroupIndex[View]:
+        """
+        Index of the selected profile's views, or of every profile's when no profile is set
+        """
+        index = self.indexes_by_profile.get(self.profile or None)
+        if index is None:
+            return new_yearly_index(views=[])
+        return index
+
+    @property
+    def years(self) -> List[int]:
+        return self.yearly_index.years
+
+    @cached_property
+    def index(self) -> GroupIndex[View]:
+        return self.yearly_index.get(self.year)
+
+    @cached_property
+    def shows(self) -> List[Show]:
+        return get_shows(
+            views_by_show_id=self.index.items_by_entity['show'],
+            duration_seconds_by_show_id=self.index.totals_by_entity['show'],
+        )
 
     def get_most_viewed_shows_by_duration_seconds(self) -> List[Show]:
         shows = self.shows
@@ -61,54 +109,148 @@ class ViewsParser(CsvParser):
         return shows
 
     def get_view_duration_seconds(self) -> int:
-        return sum([view.duration_seconds for view in self.views])
+        return self.index.total
 
     def get_views_by_weekday(self) -> List[List[View]]:
-        views_by_weekday = [[] for _ in range(7)]
-        for view in self.views:
-            views_by_weekday[view.start_time.weekday()].append(view)
-        return views_by_weekday
+        return self.index.items_by_weekday
 
     def get_view_duration_by_weekday(self) -> List[int]:
-        views_by_weekday = self.get_views_by_weekday()
-        view_duration_by_weekday = [0]*7
-        for weekday in range(7):
-            views = views_by_weekday[weekday]
-            view_duration_by_weekday[weekday] = sum([view.duration_seconds for view in views])
-
-        return view_duration_by_weekday
+        return self.index.totals_by_weekday
 
     def get_views_by_month(self) -> List[List[View]]:
         """
         Index 0 represents January, 11 represents December
         """
-        views_by_month = [[] for _ in range(12)]
-        for view in self.views:
-            views_by_month[view.start_time.month-1].append(view)
-        return views_by_month
+        return self.index.items_by_month
 
     def get_view_duration_by_month(self) -> List[int]:
-        views_by_month = self.get_views_by_month()
-        view_duration_by_month = [0]*12
-        for month in range(12):
-            views = views_by_month[month]
-            view_duration_by_month[month] = sum([view.duration_seconds for view in views])
-
-        return view_duration_by_month
+        return self.index.totals_by_month
 
     def get_shows_by_month(self) -> List[List[Show]]:
         shows_by_month = [[] for _ in range(12)]
-        views_by_month = self.get_views_by_month()
-        for month in range(len(views_by_month)):
-            views = views_by_month[month]
-            map = {}
-            for view in views_by_month[month]:
-                title = view.show_title or DEFAULT_SHOW_TITLE
-                map[title] = map.get(title, []) + [view]
-            shows = []
-            for show_title in list(map.keys()):
-                shows.append(Show(title=show_title, views=map[show_title]))
+        for month in range(12):
+            shows = get_shows(
+                views_by_show_id=self.index.items_by_month_entity['show'][month],
+                duration_seconds_by_show_id=self.index.totals_by_month_entity['show'][month],
+            )
             shows.sort(key=lambda show: show.duration_seconds, reverse=True)
             shows_by_month[month] = shows
 
         return shows_by_month
+
+    @property
+    def sketches_by_profile(self) -> Dict[Optional[str], SketchIndex]:
+        return self.load_by_year('sketches_by_profile', lambda: get_sketches_by_profile(self.iter_rows(names=CSV_COLUMNS)))
+
+    @property
+    def sketches(self) -> SketchIndex:
+        """
+        Sketches of every month of the selected profile's views, or of every profile's when no profile is set, built
+        from the export one row at a time
+        """
+        return self.sketches_by_profile.get(self.profile or None) or SketchIndex(entities=['show'])
+
+    def get_most_viewed_shows_by_duration_seconds_estimate(self, limit: int = 10) -> List[HeavyHitter[str]]:
+        """
+        Approximate get_most_viewed_shows_by_duration_seconds()[:limit], keyed by show title with counts in seconds
+        """
+        return self.sketches.get(year=self.year or None).top('show', limit)
+
+    def get_show_counts_by_month_estimate(self) -> List[int]:
+        """
+        Approximate number of different shows watched each month
+        """
+        return self.sketches.count_distinct_by_month('show', year=self.year or None)
+
+
+def new_yearly_index(views: List[View]) -> YearlyGroupIndex[View]:
+    return YearlyGroupIndex(
+        items=views,
+        get_timestamp=lambda view: view.start_timestamp,
+        get_value=lambda view: view.duration_seconds,
+        get_entities={'show': lambda view: view.show_id},
+    )
+
+
+def get_indexes_by_profile(views: List[View]) -> Dict[Optional[str], YearlyGroupIndex[View]]:
+    """
+    Yearly index of every profile's views, plus one of all views under None, built in a single pass
+    """
+    indexes_by_profile_id: Dict[Optional[int], YearlyGroupIndex[View]] = {None: new_yearly_index(views=[])}
+    for view in views:
+        date = to_datetime(view.start_timestamp)
+        index = indexes_by_profile_id.get(view.profile_id)
+        if index is None:
+            index = indexes_by_profile_id[view.profile_id] = new_yearly_index(views=[])
+        index.add(view, date=date)
+        indexes_by_profile_id[None].add(view, date=date)
+    return {
+        symbols[profile_id] if profile_id is not None else None: index
+        for profile_id, index in indexes_by_profile_id.items()
+    }
+
+
+def get_shows(views_by_show_id: Dict[int, List[View]], duration_seconds_by_show_id: Dict[int, int]) -> List[Show]:
+    return [
+        Show(title=symbols[show_id], views=views, view_duration_seconds=duration_seconds_by_show_id[show_id])
+        for show_id, views in views_by_show_id.items()
+    ]
+
+
+def get_sketches_by_profile(rows: Iterable[Tuple[str, ...]]) -> Dict[Optional[str], SketchIndex]:
+    """
+    Sketches of every profile's views, plus one of all views under None, skipping the same views as
+    parse_view_columns. `rows` hold the CSV_COLUMNS of every row.
+    """
+    sketches_by_profile: Dict[Optional[str], SketchIndex] = {None: SketchIndex(entities=['show'])}
+    for profile, start_time, duration, title, supplemental_video_type, _ in rows:
+        h, m, s = duration.split(':')
+        duration_seconds = int(h) * 3600 + int(m) * 60 + int(s)
+        if supplemental_video_type or duration_seconds <= FIVE_MINUTES_IN_SECONDS:
+            continue
+        date = to_datetime(parse_timestamp(start_time))
+        keys = {'show': get_show_title(title) or DEFAULT_SHOW_TITLE}
+        index = sketches_by_profile.get(profile)
+        if index is None:
+            index = sketches_by_profile[profile] = SketchIndex(entities=['show'])
+        index.add(year=date.year, month=date.month, keys=keys, weight=duration_seconds)
+        sketches_by_profile[None].add(year=date.year, month=date.month, keys=keys, weight=duration_seconds)
+    return sketches_by_profile
+
+
+def parse_durations(durations: List[str]) -> np.ndarray:
+    """
+    Seconds in each `hours:minutes:seconds` duration, converted all at once
+    """
+    if not durations:
+        return np.zeros(0, dtype=np.int64)
+    parts = np.array(':'.join(durations).split(':'), dtype=np.int64).reshape(-1, 3)
+    return parts @ np.array([3600, 60, 1], dtype=np.int64)
+
+
+def views_from_columns(snapshot: Snapshot) -> List[View]:
+    """
+    Supplemental videos are filtered out before views are saved, so none of them have a supplemental video type
+    """
+    profile_ids = symbols.get_ids(snapshot['profiles']).tolist()
+    titles = snapshot['titles'].tolist()
+    show_ids = [get_show_id(title) for title in titles]
+    device_ids = symbols.get_ids(snapshot['devices']).tolist()
+    return [
+        View(
+            profile_id=profile_ids[profile_code],
+            start_timestamp=start_timestamp,
+            duration_seconds=duration_seconds,
+            title=titles[title_code],
+            show_id=show_ids[title_code],
+            device_id=device_ids[device_code],
+            supplemental_video_type=None,
+        )
+        for start_timestamp, duration_seconds, profile_code, title_code, device_code in zip(
+            snapshot['start_timestamps'].tolist(),
+            snapshot['durations_seconds'].tolist(),
+            snapshot['profile_codes'].tolist(),
+            snapshot['title_codes'].tolist(),
+            snapshot['device_codes'].tolist(),
+        )
+    ]
@@ -0,0 +1,229 @@
+"""
+Binary columnar snapshots of parsed exports. A snapshot is a single file holding a JSON header followed by raw NumPy
+arrays, and is opened with a memory map so loading it takes the same time whatever the size of the export, and every
+process reading it shares the operating system's page cache.
+
+Columns are either NumPy arrays or lists of strings. Lists of strings are stored as a string table: the UTF-8 bytes of
+every string back to back, and the offset of where each one starts.
+"""
+
+import json
+import os
+import numpy as np
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+from parsers.archives import get_file_stat
+
+MAGIC = b'YIRSNAP1'
+VERSION = 2  # Bump whenever the columns written by any parser change, so old snapshots are rebuilt
+ALIGNMENT = 64
+
+Column = Union[np.ndarray, Sequence[str]]
+
+
+class StringTable(Sequence):
+    """
+    Read-only list of strings decoded from a string table on access
+    """
+
+    def __init__(self, offsets: np.ndarray, data: np.ndarray) -> None:
+        self.offsets = offsets
+        self.data = data
+
+    @staticmethod
+    def from_strings(strings: Sequence[str]) -> 'StringTable':
+        encoded = [string.encode('utf-8') for string in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(string) for string in encoded], out=offsets[1:])
+        data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return StringTable(offsets=offsets, data=data)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self.tolist()[i]
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.tolist())
+
+    def tolist(self) -> List[str]:
+        data = self.data.tobytes()
+        offsets = self.offsets.tolist()
+        return [data[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+
+
+class Snapshot:
+    fingerprint: List[Any]
+    columns: Dict[str, Column]
+
+    def __init__(self, fingerprint: List[Any], columns: Dict[str, Column]) -> None:
+        self.fingerprint = fingerprint
+        self.columns = columns
+
+    def __getitem__(self, name: str) -> Column:
+        return self.columns[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    @staticmethod
+    def from_columns(fingerprint: List[Any], columns: Dict[str, Column]) -> 'Snapshot':
+        """
+        Snapshot held in memory rather than mapped from a file, with the same column types as one read from disk
+        """
+        return Snapshot(fingerprint=fingerprint, columns={
+            name: column if isinstance(column, (np.ndarray, StringTable)) else StringTable.from_strings(column)
+            for name, column in columns.items()
+        })
+
+
+def encode_strings(values: Iterable[str], codes_by_value: Optional[Dict[str, int]] = None) -> Tuple[np.ndarray, List[str]]:
+    """
+    Dictionary encodes repeated strings, returning a code for every value and the distinct values in order of first
+    appearance. Passing the same `codes_by_value` keeps codes consistent across several calls.
+    """
+    codes_by_value = {} if codes_by_value is None else codes_by_value
+    values = values if isinstance(values, list) else list(values)
+    for value in dict.fromkeys(values):
+        codes_by_value.setdefault(value, len(codes_by_value))
+    codes = np.fromiter(map(codes_by_value.__getitem__, values), dtype=np.int32, count=len(values))
+    return codes, list(codes_by_value.keys())
+
+
+def get_snapshot_fingerprint(filepaths: List[str]) -> List[Any]:
+    """
+    Name, modification time and size of every source file, so dropping in a new export invalidates the snapshot.
+    Files are listed in the order they were read into the snapshot.
+    """
+    fingerprint: List[Any] = [VERSION]
+    for filepath in filepaths:
+        mtime_ns, size = get_file_stat(filepath)
+        fingerprint.append([os.path.basename(filepath), mtime_ns, size])
+    return fingerprint
+
+
+def is_same_files(snapshot_fingerprint: List[Any], fingerprint: List[Any]) -> bool:
+    """
+    Whether both fingerprints cover the same unchanged files, whatever order they were read in
+    """
+    return snapshot_fingerprint[0] == fingerprint[0] and sorted(snapshot_fingerprint[1:]) == sorted(fingerprint[1:])
+
+
+def get_new_filepaths(snapshot_fingerprint: List[Any], filepaths: List[str], fingerprint: List[Any]) -> Optional[List[str]]:
+    """
+    Files that aren't in the snapshot yet, or None if any file that is in it has since changed or been removed
+    """
+    if snapshot_fingerprint[0] != fingerprint[0]:
+        return None
+    entries = [tuple(entry) for entry in fingerprint[1:]]
+    absorbed = {tuple(entry) for entry in snapshot_fingerprint[1:]}
+    if not absorbed.issubset(entries):
+        return None
+    return [filepath for filepath, entry in zip(filepaths, entries) if entry not in absorbed]
+
+
+def write_snapshot(path: str, fingerprint: List[Any], columns: Dict[str, Column]) -> None:
+    arrays: Dict[str, np.ndarray] = {}
+    strings: List[str] = []
+    for name, column in columns.items():
+        if isinstance(column, np.ndarray):
+            arrays[name] = np.ascontiguousarray(column)
+            continue
+        table = column if isinstance(column, StringTable) else StringTable.from_strings(column)
+        arrays['{0}.offsets'.format(name)] = np.ascontiguousarray(table.offsets)
+        arrays['{0}.data'.format(name)] = np.ascontiguousarray(table.data)
+        strings.append(name)
+
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset = align(offset + array.nbytes)
+    header = json.dumps({'fingerprint': fingerprint, 'arrays': layout, 'strings': strings}).encode('utf-8')
+    data_start = align(len(MAGIC) + 8 + len(header))
+
+    temporary_path = '{0}.{1}.tmp'.format(path, os.getpid())
+    with open(temporary_path, 'wb') as file:
+        file.write(MAGIC)
+        file.write(len(header).to_bytes(8, 'little'))
+        file.write(header)
+        for name, array in arrays.items():
+            file.seek(data_start + layout[name]['offset'])
+            file.write(array.tobytes())
+    os.replace(temporary_path, path)
+
+
+def read_snapshot(path: str, fingerprint: Optional[List[Any]] = None) -> Optional[Snapshot]:
+    """
+    Memory maps a snapshot, or returns None if it is missing, unreadable or was built from different files
+    """
+    try:
+        buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    except (OSError, ValueError):
+        return None
+    if bytes(buffer[:len(MAGIC)]) != MAGIC:
+        return None
+    header_length = int.from_bytes(bytes(buffer[len(MAGIC):len(MAGIC) + 8]), 'little')
+    try:
+        header = json.loads(bytes(buffer[len(MAGIC) + 8:len(MAGIC) + 8 + header_length]).decode('utf-8'))
+        if fingerprint is not None and header['fingerprint'] != fingerprint:
+            return None
+
+        data_start = align(len(MAGIC) + 8 + header_length)
+        arrays: Dict[str, np.ndarray] = {}
+        for name, layout in header['arrays'].items():
+            dtype = np.dtype(layout['dtype'])
+            count = int(np.prod(layout['shape'], dtype=np.int64))
+            start = data_start + layout['offset']
+            array = buffer[start:start + count * dtype.itemsize].view(dtype).reshape(layout['shape'])
+            arrays[name] = np.asarray(array)
+
+        columns: Dict[str, Column] = {}
+        for name in header['strings']:
+            columns[name] = StringTable(
+                offsets=arrays.pop('{0}.offsets'.format(name)),
+                data=arrays.pop('{0}.data'.format(name)),
+            )
+        columns.update(arrays)
+    except (ValueError, KeyError, UnicodeDecodeError):  # Truncated or corrupt, for example by a crash while writing it
+        return None
+    return Snapshot(fingerprint=header['fingerprint'], columns=columns)
+
+
+def open_snapshot(
+    path: str,
+    filepaths: List[str],
+    build: Callable[[], Dict[str, Column]],
+    append: Optional[Callable[[Snapshot, List[str]], Dict[str, Column]]] = None,
+) -> Snapshot:
+    """
+    Opens the snapshot at `path` if it was built from the current `filepaths`, otherwise rebuilds it with `build`.
+    When files were only added since, and `append` is given, it is called with the snapshot and the new files instead,
+    and returns the columns of both. When the snapshot can't be written (for example on a read-only disk) the freshly
+    built columns are used directly.
+    """
+    fingerprint = get_snapshot_fingerprint(filepaths)
+    snapshot = read_snapshot(path)
+    if snapshot is not None and is_same_files(snapshot.fingerprint, fingerprint):
+        return snapshot
+
+    new_filepaths = None
+    if snapshot is not None and append is not None:
+        new_filepaths = get_new_filepaths(snapshot.fingerprint, filepaths=filepaths, fingerprint=fingerprint)
+    if new_filepaths is not None:
+        columns = append(snapshot, new_filepaths)
+        fingerprint = snapshot.fingerprint + get_snapshot_fingerprint(new_filepaths)[1:]
+    else:
+        columns = build()
+    try:
+        write_snapshot(path, fingerprint=fingerprint, columns=columns)
+    except OSError:
+        print('Could not write snapshot {0}'.format(path))
+        return Snapshot.from_columns(fingerprint=fingerprint, columns=columns)
+    return read_snapshot(path, fingerprint=fingerprint) or Snapshot.from_columns(fingerprint=fingerprint, columns=columns)
+
+
+def align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
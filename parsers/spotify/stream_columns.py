@@ -0,0 +1,308 @@
+import numpy as np
+from itertools import islice
+from typing import Dict, Any, Iterable, List, Iterator, Optional, Sequence, Tuple, TypeVar
+from models.spotify.stream import Stream
+from models.symbols import symbols
+from models.timestamps import LocalTimeFields, get_local_time_fields, get_timezone, parse_timestamps
+from parsers import iter_json_array
+from parsers.snapshot import Column, Snapshot, encode_strings
+
+SKIPPED_THRESHOLD_MILLISECONDS = 10000
+BATCH_SIZE = 64 * 1024
+
+T = TypeVar('T')
+
+
+class StreamSequence(Sequence):
+    """
+    Read-only list of streams backed by columns, only creating a Stream object when an item is accessed
+    """
+
+    def __init__(self, columns: 'StreamColumns', indices: np.ndarray) -> None:
+        self.columns = columns
+        self.indices = indices
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return StreamSequence(columns=self.columns, indices=self.indices[i])
+        return self.columns.get_stream(int(self.indices[i]))
+
+    def __iter__(self) -> Iterator[Stream]:
+        for index in self.indices.tolist():
+            yield self.columns.get_stream(index)
+
+
+class StreamColumns:
+    """
+    Streaming history stored as parallel arrays: end times as UTC epoch seconds, durations in milliseconds, and artists
+    and tracks as integer codes into name tables (codes are assigned in order of first appearance). `artist_ids` and
+    `track_ids` give the symbol id of every name in the tables.
+    """
+    end_timestamps: np.ndarray
+    durations_milliseconds: np.ndarray
+    artist_codes: np.ndarray
+    track_codes: np.ndarray
+    artist_names: List[str]
+    track_names: List[str]
+    artist_ids: np.ndarray
+    track_ids: np.ndarray
+
+    def __init__(
+        self,
+        end_timestamps: np.ndarray,
+        durations_milliseconds: np.ndarray,
+        artist_codes: np.ndarray,
+        track_codes: np.ndarray,
+        artist_names: List[str],
+        track_names: List[str],
+        artist_ids: Optional[np.ndarray] = None,
+        track_ids: Optional[np.ndarray] = None,
+    ) -> None:
+        self.end_timestamps = end_timestamps
+        self.durations_milliseconds = durations_milliseconds
+        self.artist_codes = artist_codes
+        self.track_codes = track_codes
+        self.artist_names = artist_names
+        self.track_names = track_names
+        self.artist_ids = symbols.get_ids(artist_names) if artist_ids is None else artist_ids
+        self.track_ids = symbols.get_ids(track_names) if track_ids is None else track_ids
+        self.local_time_by_timezone: Dict[str, LocalTimeFields] = {}
+
+    @staticmethod
+    def from_json(data: Iterable[Dict[str, Any]]) -> 'StreamColumns':
+        """
+        Converts records in batches, so when `data` is a generator only one batch of raw records is in memory at a time
+        """
+        artist_codes_by_name: Dict[str, int] = {}
+        track_codes_by_name: Dict[str, int] = {}
+        batches = []
+        for batch in iter_batches(data, size=BATCH_SIZE):
+            batches.append(StreamColumns(
+                end_timestamps=parse_timestamps([stream_data['endTime'] for stream_data in batch]),
+                durations_milliseconds=np.fromiter((stream_data['msPlayed'] for stream_data in batch), dtype=np.int64, count=len(batch)),
+                artist_codes=encode_strings((stream_data['artistName'] for stream_data in batch), codes_by_value=artist_codes_by_name)[0],
+                track_codes=encode_strings((stream_data['trackName'] for stream_data in batch), codes_by_value=track_codes_by_name)[0],
+                artist_names=[],
+                track_names=[],
+            ))
+        return StreamColumns(
+            end_timestamps=np.concatenate([batch.end_timestamps for batch in batches] or [np.zeros(0, dtype=np.int64)]),
+            durations_milliseconds=np.concatenate([batch.durations_milliseconds for batch in batches] or [np.zeros(0, dtype=np.int64)]),
+            artist_codes=np.concatenate([batch.artist_codes for batch in batches] or [np.zeros(0, dtype=np.int32)]),
+            track_codes=np.concatenate([batch.track_codes for batch in batches] or [np.zeros(0, dtype=np.int32)]),
+            artist_names=list(artist_codes_by_name.keys()),
+            track_names=list(track_codes_by_name.keys()),
+        )
+
+    @staticmethod
+    def from_file(filepath: str) -> 'StreamColumns':
+        return StreamColumns.from_json(data=iter_json_array(filepath))
+
+    @staticmethod
+    def concatenate(chunks: List['StreamColumns']) -> 'StreamColumns':
+        """
+        Joins columns built separately (for example one per file), re-coding their names into shared tables. Codes stay
+        in order of first appearance, exactly as if the chunks had been built in one go.
+        """
+        artist_codes_by_name: Dict[str, int] = {}
+        track_codes_by_name: Dict[str, int] = {}
+        artist_codes = []
+        track_codes = []
+        for chunk in chunks:
+            artist_codes.append(encode_strings(chunk.artist_names, codes_by_value=artist_codes_by_name)[0][chunk.artist_codes])
+            track_codes.append(encode_strings(chunk.track_names, codes_by_value=track_codes_by_name)[0][chunk.track_codes])
+        return StreamColumns(
+            end_timestamps=np.concatenate([chunk.end_timestamps for chunk in chunks] or [np.zeros(0, dtype=np.int64)]),
+            durations_milliseconds=np.concatenate([chunk.durations_milliseconds for chunk in chunks] or [np.zeros(0, dtype=np.int64)]),
+            artist_codes=np.concatenate(artist_codes or [np.zeros(0, dtype=np.int32)]),
+            track_codes=np.concatenate(track_codes or [np.zeros(0, dtype=np.int32)]),
+            artist_names=list(artist_codes_by_name.keys()),
+            track_names=list(track_codes_by_name.keys()),
+        )
+
+    @staticmethod
+    def from_snapshot(snapshot: Snapshot) -> 'StreamColumns':
+        return StreamColumns(
+            end_timestamps=snapshot['end_timestamps'],
+            durations_milliseconds=snapshot['durations_milliseconds'],
+            artist_codes=snapshot['artist_codes'],
+            track_codes=snapshot['track_codes'],
+            artist_names=snapshot['artist_names'].tolist(),
+            track_names=snapshot['track_names'].tolist(),
+        )
+
+    def to_snapshot_columns(self) -> Dict[str, Column]:
+        return {
+            'end_timestamps': self.end_timestamps,
+            'durations_milliseconds': self.durations_milliseconds,
+            'artist_codes': self.artist_codes,
+            'track_codes': self.track_codes,
+            'artist_names': self.artist_names,
+            'track_names': self.track_names,
+        }
+
+    def __len__(self) -> int:
+        return len(self.end_timestamps)
+
+    @property
+    def local_time(self) -> LocalTimeFields:
+        """
+        End times broken into calendar fields in the current display timezone
+        """
+        timezone = str(get_timezone())
+        if timezone not in self.local_time_by_timezone:
+            self.local_time_by_timezone[timezone] = get_local_time_fields(self.end_timestamps)
+        return self.local_time_by_timezone[timezone]
+
+    @property
+    def skipped(self) -> np.ndarray:
+        return self.durations_milliseconds < SKIPPED_THRESHOLD_MILLISECONDS
+
+    def filter(self, mask: np.ndarray) -> 'StreamColumns':
+        """
+        Keeps the rows selected by a boolean mask or array of indices, sharing the name tables so codes stay comparable.
+        Local times already computed are kept rather than computed again.
+        """
+        columns = StreamColumns(
+            end_timestamps=self.end_timestamps[mask],
+            durations_milliseconds=self.durations_milliseconds[mask],
+            artist_codes=self.artist_codes[mask],
+            track_codes=self.track_codes[mask],
+            artist_names=self.artist_names,
+            track_names=self.track_names,
+            artist_ids=self.artist_ids,
+            track_ids=self.track_ids,
+        )
+        columns.local_time_by_timezone = {
+            timezone: LocalTimeFields(years=fields.years[mask], months=fields.months[mask], weekdays=fields.weekdays[mask], hours=fields.hours[mask])
+            for timezone, fields in self.local_time_by_timezone.items()
+        }
+        return columns
+
+    def get_record_keys(self, rows: np.ndarray) -> Iterator[Tuple[int, str, str, int]]:
+        """
+        End time, artist, track and duration of each row, which together identify a stream. Names are used rather
+        than symbol ids since columns read in a worker process carry that process's ids until they are concatenated.
+        """
+        artist_names = self.artist_names
+        track_names = self.track_names
+        return zip(
+            self.end_timestamps[rows].tolist(),
+            [artist_names[code] for code in self.artist_codes[rows].tolist()],
+            [track_names[code] for code in self.track_codes[rows].tolist()],
+            self.durations_milliseconds[rows].tolist(),
+        )
+
+    def drop_duplicates(self, other: 'StreamColumns') -> 'StreamColumns':
+        """
+        Rows that aren't also in `other`, as happens when exports requested at different times overlap. Only the rows
+        of `other` within the time span of these rows are compared, so the cost follows the size of these rows rather
+        than of `other`.
+        """
+        if len(self) == 0 or len(other) == 0:
+            return self
+        overlapping = np.flatnonzero(
+            (other.end_timestamps >= self.end_timestamps.min()) & (other.end_timestamps <= self.end_timestamps.max())
+        )
+        if len(overlapping) == 0:
+            return self
+        existing = set(other.get_record_keys(overlapping))
+        keep = np.fromiter((key not in existing for key in self.get_record_keys(np.arange(len(self)))), dtype=np.bool_, count=len(self))
+        return self if keep.all() else self.filter(keep)
+
+    def partition_years(self) -> Dict[int, 'StreamColumns']:
+        """
+        Splits the rows by year in the display timezone in a single pass, keeping their order
+        """
+        years, inverse = np.unique(self.local_time.years, return_inverse=True)
+        return {
+            year: self.filter(indices)
+            for year, indices in zip(years.tolist(), group_indices(inverse.reshape(-1), len(years)))
+        }
+
+    def get_stream(self, index: int) -> Stream:
+        return Stream(
+            end_timestamp=int(self.end_timestamps[index]),
+            artist_id=int(self.artist_ids[self.artist_codes[index]]),
+            track_id=int(self.track_ids[self.track_codes[index]]),
+            duration_milliseconds=int(self.durations_milliseconds[index]),
+        )
+
+    def get_stream_list(self) -> List[Stream]:
+        artist_ids = self.artist_ids.tolist()  # One int object per name, shared by every stream with that name
+        track_ids = self.track_ids.tolist()
+        return [
+            Stream(
+                end_timestamp=end_timestamp,
+                artist_id=artist_ids[artist_code],
+                track_id=track_ids[track_code],
+                duration_milliseconds=duration_milliseconds,
+            )
+            for end_timestamp, artist_code, track_code, duration_milliseconds in zip(
+                self.end_timestamps.tolist(),
+                self.artist_codes.tolist(),
+                self.track_codes.tolist(),
+                self.durations_milliseconds.tolist(),
+            )
+        ]
+
+    def get_track_keys(self) -> Tuple[np.ndarray, List[str], List[str]]:
+        """
+        Codes of (artist, track) pairs, so songs with the same name by different artists are separate tracks, along
+        with the track and artist name of every pair. Pairs are numbered in order of first appearance.
+        """
+        pairs = self.artist_codes.astype(np.int64) * max(len(self.track_names), 1) + self.track_codes
+        unique_pairs, first_indices, inverse = np.unique(pairs, return_index=True, return_inverse=True)
+        order = np.argsort(first_indices, kind='stable')
+        codes = np.empty(len(order), dtype=np.int32)
+        codes[order] = np.arange(len(order), dtype=np.int32)
+        artist_codes, track_codes = np.divmod(unique_pairs[order], max(len(self.track_names), 1))
+        return (
+            codes[inverse.reshape(-1)],
+            [self.track_names[code] for code in track_codes.tolist()],
+            [self.artist_names[code] for code in artist_codes.tolist()],
+        )
+
+    def get_streams(self, indices: np.ndarray) -> StreamSequence:
+        return StreamSequence(columns=self, indices=indices)
+
+
+def iter_batches(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def group_indices(keys: np.ndarray, num_groups: int) -> List[np.ndarray]:
+    """
+    Row indices for every key from 0 to num_groups - 1, in their original order
+    """
+    order = np.argsort(keys, kind='stable')
+    counts = np.bincount(keys, minlength=num_groups)
+    return np.split(order, np.cumsum(counts)[:-1])
+
+
+def group_rows(keys: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, List[np.ndarray]]:
+    """
+    Groups rows by key, returning the distinct keys in order of first appearance along with the sum of values and the
+    row indices of each group
+    """
+    unique_keys, first_indices, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    totals = np.bincount(inverse, weights=values, minlength=len(unique_keys)).astype(np.int64)
+    indices = group_indices(inverse, len(unique_keys))
+    order = np.argsort(first_indices, kind='stable')
+    return unique_keys[order], totals[order], [indices[i] for i in order.tolist()]
+
+
+def milliseconds_to_seconds(milliseconds: np.ndarray) -> np.ndarray:
+    """
+    Same rounding as int(round(milliseconds / 1000, 0)) on every element
+    """
+    return np.round(milliseconds / 1000).astype(np.int64)
@@ -1,57 +1,148 @@
+import functools
+import os
+import numpy as np
 from cached_property import cached_property
-from typing import Dict, Any, List, Optional
-from parsers import MultiJsonParser
+from typing import Callable, Dict, Any, Hashable, List, Optional, Sequence, Tuple, Type, TypeVar
+from parsers import MultiJsonParser, iter_json_array
+from parsers.group_index import GroupIndex, YearlyGroupIndex
+from parsers.sketches import HeavyHitter, SketchIndex
+from parsers.snapshot import Column, Snapshot
+from parsers.spotify.stream_columns import BATCH_SIZE, StreamColumns, group_indices, group_rows, iter_batches, milliseconds_to_seconds
 from models.spotify.stream import Stream
 from models.spotify.artist import Artist
 from models.spotify.track import Track
+from models.timestamps import get_local_time_fields, get_timezone, parse_timestamps, set_timezone
 
 FIVE_MINUTES_IN_SECONDS = 5 * 60
+SKETCH_ENTITIES = ['artist', 'track']
+
+Group = TypeVar('Group', Artist, Track)
 
 
 class StreamingHistoryParser(MultiJsonParser):
 
-    def __init__(self, year: Optional[int]=None) -> None:
+    def __init__(self, year: Optional[int]=None, workers: Optional[int]=None, data_root: Optional[str]=None) -> None:
         super().__init__(
             relative_path_to_directory='data/spotify/MyData',
             filename_prefix='StreamingHistory',
             year=year,
+            workers=workers,
+            data_root=data_root,
         )
 
-    @cached_property
-    def streams(self) -> List[Stream]:
-        streams = []
-        for stream_data in self.data:
-            stream = Stream.from_json(data=stream_data)
-            if self.year and stream.end_time.year != self.year:
-                continue
-            streams.append(stream)
-        return streams
+    @property
+    def snapshot(self) -> Snapshot:
+        return self.load_snapshot(
+            'streams',
+            build=lambda: self.absorb_files(snapshot=None, filepaths=self.filepaths),
+            append=lambda snapshot, filepaths: self.absorb_files(snapshot=snapshot, filepaths=filepaths),
+        )
+
+    def absorb_files(self, snapshot: Optional[Snapshot], filepaths: List[str]) -> Dict[str, Column]:
+        """
+        Columns of the streams already in `snapshot` (if any) followed by those of `filepaths`. Only the new files are
+        parsed, and their streams that were already absorbed from another file are left out, so an export requested
+        again later can be dropped in next to the previous one. `file_row_ends` records where the streams of each file
+        end, in the order the files were absorbed.
+        """
+        absorbed = [] if snapshot is None else [StreamColumns.from_snapshot(snapshot)]
+        file_row_ends = [] if snapshot is None else snapshot['file_row_ends'].tolist()
+        rows = file_row_ends[-1] if file_row_ends else 0
+        chunks = []
+        for chunk in self.map_files(StreamColumns.from_file, filepaths=filepaths):
+            for previous in absorbed + chunks:
+                chunk = chunk.drop_duplicates(previous)
+            chunks.append(chunk)
+            rows += len(chunk)
+            file_row_ends.append(rows)
+
+        columns = StreamColumns.concatenate(absorbed + chunks).to_snapshot_columns()
+        columns['file_row_ends'] = np.array(file_row_ends, dtype=np.int64)
+        return columns
+
+    def get_absorbed_rows(self, filepaths: List[str]) -> Optional[int]:
+        """
+        How many streams at the start of the snapshot came from `filepaths`, or None if they weren't the first files
+        absorbed
+        """
+        names = sorted(os.path.basename(filepath) for filepath in filepaths)
+        absorbed_names = sorted(entry[0] for entry in self.snapshot.fingerprint[1:len(names) + 1])
+        if not names or names != absorbed_names:
+            return None
+        return int(self.snapshot['file_row_ends'][len(names) - 1])
 
     @cached_property
-    def artists(self) -> List[Artist]:
-        map = {}
-        for stream in self.streams:
-            artist_name = stream.artist_name
-            map[artist_name] = map.get(artist_name, []) + [stream]
+    def stream_columns(self) -> StreamColumns:
+        """
+        Every year of streaming history, read from the export's snapshot
+        """
+        return self.load_cached('stream_columns', lambda: StreamColumns.from_snapshot(self.snapshot))
 
-        artists = []
-        for artist_name in list(map.keys()):
-            artists.append(Artist(name=artist_name, streams=map[artist_name]))
+    def load_streams(self) -> List[Stream]:
+        """
+        Every stream in snapshot order. When files were added, only the new streams are created.
+        """
+        return self.load_cached('streams', self.stream_columns.get_stream_list, extend=self.extend_streams)
 
-        return artists
+    def extend_streams(self, streams: List[Stream], filepaths: List[str]) -> Optional[List[Stream]]:
+        start = self.get_absorbed_rows(filepaths)
+        if start != len(streams):
+            return None
+        new_columns = self.stream_columns.filter(np.arange(start, len(self.stream_columns)))
+        return streams + new_columns.get_stream_list()
+
+    @property
+    def yearly_index(self) -> YearlyGroupIndex[Stream]:
+        return self.load_by_year('index', lambda: YearlyGroupIndex(
+            items=self.load_streams(),
+            get_timestamp=lambda stream: stream.end_timestamp,
+            get_value=lambda stream: stream.duration_milliseconds,
+            get_entities={
+                'artist': lambda stream: stream.artist_id,
+                'track': lambda stream: stream.artist_id << 32 | stream.track_id,  # Same-named songs by different artists are separate tracks
+            },
+        ), extend=self.extend_yearly_index)
+
+    def extend_yearly_index(self, yearly_index: YearlyGroupIndex[Stream], filepaths: List[str]) -> Optional[YearlyGroupIndex[Stream]]:
+        """
+        Adds the streams of the files absorbed after `filepaths` to the index built from them
+        """
+        start = self.get_absorbed_rows(filepaths)
+        if start != yearly_index.get(None).count:
+            return None
+        for stream in self.load_streams()[start:]:
+            yearly_index.add(stream)
+        return yearly_index
+
+    @property
+    def years(self) -> List[int]:
+        return self.yearly_index.years
 
     @cached_property
-    def tracks(self) -> List[Track]:
-        map = {}
-        for stream in self.streams:
-            track_name = stream.track_name
-            map[track_name] = map.get(track_name, []) + [stream]
+    def index(self) -> GroupIndex[Stream]:
+        return self.yearly_index.get(self.year)
 
-        tracks = []
-        for track_name in list(map.keys()):
-            tracks.append(Track(name=track_name, streams=map[track_name]))
+    @cached_property
+    def streams(self) -> List[Stream]:
+        return self.index.items
 
-        return tracks
+    @cached_property
+    def artists(self) -> List[Artist]:
+        streams_by_id = self.index.items_by_entity['artist']
+        milliseconds_by_id = self.index.totals_by_entity['artist']
+        return [
+            Artist(name=streams[0].artist_name, streams=streams, streamed_duration_milliseconds=milliseconds_by_id[artist_id])
+            for artist_id, streams in streams_by_id.items()
+        ]
+
+    @cached_property
+    def tracks(self) -> List[Track]:
+        streams_by_key = self.index.items_by_entity['track']
+        milliseconds_by_key = self.index.totals_by_entity['track']
+        return [
+            Track(name=streams[0].track_name, streams=streams, streamed_duration_milliseconds=milliseconds_by_key[key])
+            for key, streams in streams_by_key.items()
+        ]
 
     def get_most_streamed_artists_by_duration(self) -> List[Artist]:
         artists = self.artists
@@ -74,71 +165,209 @@ class StreamingHistoryParser(MultiJsonParser):
         return artists
 
     def get_streams_by_weekday(self) -> List[List[Stream]]:
-        streams_by_weekday = [[] for _ in range(7)]
-        for stream in self.streams:
-            streams_by_weekday[stream.end_time.weekday()].append(stream)
-        return streams_by_weekday
+        return self.index.items_by_weekday
 
     def get_stream_duration_by_weekday(self) -> List[int]:
-        streams_by_weekday = self.get_streams_by_weekday()
-        stream_duration_by_weekday = [0]*7
-        for weekday in range(7):
-            streams = streams_by_weekday[weekday]
-            stream_duration_by_weekday[weekday] = int(round(sum([stream.duration_milliseconds / 1000 for stream in streams]), 0))
-
-        return stream_duration_by_weekday
+        return [int(round(milliseconds / 1000, 0)) for milliseconds in self.index.totals_by_weekday]
 
     def get_streams_by_month(self) -> List[List[Stream]]:
-        streams_by_month = [[] for _ in range(12)]
-        for stream in self.streams:
-            streams_by_month[stream.end_time.month-1].append(stream)
-        return streams_by_month
+        return self.index.items_by_month
 
     def get_stream_duration_by_month(self) -> List[int]:
-        streams_by_month = self.get_streams_by_month()
-        stream_duration_by_month = [0]*12
-        for month in range(12):
-            streams = streams_by_month[month]
-            stream_duration_by_month[month] = int(round(sum([stream.duration_milliseconds / 1000 for stream in streams]), 0))
-
-        return stream_duration_by_month
+        return [int(round(milliseconds / 1000, 0)) for milliseconds in self.index.totals_by_month]
 
     def get_artists_by_month(self, min_threshold_stream_duration_seconds:int=0) -> List[List[Artist]]:
-        artists_by_month = [[] for _ in range(12)]
-        streams_by_month = self.get_streams_by_month()
-        for month in range(len(streams_by_month)):
-            streams = streams_by_month[month]
-            map = {}
-            for stream in streams_by_month[month]:
-                artist_name = stream.artist_name
-                map[artist_name] = map.get(artist_name, []) + [stream]
-            artists = []
-            for artist_name in list(map.keys()):
-                artist = Artist(name=artist_name, streams=map[artist_name])
-                if artist.streamed_duration_seconds < min_threshold_stream_duration_seconds:
+        return self.group_streams_by_month(
+            entity='artist',
+            model=Artist,
+            get_name=lambda stream: stream.artist_name,
+            min_threshold_stream_duration_seconds=min_threshold_stream_duration_seconds,
+        )
+
+    def get_tracks_by_month(self, min_threshold_stream_duration_seconds:int=0) -> List[List[Track]]:
+        return self.group_streams_by_month(
+            entity='track',
+            model=Track,
+            get_name=lambda stream: stream.track_name,
+            min_threshold_stream_duration_seconds=min_threshold_stream_duration_seconds,
+        )
+
+    def group_streams_by_month(self, entity: str, model: Type[Group], get_name: Callable[[Stream], str], min_threshold_stream_duration_seconds: int) -> List[List[Group]]:
+        groups_by_month = [[] for _ in range(12)]
+        for month in range(12):
+            streams_by_key = self.index.items_by_month_entity[entity][month]
+            milliseconds_by_key = self.index.totals_by_month_entity[entity][month]
+            groups = []
+            for key, streams in streams_by_key.items():
+                group = model(name=get_name(streams[0]), streams=streams, streamed_duration_milliseconds=milliseconds_by_key[key])
+                if group.streamed_duration_seconds < min_threshold_stream_duration_seconds:
                     continue
-                artists.append(artist)
-            artists.sort(key=lambda artist: artist.streamed_duration_seconds, reverse=True)
-            artists_by_month[month] = artists
+                groups.append(group)
+            groups.sort(key=lambda group: group.streamed_duration_seconds, reverse=True)
+            groups_by_month[month] = groups
+
+        return groups_by_month
+
+    @property
+    def sketches(self) -> SketchIndex:
+        """
+        Sketches of every month, built from the raw files one record at a time without creating any Stream. Their
+        memory doesn't grow with the length of the history.
+        """
+        return self.load_by_year('sketches', lambda: SketchIndex.merge_all(
+            self.map_files(functools.partial(get_stream_sketches, timezone=str(get_timezone()))),
+            entities=SKETCH_ENTITIES,
+        ))
+
+    def get_most_streamed_artists_by_duration_estimate(self, limit: int = 10) -> List[HeavyHitter[str]]:
+        """
+        Approximate get_most_streamed_artists_by_duration()[:limit], keyed by artist name with counts in milliseconds
+        """
+        return self.sketches.get(year=self.year or None).top('artist', limit)
+
+    def get_most_streamed_tracks_by_duration_estimate(self, limit: int = 10) -> List[HeavyHitter[Tuple[str, str]]]:
+        """
+        Approximate get_most_streamed_tracks_by_duration()[:limit], keyed by (artist name, track name) with counts in
+        milliseconds
+        """
+        return self.sketches.get(year=self.year or None).top('track', limit)
+
+    def get_artist_counts_by_month_estimate(self) -> List[int]:
+        """
+        Approximate number of different artists streamed each month
+        """
+        return self.sketches.count_distinct_by_month('artist', year=self.year or None)
+
+    def get_track_counts_by_month_estimate(self) -> List[int]:
+        return self.sketches.count_distinct_by_month('track', year=self.year or None)
+
+
+def get_stream_sketches(filepath: str, timezone: str) -> SketchIndex:
+    """
+    Sketches of the streams in one file. Keys are names rather than symbol ids, so sketches built in other processes
+    can be merged with them.
+    """
+    if str(get_timezone()) != timezone:
+        set_timezone(timezone)
+    index = SketchIndex(entities=SKETCH_ENTITIES)
+    for batch in iter_batches(iter_json_array(filepath), size=BATCH_SIZE):
+        local_time = get_local_time_fields(parse_timestamps([stream_data['endTime'] for stream_data in batch]))
+        for stream_data, year, month in zip(batch, local_time.years.tolist(), local_time.months.tolist()):
+            index.add(
+                year=year,
+                month=month,
+                keys={'artist': stream_data['artistName'], 'track': (stream_data['artistName'], stream_data['trackName'])},
+                weight=stream_data['msPlayed'],
+            )
+    return index
 
-        return artists_by_month
+
+class ColumnarStreamingHistoryParser(StreamingHistoryParser):
+    """
+    Gives the same results as StreamingHistoryParser, but keeps streams in StreamColumns and answers every method with
+    vectorized group-bys instead of looping over Stream objects. Durations are summed in milliseconds.
+    """
+
+    @property
+    def columns_by_year(self) -> Dict[int, StreamColumns]:
+        return self.load_by_year('stream_columns', self.stream_columns.partition_years)
+
+    @property
+    def years(self) -> List[int]:
+        return sorted(self.columns_by_year)
+
+    @cached_property
+    def columns(self) -> StreamColumns:
+        if not self.year:
+            return self.stream_columns
+        if self.year not in self.columns_by_year:
+            return self.stream_columns.filter(np.zeros(0, dtype=np.int64))
+        return self.columns_by_year[self.year]
+
+    @cached_property
+    def streams(self) -> Sequence[Stream]:
+        return self.columns.get_streams(np.arange(len(self.columns)))
+
+    @cached_property
+    def artists(self) -> List[Artist]:
+        return self.group_columns(codes=self.columns.artist_codes, names=self.columns.artist_names, model=Artist)
+
+    @cached_property
+    def track_keys(self) -> Tuple[np.ndarray, List[str], List[str]]:
+        return self.columns.get_track_keys()
+
+    @cached_property
+    def tracks(self) -> List[Track]:
+        codes, names, _ = self.track_keys
+        return self.group_columns(codes=codes, names=names, model=Track)
+
+    def group_columns(self, codes: np.ndarray, names: List[str], model: Type[Group]) -> List[Group]:
+        codes, totals, indices = group_rows(keys=codes, values=self.columns.durations_milliseconds)
+        return [
+            model(name=names[code], streams=self.columns.get_streams(indices[i]), streamed_duration_milliseconds=total)
+            for i, (code, total) in enumerate(zip(codes.tolist(), totals.tolist()))
+        ]
+
+    def get_skipped_counts(self, codes: np.ndarray, keys: Sequence[Hashable]) -> Dict[Hashable, int]:
+        skipped_counts = np.bincount(codes[self.columns.skipped], minlength=len(keys))
+        return dict(zip(keys, skipped_counts.tolist()))
+
+    def get_most_skipped_tracks(self) -> List[Track]:
+        codes, names, artist_names = self.track_keys
+        skipped_counts = self.get_skipped_counts(codes=codes, keys=list(zip(artist_names, names)))
+        tracks = self.tracks
+        tracks.sort(key=lambda track: skipped_counts[(track.artist_name, track.name)], reverse=True)
+        return tracks
+
+    def get_most_skipped_artists(self) -> List[Artist]:
+        skipped_counts = self.get_skipped_counts(codes=self.columns.artist_codes, keys=self.columns.artist_names)
+        artists = self.artists
+        artists.sort(key=lambda artist: skipped_counts[artist.name], reverse=True)
+        return artists
+
+    def get_streams_by_weekday(self) -> List[Sequence[Stream]]:
+        return [self.columns.get_streams(indices) for indices in group_indices(self.columns.local_time.weekdays, 7)]
+
+    def get_stream_duration_by_weekday(self) -> List[int]:
+        milliseconds = np.bincount(self.columns.local_time.weekdays, weights=self.columns.durations_milliseconds, minlength=7)
+        return milliseconds_to_seconds(milliseconds).tolist()
+
+    def get_streams_by_month(self) -> List[Sequence[Stream]]:
+        return [self.columns.get_streams(indices) for indices in group_indices(self.columns.local_time.months - 1, 12)]
+
+    def get_stream_duration_by_month(self) -> List[int]:
+        milliseconds = np.bincount(self.columns.local_time.months - 1, weights=self.columns.durations_milliseconds, minlength=12)
+        return milliseconds_to_seconds(milliseconds).tolist()
+
+    def get_artists_by_month(self, min_threshold_stream_duration_seconds:int=0) -> List[List[Artist]]:
+        return self.group_columns_by_month(
+            codes=self.columns.artist_codes,
+            names=self.columns.artist_names,
+            model=Artist,
+            min_threshold_stream_duration_seconds=min_threshold_stream_duration_seconds,
+        )
 
     def get_tracks_by_month(self, min_threshold_stream_duration_seconds:int=0) -> List[List[Track]]:
-        tracks_by_month = [[] for _ in range(12)]
-        streams_by_month = self.get_streams_by_month()
-        for month in range(len(streams_by_month)):
-            streams = streams_by_month[month]
-            map = {}
-            for stream in streams_by_month[month]:
-                track_name = stream.track_name
-                map[track_name] = map.get(track_name, []) + [stream]
-            tracks = []
-            for track_name in list(map.keys()):
-                track = Track(name=track_name, streams=map[track_name])
-                if track.streamed_duration_seconds < min_threshold_stream_duration_seconds:
-                    continue
-                tracks.append(track)
-            tracks.sort(key=lambda track: track.streamed_duration_seconds, reverse=True)
-            tracks_by_month[month] = tracks
+        codes, names, _ = self.track_keys
+        return self.group_columns_by_month(
+            codes=codes,
+            names=names,
+            model=Track,
+            min_threshold_stream_duration_seconds=min_threshold_stream_duration_seconds,
+        )
+
+    def group_columns_by_month(self, codes: np.ndarray, names: List[str], model: Type[Group], min_threshold_stream_duration_seconds: int) -> List[List[Group]]:
+        num_codes = max(len(names), 1)
+        keys = (self.columns.local_time.months - 1) * num_codes + codes
+        keys, totals, indices = group_rows(keys=keys, values=self.columns.durations_milliseconds)
+        seconds = milliseconds_to_seconds(totals)
+        order = np.argsort(-seconds, kind='stable')
+        order = order[seconds[order] >= min_threshold_stream_duration_seconds]
 
-        return tracks_by_month
+        groups_by_month = [[] for _ in range(12)]
+        for i in order.tolist():
+            month, code = divmod(int(keys[i]), num_codes)
+            groups_by_month[month].append(
+                model(name=names[code], streams=self.columns.get_streams(indices[i]), streamed_duration_milliseconds=int(totals[i]))
+            )
+        return groups_by_month
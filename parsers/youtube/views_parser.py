@@ -1,45 +1,67 @@
+import numpy as np
 from cached_property import cached_property
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterable, List, Optional
 from parsers import JsonParser
+from parsers.snapshot import Column, Snapshot, encode_strings
+from parsers.group_index import GroupIndex, YearlyGroupIndex
+from parsers.sketches import HeavyHitter, SketchIndex
 from models.youtube.view import View
 from models.youtube.channel import Channel
+from models.symbols import symbols
+from models.timestamps import parse_timestamp, to_datetime
 
 
 class ViewsParser(JsonParser):
 
-    def __init__(self, year: Optional[int]=None) -> None:
+    def __init__(self, year: Optional[int]=None, data_root: Optional[str]=None) -> None:
         super().__init__(
             relative_path='data/google/Takeout/YouTube and YouTube Music/history/watch-history.json',
             year=year,
+            data_root=data_root,
         )
 
     @cached_property
     def views(self) -> List[View]:
+        return self.index.items
+
+    @property
+    def snapshot(self) -> Snapshot:
+        return self.load_snapshot('views', lambda: views_to_columns(self.parse_views()))
+
+    def load_views(self) -> List[View]:
+        return views_from_columns(self.snapshot)
+
+    def parse_views(self) -> List[View]:
         views = []
-        for view_data in self.data:
+        for view_data in self.iter_data():
             view = View.from_json(data=view_data)
             if not view.url:
                 continue
             if not view.channel_name:
                 continue
-            if self.year is not None and view.date.year != self.year:
-                continue
             views.append(view)
         return views
 
-    @cached_property
-    def channels(self) -> List[Channel]:
-        map = {}
-        for view in self.views:
-            if not view.channel_name:
-                continue
-            map[view.channel_name] = map.get(view.channel_name, []) + [view]
+    @property
+    def yearly_index(self) -> YearlyGroupIndex[View]:
+        return self.load_by_year('index', lambda: YearlyGroupIndex(
+            items=self.load_cached('views', self.load_views),
+            get_timestamp=lambda view: view.timestamp,
+            get_entities={'channel': lambda view: view.channel_id},
+        ))
 
-        channels = []
-        for channel_name in list(map.keys()):
-            channels.append(Channel(name=channel_name, views=map[channel_name]))
+    @property
+    def years(self) -> List[int]:
+        return self.yearly_index.years
 
-        return channels
+    @cached_property
+    def index(self) -> GroupIndex[View]:
+        return self.yearly_index.get(self.year)
+
+    @cached_property
+    def channels(self) -> List[Channel]:
+        views_by_id = self.index.items_by_entity['channel']
+        return [Channel(name=symbols[channel_id], views=views) for channel_id, views in views_by_id.items()]
 
     def get_most_viewed_channels_by_count(self) -> List[Channel]:
         channels = self.channels
@@ -47,35 +69,79 @@ class ViewsParser(JsonParser):
         return channels[:10]
 
     def get_views_by_weekday(self) -> List[List[View]]:
-        views_by_weekday = [[] for _ in range(7)]
-        for view in self.views:
-            views_by_weekday[view.date.weekday()].append(view)
-        return views_by_weekday
+        return self.index.items_by_weekday
 
     def get_views_by_month(self) -> List[List[View]]:
-        views_by_month = [[] for _ in range(12)]
-        for view in self.views:
-            views_by_month[view.date.month - 1].append(view)
-        return views_by_month
+        return self.index.items_by_month
 
     def get_channels_by_month(self) -> List[List[Channel]]:
         channels_by_month = [[] for _ in range(12)]
-        views_by_month = self.get_views_by_month()
         for month in range(12):
-            views = views_by_month[month]
-            map = {}
-            for view in views_by_month[month]:
-                if not view.channel_name:
-                    continue
-                name = view.channel_name
-                map[name] = map.get(name, []) + [view]
-            channels = []
-            for channel_name in list(map.keys()):
-                channel_views = map[channel_name]
-                if len(channel_views) <= 1:
-                    continue
-                channels.append(Channel(name=channel_name, views=map[channel_name]))
+            views_by_id = self.index.items_by_month_entity['channel'][month]
+            view_counts_by_id = self.index.totals_by_month_entity['channel'][month]
+            channels = [
+                Channel(name=symbols[channel_id], views=views) for channel_id, views in views_by_id.items()
+                if view_counts_by_id[channel_id] > 1
+            ]
             channels.sort(key=lambda channel: len(channel.views), reverse=True)
             channels_by_month[month] = channels
 
         return channels_by_month
+
+    @property
+    def sketches(self) -> SketchIndex:
+        """
+        Sketches of every month, built from the raw export one view at a time
+        """
+        return self.load_by_year('sketches', lambda: get_view_sketches(self.iter_data()))
+
+    def get_most_viewed_channels_by_count_estimate(self, limit: int = 10) -> List[HeavyHitter[str]]:
+        """
+        Approximate get_most_viewed_channels_by_count()[:limit], keyed by channel name
+        """
+        return self.sketches.get(year=self.year or None).top('channel', limit)
+
+    def get_channel_counts_by_month_estimate(self) -> List[int]:
+        """
+        Approximate number of different channels viewed each month
+        """
+        return self.sketches.count_distinct_by_month('channel', year=self.year or None)
+
+
+def get_view_sketches(data: Iterable[Dict[str, Any]]) -> SketchIndex:
+    """
+    Skips the same views as parse_views: ones without a URL or a channel
+    """
+    index = SketchIndex(entities=['channel'])
+    for view_data in data:
+        subtitles = view_data.get('subtitles', [])
+        channel_name = subtitles[0]['name'] if len(subtitles) > 0 else None
+        if not view_data.get('titleUrl') or not channel_name:
+            continue
+        date = to_datetime(parse_timestamp(view_data['time']))
+        index.add(year=date.year, month=date.month, keys={'channel': channel_name})
+    return index
+
+
+def views_to_columns(views: List[View]) -> Dict[str, Column]:
+    channel_codes, channel_names = encode_strings(view.channel_name for view in views)
+    return {
+        'timestamps': np.array([view.timestamp for view in views], dtype=np.int64),
+        'titles': [view.title for view in views],
+        'urls': [view.url for view in views],
+        'channel_codes': channel_codes,
+        'channel_names': channel_names,
+    }
+
+
+def views_from_columns(snapshot: Snapshot) -> List[View]:
+    channel_ids = symbols.get_ids(snapshot['channel_names']).tolist()
+    return [
+        View(title=title, url=url, timestamp=timestamp, channel_id=channel_ids[channel_code])
+        for timestamp, title, url, channel_code in zip(
+            snapshot['timestamps'].tolist(),
+            snapshot['titles'].tolist(),
+            snapshot['urls'].tolist(),
+            snapshot['channel_codes'].tolist(),
+        )
+    ]
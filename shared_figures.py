@@ -0,0 +1,127 @@
+"""
+Shares the dashboard's rendered figures between the worker processes of a WSGI server. Each worker otherwise parses
+every export and aggregates it on its own, holding its own copy of the results. Instead, one loader renders every
+output the page can ask for, with charts as the series they are drawn from (see bar_chart in visualization.py), and
+writes them to a snapshot, which the workers memory map read-only, so its pages are held once by the operating system
+however many workers there are. Workers only draw the figures, or send the series for the browser to draw:
+
+    python3 ingest.py && python3 shared_figures.py
+    YEAR_IN_REVIEW_SHARED_FIGURES=1 gunicorn -w 4 visualization:server
+
+Figures are keyed like the figure cache, by the fingerprint of the exports they were made from and the display
+timezone, and the snapshot records the exports it was rendered from. Once any of them changes on disk the snapshot is
+stale and no longer read: workers render every output themselves, as without this module, until the loader is run
+again. Workers pick up a new snapshot on the next request. The dashboard only imports this module when
+YEAR_IN_REVIEW_SHARED_FIGURES is set.
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from parsers.snapshot import Snapshot, get_snapshot_fingerprint, is_same_files, read_snapshot, write_snapshot
+
+SNAPSHOT_PATH = os.path.join('data', '.figures.snapshot')
+
+
+class SharedFigures:
+    """
+    Callback outputs by figure cache key, decoded from the snapshot only when asked for
+    """
+    snapshot: Snapshot
+    rows_by_key: Dict[str, int]
+    filepaths: List[str]  # Exports the figures were rendered from
+    modified: Tuple[float, int]  # Modification time and size of the snapshot file when it was read
+
+    def __init__(self, snapshot: Snapshot, modified: Tuple[float, int]) -> None:
+        self.snapshot = snapshot
+        self.rows_by_key = {key: row for row, key in enumerate(snapshot['keys'].tolist())}
+        self.filepaths = snapshot['filepaths'].tolist()
+        self.modified = modified
+
+    @property
+    def stale(self) -> bool:
+        """
+        Whether any export was changed or removed since the figures were rendered
+        """
+        try:
+            return not is_same_files(self.snapshot.fingerprint, get_snapshot_fingerprint(self.filepaths))
+        except FileNotFoundError:
+            return True
+
+    def __len__(self) -> int:
+        return len(self.rows_by_key)
+
+    def get(self, key: str) -> Optional[Any]:
+        row = self.rows_by_key.get(key)
+        if row is None:
+            return None
+        return json.loads(self.snapshot['payloads'][row])
+
+
+shared_figures_by_path: Dict[str, SharedFigures] = {}
+lock = threading.Lock()
+
+
+def get_snapshot_path(data_root: str) -> str:
+    return os.path.join(data_root, SNAPSHOT_PATH)
+
+
+def get_shared_figures(data_root: str) -> Optional[SharedFigures]:
+    """
+    Figures the loader wrote for `data_root`, read again whenever the loader has replaced the snapshot, or None while
+    there are none or they are stale
+    """
+    path = get_snapshot_path(data_root)
+    try:
+        status = os.stat(path)
+    except OSError:
+        return None
+    modified = (status.st_mtime, status.st_size)
+    with lock:
+        shared_figures = shared_figures_by_path.get(path)
+        if shared_figures is None or shared_figures.modified != modified:
+            snapshot = read_snapshot(path)
+            if snapshot is None or 'filepaths' not in snapshot:
+                return None
+            shared_figures = SharedFigures(snapshot, modified=modified)
+            shared_figures_by_path[path] = shared_figures
+    return None if shared_figures.stale else shared_figures
+
+
+def get(data_root: str, key: str) -> Optional[Any]:
+    shared_figures = get_shared_figures(data_root)
+    return None if shared_figures is None else shared_figures.get(key)
+
+
+def write_shared_figures(data_root: str, filepaths: List[str], fingerprint: List[Any], outputs_by_key: Dict[str, Any]) -> None:
+    """
+    Saves the figures rendered from the exports at `filepaths`, whose fingerprint was taken before rendering them
+    """
+    from plotly.utils import PlotlyJSONEncoder
+
+    keys = list(outputs_by_key)
+    payloads = [json.dumps(outputs_by_key[key], cls=PlotlyJSONEncoder) for key in keys]
+    write_snapshot(get_snapshot_path(data_root), fingerprint, {'keys': keys, 'payloads': payloads, 'filepaths': filepaths})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Render every figure of the dashboard for its workers to share')
+    parser.add_argument('--data-root', help='Directory holding the data/ folder, the working directory by default')
+    args = parser.parse_args()
+    data_root = args.data_root or os.getcwd()
+
+    import visualization
+
+    start = time.time()
+    filepaths = visualization.get_export_filepaths(data_root)
+    fingerprint = get_snapshot_fingerprint(filepaths)
+    outputs_by_key = visualization.prerender(data_root)
+    write_shared_figures(data_root, filepaths, fingerprint, outputs_by_key)
+    print('{0} figures written to {1} in {2} seconds'.format(len(outputs_by_key), get_snapshot_path(data_root), round(time.time() - start, 2)))
+
+
+if __name__ == '__main__':
+    main()
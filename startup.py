@@ -0,0 +1,148 @@
+"""
+Keeps starting the dashboard (or any command line entry point) cheap, and measures it. Heavy libraries and the parser
+of each source are imported through lazy_import, so they are only paid for once something actually uses them, and
+every such import is timed along with the phases an entry point marks:
+
+    python3 startup.py                # Cold start report of the dashboard
+    python3 startup.py ingest         # Same for another entry point
+
+The report imports the entry point in a fresh process, so nothing is already loaded, and lists the slowest modules
+imported along the way. A running dashboard also serves its own report at /startup.
+"""
+
+import argparse
+import importlib
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+SLOWEST_MODULES = 15
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+class StartupReport:
+    """
+    Seconds since the process started importing this module at which each phase ended, and how long every lazy import
+    took when it finally happened
+    """
+    started: float
+    phases: List[Tuple[str, float]]
+    imports: List[Tuple[str, float]]
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.phases = []
+        self.imports = []
+        self.lock = threading.Lock()
+
+    def mark(self, phase: str) -> None:
+        with self.lock:
+            self.phases.append((phase, time.perf_counter() - self.started))
+
+    def record_import(self, name: str, seconds: float) -> None:
+        with self.lock:
+            self.imports.append((name, seconds))
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'phases': {phase: round(seconds, 3) for phase, seconds in self.phases},
+                'lazy_imports': {name: round(seconds, 3) for name, seconds in self.imports},
+                'modules_loaded': len(sys.modules),
+            }
+
+    def print(self) -> None:
+        stats = self.stats
+        previous = 0.0
+        for phase, seconds in stats['phases'].items():
+            print('{0:<40} {1:>7.3f} s  (+{2:.3f} s)'.format(phase, seconds, seconds - previous))
+            previous = seconds
+        for name, seconds in stats['lazy_imports'].items():
+            print('{0:<40} {1:>7.3f} s  on first use'.format('import ' + name, seconds))
+        print('{0} modules loaded'.format(stats['modules_loaded']))
+
+
+report = StartupReport()
+
+
+class LazyImport:
+    """
+    Stands in for a module, or for one of its attributes such as a parser class, and imports it the first time it is
+    called or one of its attributes is read
+    """
+
+    def __init__(self, module_name: str, attribute: Optional[str] = None) -> None:
+        self.module_name = module_name
+        self.attribute = attribute
+        self.value: Any = None
+
+    def load(self) -> Any:
+        if self.value is None:
+            start = time.perf_counter()
+            already_imported = self.module_name in sys.modules
+            module = importlib.import_module(self.module_name)
+            self.value = module if self.attribute is None else getattr(module, self.attribute)
+            if not already_imported:
+                report.record_import(self.module_name, time.perf_counter() - start)
+        return self.value
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.load(), name)
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self.load()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        return '<lazy {0}>'.format(self.module_name if self.attribute is None else '{0}.{1}'.format(self.module_name, self.attribute))
+
+
+def lazy_import(module_name: str, attribute: Optional[str] = None) -> Any:
+    return LazyImport(module_name, attribute=attribute)
+
+
+def get_slowest_imports(import_times: str, module: str, limit: int = SLOWEST_MODULES) -> List[Tuple[str, float]]:
+    """
+    Modules imported directly by `module` that take the longest to import (including what they import in turn), from
+    the output of python -X importtime, which lists every module after the modules it imports
+    """
+    imports: List[Tuple[str, float]] = []
+    for line in import_times.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if not match:
+            continue
+        depth = (len(match.group(3)) - 1) // 2
+        if depth == 0 and match.group(4) == module:
+            return sorted(imports, key=lambda item: item[1], reverse=True)[:limit]
+        if depth == 0:
+            imports = []
+        elif depth == 1:
+            imports.append((match.group(4), int(match.group(2)) / 1e6))
+    return []
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Measure how long an entry point takes to import from a cold start')
+    parser.add_argument('module', nargs='?', default='visualization')
+    args = parser.parse_args()
+
+    code = 'import sys, time; sys.path.insert(0, {0!r}); start = time.perf_counter(); import {1}; print(time.perf_counter() - start)'.format(
+        os.path.dirname(os.path.abspath(__file__)),
+        args.module,
+    )
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-W', 'ignore', '-c', code], capture_output=True, text=True)
+    if result.returncode != 0:
+        print(result.stderr)
+        sys.exit(result.returncode)
+
+    print('Importing {0} took {1:.3f} s'.format(args.module, float(result.stdout.strip().splitlines()[-1])))
+    for module, seconds in get_slowest_imports(result.stderr, module=args.module):
+        print('  {0:<38} {1:>7.3f} s'.format(module, seconds))
+
+
+if __name__ == '__main__':
+    main()
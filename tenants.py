@@ -0,0 +1,31 @@
+"""
+Serving several people's exports from one server. When YEAR_IN_REVIEW_TENANTS_ROOT is set, every tenant has their own
+directory under it, laid out like a single user's checkout (`<root>/<tenant>/data/spotify/MyData/...`), and the first
+segment of the page's path picks the tenant: `http://localhost:8050/alex/` shows Alex's exports. Without it, the
+exports under the working directory are shown whatever the path.
+"""
+
+import os
+import re
+from typing import Optional
+
+TENANTS_ROOT = os.environ.get('YEAR_IN_REVIEW_TENANTS_ROOT')
+TENANT_NAME = re.compile(r'^[A-Za-z0-9_-]+$')  # Also keeps paths like `..` from reaching outside the root
+
+
+def get_tenant(pathname: Optional[str]) -> Optional[str]:
+    segments = [segment for segment in (pathname or '').split('/') if segment]
+    return segments[0] if segments else None
+
+
+def get_data_root(pathname: Optional[str]) -> Optional[str]:
+    """
+    Directory holding the `data/` folder shown on the page at `pathname`, or None if it names no known tenant
+    """
+    if TENANTS_ROOT is None:
+        return os.getcwd()
+    tenant = get_tenant(pathname)
+    if tenant is None or not TENANT_NAME.match(tenant):
+        return None
+    data_root = os.path.join(TENANTS_ROOT, tenant)
+    return data_root if os.path.isdir(data_root) else None
@@ -0,0 +1,80 @@
+import gzip
+import json
+import zipfile
+from parsers import load_csv_columns
+from parsers.archives import find_file, get_file_stat, get_snapshot_location, list_files
+from parsers.spotify.streaming_history_parser import StreamingHistoryParser
+
+STREAMS = [
+    {'endTime': '2020-01-01 12:00', 'artistName': 'Artist', 'trackName': 'Track', 'msPlayed': 60000},
+    {'endTime': '2020-02-01 12:00', 'artistName': 'Other Artist', 'trackName': 'Track', 'msPlayed': 30000},
+]
+VIEWING_ACTIVITY = 'Profile Name,Start Time,Duration,Title\nProfile,2020-01-01 12:00:00,00:30:00,Show: Episode 1\n'
+
+
+def get_streams(data_root):
+    parser = StreamingHistoryParser(data_root=str(data_root), workers=1)
+    return [(stream.end_timestamp, stream.artist_name, stream.track_name, stream.duration_milliseconds) for stream in parser.load_streams()]
+
+
+def test_streams_are_read_from_a_zip_archive(tmp_path):
+    directory = tmp_path / 'folder' / 'data' / 'spotify' / 'MyData'
+    directory.mkdir(parents=True)
+    (directory / 'StreamingHistory0.json').write_text(json.dumps(STREAMS))
+    (tmp_path / 'archive' / 'data' / 'spotify').mkdir(parents=True)
+    with zipfile.ZipFile(str(tmp_path / 'archive' / 'data' / 'spotify' / 'my_spotify_data.zip'), 'w') as archive:
+        archive.writestr('MyData/StreamingHistory0.json', json.dumps(STREAMS))
+
+    assert get_streams(tmp_path / 'archive') == get_streams(tmp_path / 'folder')
+    assert sorted(path.name for path in (tmp_path / 'archive' / 'data' / 'spotify').iterdir()) == [
+        '.my_spotify_data.zip.streams.snapshot',
+        'my_spotify_data.zip',
+    ]
+
+
+def test_archive_members_are_listed_in_natural_order(tmp_path):
+    (tmp_path / 'data' / 'spotify').mkdir(parents=True)
+    archive_path = tmp_path / 'data' / 'spotify' / 'my_spotify_data.zip'
+    with zipfile.ZipFile(str(archive_path), 'w') as archive:
+        for number in [10, 2, 1]:
+            archive.writestr('MyData/StreamingHistory{0}.json'.format(number), '[]')
+        archive.writestr('MyData/Userdata.json', '{}')
+
+    filepaths = list_files(str(tmp_path), 'data/spotify/MyData', lambda filename: filename.startswith('StreamingHistory'))
+
+    assert filepaths == ['{0}/MyData/StreamingHistory{1}.json'.format(archive_path, number) for number in [1, 2, 10]]
+    assert get_snapshot_location(filepaths[0]) == (str(tmp_path / 'data' / 'spotify'), 'my_spotify_data.zip.')
+
+
+def test_file_is_found_in_an_archive_named_after_its_folder(tmp_path):
+    (tmp_path / 'data' / 'netflix').mkdir(parents=True)
+    archive_path = tmp_path / 'data' / 'netflix' / 'netflix-report.zip'
+    with zipfile.ZipFile(str(archive_path), 'w') as archive:
+        archive.writestr('Content_Interaction/ViewingActivity.csv', VIEWING_ACTIVITY)
+
+    filepath = find_file(str(tmp_path), 'data/netflix/netflix-report/Content_Interaction/ViewingActivity.csv')
+
+    assert filepath == '{0}/Content_Interaction/ViewingActivity.csv'.format(archive_path)
+    assert get_file_stat(filepath)[1] == len(VIEWING_ACTIVITY)
+    assert load_csv_columns(filepath, ['Title', 'Duration']) == {'Title': ['Show: Episode 1'], 'Duration': ['00:30:00']}
+
+
+def test_unzipped_folder_is_used_over_the_archive(tmp_path):
+    directory = tmp_path / 'data' / 'spotify' / 'MyData'
+    directory.mkdir(parents=True)
+    (directory / 'StreamingHistory0.json').write_text(json.dumps(STREAMS[:1]))
+    with zipfile.ZipFile(str(tmp_path / 'data' / 'spotify' / 'my_spotify_data.zip'), 'w') as archive:
+        archive.writestr('MyData/StreamingHistory0.json', json.dumps(STREAMS))
+
+    assert [stream[1] for stream in get_streams(tmp_path)] == ['Artist']
+
+
+def test_gzip_compressed_files_are_read(tmp_path):
+    directory = tmp_path / 'data' / 'spotify' / 'MyData'
+    directory.mkdir(parents=True)
+    text = json.dumps(STREAMS)
+    with gzip.open(str(directory / 'StreamingHistory0.json.gz'), 'wt', encoding='utf-8') as file:
+        file.write(text)
+
+    assert [stream[1:] for stream in get_streams(tmp_path)] == [('Artist', 'Track', 60000), ('Other Artist', 'Track', 30000)]
+    assert get_file_stat(str(directory / 'StreamingHistory0.json.gz'))[1] == len(text)
@@ -0,0 +1,88 @@
+import random
+from collections import Counter
+from parsers.sketches import HyperLogLog, SketchIndex, SpaceSaving
+
+CAPACITY = 20
+
+
+def get_weighted_keys(seed, count):
+    """
+    Keys with a long tail of rare ones, like artists in a streaming history
+    """
+    generator = random.Random(seed)
+    return [('key {0}'.format(int(generator.paretovariate(1.2))), generator.randint(1, 300000)) for _ in range(count)]
+
+
+def build_space_saving(weighted_keys):
+    sketch = SpaceSaving(capacity=CAPACITY)
+    for key, weight in weighted_keys:
+        sketch.add(key, weight)
+    return sketch
+
+
+def assert_within_bounds(sketch, weights):
+    total = sum(weights.values())
+    assert sketch.total == total
+    assert len(sketch.counts) <= CAPACITY
+    for hitter in sketch.top(CAPACITY):
+        assert hitter.lower_bound <= weights[hitter.key] <= hitter.count
+        assert hitter.count - weights[hitter.key] <= total / CAPACITY
+    for key, weight in weights.items():
+        if weight > total / CAPACITY:
+            assert key in sketch.counts
+
+
+def test_space_saving_is_exact_below_capacity():
+    sketch = build_space_saving([('a', 3), ('b', 5), ('a', 4)])
+
+    assert [(hitter.key, hitter.count, hitter.error) for hitter in sketch.top(2)] == [('a', 7, 0), ('b', 5, 0)]
+
+
+def test_merged_space_saving_keeps_error_bounds():
+    parts = [get_weighted_keys(seed, 5000) for seed in range(4)]
+    sketches = [build_space_saving(part) for part in parts]
+    for sketch, part in zip(sketches, parts):
+        weights = Counter()
+        for key, weight in part:
+            weights[key] += weight
+        assert_within_bounds(sketch, weights)
+
+    merged = sketches[0]
+    for sketch in sketches[1:]:
+        merged = merged.merge(sketch)
+
+    weights = Counter()
+    for key, weight in sum(parts, []):
+        weights[key] += weight
+    assert_within_bounds(merged, weights)
+    assert merged.top(1)[0].key == weights.most_common(1)[0][0]
+
+
+def test_merged_hyper_log_log_is_the_sketch_of_both_sets():
+    first, second, both = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    for value in range(20000):
+        first.add(value)
+        both.add(value)
+    for value in range(10000, 40000):
+        second.add(value)
+        both.add(value)
+
+    merged = first.merge(second)
+
+    assert merged.registers == both.registers
+    assert abs(merged.count() - 40000) <= 40000 * 0.05
+
+
+def test_sketch_index_merges_months_into_years():
+    first, second = SketchIndex(entities=['artist']), SketchIndex(entities=['artist'])
+    first.add(year=2020, month=1, keys={'artist': 'Artist'}, weight=10)
+    first.add(year=2020, month=2, keys={'artist': 'Other Artist'}, weight=4)
+    second.add(year=2020, month=2, keys={'artist': 'Artist'}, weight=5)
+    second.add(year=2021, month=1, keys={'artist': 'Artist'}, weight=100)
+
+    index = SketchIndex.merge_all([first, second], entities=['artist'])
+
+    assert index.years == [2020, 2021]
+    assert [(hitter.key, hitter.count) for hitter in index.get(year=2020).top('artist', 2)] == [('Artist', 15), ('Other Artist', 4)]
+    assert index.get(year=2020).total == 19
+    assert index.count_distinct_by_month('artist', year=2020)[:3] == [1, 2, 0]
@@ -0,0 +1,91 @@
+import numpy as np
+from parsers import snapshot
+from parsers.snapshot import StringTable, open_snapshot, read_snapshot
+
+
+def write_export(tmp_path, text):
+    filepath = tmp_path / 'export.json'
+    filepath.write_text(text)
+    return [str(filepath)]
+
+
+def open_counting_builds(tmp_path, filepaths, builds):
+    def build():
+        builds.append(filepaths)
+        return {'values': np.arange(len(builds), dtype=np.int64), 'names': ['a', 'ü', '']}
+    return open_snapshot(path=str(tmp_path / '.values.snapshot'), filepaths=filepaths, build=build)
+
+
+def test_snapshot_is_reused_while_files_are_unchanged(tmp_path):
+    filepaths = write_export(tmp_path, '[]')
+    builds = []
+
+    built = open_counting_builds(tmp_path, filepaths, builds)
+    reopened = open_counting_builds(tmp_path, filepaths, builds)
+
+    assert len(builds) == 1
+    assert reopened['values'].tolist() == built['values'].tolist() == [0]
+    assert isinstance(reopened['names'], StringTable)
+    assert list(reopened['names']) == ['a', 'ü', '']
+
+
+def test_stale_snapshot_is_rebuilt(tmp_path):
+    builds = []
+    open_counting_builds(tmp_path, write_export(tmp_path, '[]'), builds)
+
+    rebuilt = open_counting_builds(tmp_path, write_export(tmp_path, '[1, 2]'), builds)
+
+    assert len(builds) == 2
+    assert rebuilt['values'].tolist() == [0, 1]
+    assert read_snapshot(str(tmp_path / '.values.snapshot'))['values'].tolist() == [0, 1]
+
+
+def test_snapshot_of_another_version_is_rebuilt(tmp_path, monkeypatch):
+    filepaths = write_export(tmp_path, '[]')
+    builds = []
+    open_counting_builds(tmp_path, filepaths, builds)
+
+    monkeypatch.setattr(snapshot, 'VERSION', snapshot.VERSION + 1)
+    open_counting_builds(tmp_path, filepaths, builds)
+
+    assert len(builds) == 2
+
+
+def test_corrupt_snapshot_is_rebuilt(tmp_path):
+    filepaths = write_export(tmp_path, '[]')
+    path = tmp_path / '.values.snapshot'
+    for corrupt in [b'', b'not a snapshot', snapshot.MAGIC + (10 ** 6).to_bytes(8, 'little') + b'{"fingerprint"']:
+        path.write_bytes(corrupt)
+        builds = []
+
+        rebuilt = open_counting_builds(tmp_path, filepaths, builds)
+
+        assert len(builds) == 1
+        assert rebuilt['values'].tolist() == [0]
+        assert read_snapshot(str(path)) is not None
+
+
+def test_truncated_snapshot_is_rebuilt(tmp_path):
+    filepaths = write_export(tmp_path, '[]')
+    path = tmp_path / '.values.snapshot'
+    open_counting_builds(tmp_path, filepaths, [])
+    path.write_bytes(path.read_bytes()[:len(snapshot.MAGIC) + 20])
+    builds = []
+
+    rebuilt = open_counting_builds(tmp_path, filepaths, builds)
+
+    assert len(builds) == 1
+    assert list(rebuilt['names']) == ['a', 'ü', '']
+
+
+def test_columns_are_used_when_the_snapshot_cannot_be_written(tmp_path, monkeypatch):
+    filepaths = write_export(tmp_path, '[]')
+
+    def fail_to_write(*args, **kwargs):
+        raise OSError('Read-only file system')
+    monkeypatch.setattr(snapshot, 'write_snapshot', fail_to_write)
+    opened = open_counting_builds(tmp_path, filepaths, [])
+
+    assert opened['values'].tolist() == [0]
+    assert list(opened['names']) == ['a', 'ü', '']
+    assert not (tmp_path / '.values.snapshot').exists()
@@ -0,0 +1,58 @@
+import json
+from parsers.spotify.stream_columns import StreamColumns
+from parsers.spotify.streaming_history_parser import StreamingHistoryParser
+
+FIRST_STREAMS = [
+    {'endTime': '2020-01-01 12:00', 'artistName': 'Artist', 'trackName': 'Track', 'msPlayed': 60000},
+    {'endTime': '2020-02-01 12:00', 'artistName': 'Artist', 'trackName': 'Other Track', 'msPlayed': 30000},
+]
+SECOND_STREAMS = [
+    {'endTime': '2020-02-01 12:00', 'artistName': 'Artist', 'trackName': 'Other Track', 'msPlayed': 30000},
+    {'endTime': '2020-03-01 12:00', 'artistName': 'Other Artist', 'trackName': 'Track', 'msPlayed': 5000},
+]
+
+
+def write_streams(data_root, filename, streams) -> None:
+    directory = data_root / 'data' / 'spotify' / 'MyData'
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / filename).write_text(json.dumps(streams))
+
+
+def get_stream_keys(parser):
+    return [(stream.end_timestamp, stream.artist_name, stream.track_name, stream.duration_milliseconds) for stream in parser.load_streams()]
+
+
+def test_added_file_is_appended_without_duplicates(tmp_path, monkeypatch):
+    write_streams(tmp_path, 'StreamingHistory0.json', FIRST_STREAMS)
+    first_keys = get_stream_keys(StreamingHistoryParser(data_root=str(tmp_path), workers=1))
+
+    read_filepaths = []
+    from_file = StreamColumns.from_file
+    monkeypatch.setattr(StreamColumns, 'from_file', lambda filepath: read_filepaths.append(filepath) or from_file(filepath))
+    write_streams(tmp_path, 'StreamingHistory1.json', SECOND_STREAMS)
+    parser = StreamingHistoryParser(data_root=str(tmp_path), workers=1)
+    keys = get_stream_keys(parser)
+
+    assert [filepath.rsplit('/', 1)[-1] for filepath in read_filepaths] == ['StreamingHistory1.json']
+    assert keys[:2] == first_keys
+    assert [key[1:] for key in keys] == [
+        ('Artist', 'Track', 60000),
+        ('Artist', 'Other Track', 30000),
+        ('Other Artist', 'Track', 5000),
+    ]
+    assert parser.snapshot['file_row_ends'].tolist() == [2, 3]
+
+
+def test_appended_streams_match_a_fresh_build(tmp_path):
+    write_streams(tmp_path / 'incremental', 'StreamingHistory0.json', FIRST_STREAMS)
+    StreamingHistoryParser(data_root=str(tmp_path / 'incremental'), workers=1).load_streams()
+    write_streams(tmp_path / 'incremental', 'StreamingHistory1.json', SECOND_STREAMS)
+    write_streams(tmp_path / 'fresh', 'StreamingHistory0.json', FIRST_STREAMS)
+    write_streams(tmp_path / 'fresh', 'StreamingHistory1.json', SECOND_STREAMS)
+
+    incremental = StreamingHistoryParser(year=2020, data_root=str(tmp_path / 'incremental'), workers=1)
+    fresh = StreamingHistoryParser(year=2020, data_root=str(tmp_path / 'fresh'), workers=1)
+
+    assert get_stream_keys(incremental) == get_stream_keys(fresh)
+    assert incremental.get_stream_duration_by_month() == fresh.get_stream_duration_by_month()
+    assert [artist.name for artist in incremental.get_most_streamed_artists_by_duration()] == ['Artist', 'Other Artist']
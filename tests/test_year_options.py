@@ -0,0 +1,30 @@
+import json
+import visualization
+
+STREAMS = [
+    {'endTime': '2018-06-01 12:00', 'artistName': 'Artist', 'trackName': 'Track', 'msPlayed': 60000},
+    {'endTime': '2020-06-01 12:00', 'artistName': 'Artist', 'trackName': 'Track', 'msPlayed': 30000},
+]
+
+
+def write_spotify_export(data_root) -> None:
+    directory = data_root / 'data' / 'spotify' / 'MyData'
+    directory.mkdir(parents=True)
+    (directory / 'StreamingHistory0.json').write_text(json.dumps(STREAMS))
+
+
+def test_year_options_of_only_export(tmp_path, monkeypatch):
+    write_spotify_export(tmp_path)
+    monkeypatch.chdir(tmp_path)
+
+    assert visualization.update_year_options('Spotify-tab', '/') == [
+        {'label': year, 'value': year} for year in [2018, 2019, 2020]
+    ]
+
+
+def test_year_options_of_missing_exports(tmp_path, monkeypatch):
+    write_spotify_export(tmp_path)
+    monkeypatch.chdir(tmp_path)
+
+    for tab in ['YouTube-tab', 'Netflix-tab', 'Hinge-tab', 'Instagram-tab']:
+        assert visualization.update_year_options(tab, '/') == []
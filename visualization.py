@@ -1,32 +1,290 @@
+from startup import lazy_import, report as startup_report  # First, so the startup report covers every import below
 import dash
+import functools
+import json
+import os
 import dash_core_components as dcc
 import dash_html_components as html
-import plotly.express as px
-import pandas as pd
-import numpy as np
-from typing import List, Optional
-from dash.dependencies import Input, Output
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple, Type, Union
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from dash.exceptions import PreventUpdate
 from constants import WEEKDAYS, MONTHS
-from models.hinge.match import Match
-from parsers.youtube.views_parser import ViewsParser as YoutubeViewsParser
-from parsers.netflix.views_parser import ViewsParser as NetflixViewsParser
-from parsers.hinge.matches_parser import MatchesParser as HingeMatchesParser
-from parsers.instagram.connections_parser import ConnectionsParser as InstagramConnectionsParser
-from parsers.instagram.likes_parser import LikesParser as InstagramLikesParser
-from parsers.spotify.streaming_history_parser import StreamingHistoryParser as SpotifyStreamingHistoryParser
 from components.loading import loading
-from components.input import input
-
+from components.dropdown import dropdown
+from tenants import TENANTS_ROOT, get_data_root
+from warmup import WarmUp
+
+if TYPE_CHECKING:
+    from models.spotify.track import Track
+    from parsers import Parser
+
+# Charting libraries and each source's parser are only imported once a tab needs them
+px = lazy_import('plotly.express')
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+cache = lazy_import('parsers.cache')
+timestamps = lazy_import('models.timestamps')
+shared_figures = lazy_import('shared_figures')
+YoutubeViewsParser = lazy_import('parsers.youtube.views_parser', 'ViewsParser')
+NetflixViewsParser = lazy_import('parsers.netflix.views_parser', 'ViewsParser')
+HingeMatchesParser = lazy_import('parsers.hinge.matches_parser', 'MatchesParser')
+InstagramConnectionsParser = lazy_import('parsers.instagram.connections_parser', 'ConnectionsParser')
+InstagramLikesParser = lazy_import('parsers.instagram.likes_parser', 'LikesParser')
+StreamingHistoryParser = lazy_import('parsers.spotify.streaming_history_parser', 'StreamingHistoryParser')
+ColumnarStreamingHistoryParser = lazy_import('parsers.spotify.streaming_history_parser', 'ColumnarStreamingHistoryParser')
+
+startup_report.mark('imports')
 
 PRODUCTS = ['YouTube', 'Netflix', 'Hinge', 'Instagram', 'Spotify']
 
+SpotifyStreamingHistoryParser = ColumnarStreamingHistoryParser if os.environ.get('YEAR_IN_REVIEW_COLUMNAR') else StreamingHistoryParser
+USE_SKETCHES = bool(os.environ.get('YEAR_IN_REVIEW_SKETCHES'))  # Approximate top lists, for histories too large to group exactly
+PARSERS_BY_TAB = {
+    'YouTube-tab': [YoutubeViewsParser],
+    'Netflix-tab': [NetflixViewsParser],
+    'Hinge-tab': [HingeMatchesParser],
+    'Instagram-tab': [InstagramConnectionsParser, InstagramLikesParser],
+    'Spotify-tab': [SpotifyStreamingHistoryParser],
+}
+SHARED_FIGURES = bool(os.environ.get('YEAR_IN_REVIEW_SHARED_FIGURES'))  # Serve outputs prerendered by shared_figures.py
+CLIENTSIDE = bool(os.environ.get('YEAR_IN_REVIEW_CLIENTSIDE'))  # Switch years in the browser, see figure_callback
+WARM_UP = os.environ.get('YEAR_IN_REVIEW_WARM_UP', '1') != '0'  # Load every source in the background at start
+warm_up = WarmUp({product: PARSERS_BY_TAB['{0}-tab'.format(product)] for product in PRODUCTS})
+
+
+def get_page_data_root(pathname: Optional[str]) -> str:
+    """
+    Data root of the tenant whose page is open, leaving the outputs as they are when there is no such tenant
+    """
+    data_root = get_data_root(pathname)
+    if data_root is None:
+        raise PreventUpdate
+    return data_root
+
+
+@dataclass
+class CachedCallback:
+    """
+    A callback whose outputs are cached, with what is needed to render all of them ahead of time
+    """
+    callback: Callable
+    get_parser_classes: Callable[..., List[Type['Parser']]]  # Parsers whose exports the outputs for some inputs read
+    get_inputs: Callable[[str], List[Tuple]]  # Every input the page can send, given the data root
+
+    def get_key(self, args: Tuple, data_root: str) -> str:
+        fingerprint = [get_export_fingerprint(parser_class, data_root) for parser_class in self.get_parser_classes(*args)]
+        return json.dumps([self.callback.__name__, args, data_root, fingerprint, str(timestamps.get_timezone())])
+
+    def render(self, args: Tuple, data_root: str) -> Any:
+        """
+        Outputs with every chart as the series it is drawn from (see bar_chart)
+        """
+        return self.callback(*args, data_root=data_root)
+
+    def get_charts(self, args: Tuple, data_root: str) -> Any:
+        """
+        Outputs with every chart as its series, for the browser to draw
+        """
+        key = self.get_key(args, data_root)
+        return cache.figure_cache.get(('charts', key), lambda: self.get_shared(key, args, data_root), group=data_root)
+
+    def get(self, args: Tuple, data_root: str) -> Any:
+        """
+        Outputs with every chart drawn as a figure
+        """
+        key = self.get_key(args, data_root)
+        return cache.figure_cache.get(key, lambda: draw_outputs(self.get_shared(key, args, data_root)), group=data_root)
+
+    def get_shared(self, key: str, args: Tuple, data_root: str) -> Any:
+        """
+        Outputs the loader process rendered when shared figures are on, rendering them here otherwise
+        """
+        if SHARED_FIGURES:
+            outputs = shared_figures.get(data_root, key)
+            if outputs is not None:
+                return outputs
+        return self.render(args, data_root)
+
+
+cached_callbacks: List[CachedCallback] = []
+
+
+def get_export_fingerprint(parser_class: Type['Parser'], data_root: str) -> Optional[Tuple]:
+    """
+    Fingerprint of the files `parser_class` reads, or None while there is no such export
+    """
+    try:
+        return cache.get_fingerprint(parser_class(data_root=data_root).filepaths)
+    except FileNotFoundError:
+        return None
+
+
+def get_export_years(parser_class: Type['Parser'], data_root: str) -> List[int]:
+    """
+    Years in the export `parser_class` reads, none while there is no such export
+    """
+    try:
+        return parser_class(data_root=data_root).years
+    except FileNotFoundError:
+        return []
+
+
+def get_export_filepaths(data_root: str) -> List[str]:
+    """
+    Every export file the page reads, for the apps that have one
+    """
+    filepaths = []
+    for parser_classes in PARSERS_BY_TAB.values():
+        for parser_class in parser_classes:
+            try:
+                filepaths += parser_class(data_root=data_root).filepaths
+            except FileNotFoundError:
+                continue
+    return filepaths
+
+
+def get_year_inputs(parser_classes: List[Type['Parser']], data_root: str) -> List[Tuple]:
+    return [(None,)] + [(option['value'],) for option in get_year_options(parser_classes, data_root)]
+
+
+def get_year_options(parser_classes: List[Type['Parser']], data_root: str) -> List[Dict[str, int]]:
+    years = [year for parser_class in parser_classes for year in get_export_years(parser_class, data_root)]
+    if not years:
+        return []
+    return [{'label': year, 'value': year} for year in range(min(years), max(years) + 1)]
+
+
+def cache_figures(
+    *parser_classes: Type['Parser'],
+    get_parser_classes: Optional[Callable[..., List[Type['Parser']]]] = None,
+    get_inputs: Optional[Callable[[str], List[Tuple]]] = None,
+) -> Callable[[Callable], Callable]:
+    """
+    Serves a callback's outputs from the figure cache for inputs it has already rendered, as long as the exports read
+    by `parser_classes` (or by `get_parser_classes(*inputs)`) are unchanged on disk and the display timezone is the same.
+    With shared figures on, outputs prerendered by the loader process are served first. The callback's last input is
+    the page's path, which is turned into the `data_root` the callback is called with. `get_inputs` lists every input
+    for prerendering, every year in the data by default.
+    """
+    def decorator(callback: Callable) -> Callable:
+        cached = CachedCallback(
+            callback=callback,
+            get_parser_classes=get_parser_classes or (lambda *args: list(parser_classes)),
+            get_inputs=get_inputs or (lambda data_root: get_year_inputs(list(parser_classes), data_root)),
+        )
+        cached_callbacks.append(cached)
+
+        @functools.wraps(callback)
+        def cached_callback(*args):
+            *args, pathname = args
+            return cached.get(tuple(args), get_page_data_root(pathname))
+        return cached_callback
+    return decorator
+
+
+def prerender(data_root: str) -> Dict[str, Any]:
+    """
+    Outputs of every cached callback for every input the page can send, by figure cache key, with charts as their
+    series. Callbacks of apps without an export are left out.
+    """
+    outputs = {}
+    for cached in cached_callbacks:
+        try:
+            for args in cached.get_inputs(data_root):
+                outputs[cached.get_key(args, data_root)] = cached.render(args, data_root)
+        except FileNotFoundError:
+            continue
+    return outputs
+
+
+def get_bundle_id(product: str) -> str:
+    return '{0}-bundle'.format(product)
+
+
+def get_bundle_key(args: Tuple) -> str:
+    """
+    Same as JSON.stringify(args) in the browser
+    """
+    return json.dumps(list(args), separators=(',', ':'), ensure_ascii=False)
+
+
+def get_bundle_version(cached: CachedCallback, pathname: Optional[str], data_root: str) -> str:
+    """
+    Tells apart the bundles of different pages and of different versions of the exports they show
+    """
+    fingerprint = [get_export_fingerprint(parser_class, data_root) for parser_class in cached.get_parser_classes()]
+    return json.dumps([pathname, fingerprint, str(timestamps.get_timezone())])
+
+
+def bar_chart(
+    columns: Dict[str, List[Any]],
+    x: str,
+    y: str,
+    color: Optional[str] = None,
+    categories: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    A bar chart as the series it is drawn from: px.bar of the `columns`, with the x axis in the order of `categories`.
+    It is drawn by draw_chart on the server, or by the same code in assets/clientside.js in the browser.
+    """
+    return {'chart': 'bar', 'columns': columns, 'x': x, 'y': y, 'color': color, 'categories': categories}
+
+
+def sunburst_chart(columns: Dict[str, List[Any]], path: List[str], values: str) -> Dict[str, Any]:
+    """
+    A sunburst chart as the series it is drawn from: px.sunburst of the `columns`
+    """
+    return {'chart': 'sunburst', 'columns': columns, 'path': path, 'values': values}
+
+
+def is_chart(output: Any) -> bool:
+    return isinstance(output, dict) and 'chart' in output
+
+
+def draw_chart(chart: Dict[str, Any]):
+    if chart['chart'] == 'sunburst':
+        return px.sunburst(pd.DataFrame(chart['columns']), path=chart['path'], values=chart['values'])
+    figure = px.bar(pd.DataFrame(chart['columns']), x=chart['x'], y=chart['y'], color=chart['color'])
+    if chart['categories'] is not None:
+        figure.update_layout({
+            'xaxis': {
+                'categoryorder': 'array',
+                'categoryarray': chart['categories'],
+            }
+        })
+    return figure
+
+
+def draw_outputs(outputs: Any) -> Any:
+    """
+    Outputs of a callback with every chart drawn as a figure. Outputs read back from shared figures are lists rather
+    than tuples.
+    """
+    if isinstance(outputs, (tuple, list)):
+        return type(outputs)(draw_chart(output) if is_chart(output) else output for output in outputs)
+    return draw_chart(outputs) if is_chart(outputs) else outputs
+
+
+def get_chart_template() -> Dict[str, Any]:
+    """
+    The plotly template every figure is drawn with, sent to the browser once per bundle rather than with every figure
+    """
+    import plotly.io as pio
+    from plotly.utils import PlotlyJSONEncoder
+
+    return json.loads(json.dumps(pio.templates[pio.templates.default], cls=PlotlyJSONEncoder))
+
+
 app = dash.Dash(__name__, suppress_callback_exceptions=True)
+server = app.server  # For WSGI servers, for example `gunicorn -w 4 visualization:server`
 app.layout = html.Div(className='page', children=[
+    dcc.Location(id='url'),
     html.Div(className='year-dropdown-wrapper', children=[
         dcc.Dropdown(
             className='year-dropdown',
             id='year-dropdown',
-            options=[{'label': year, 'value': year} for year in range(2016,2021)],
+            options=[],
             placeholder='Select Year...',
             value=2020,
         ),
@@ -38,16 +296,77 @@ app.layout = html.Div(className='page', children=[
         children=[dcc.Tab(label=product, value='{0}-tab'.format(product)) for product in PRODUCTS]
     ),
     html.Div(id='tabs-content'),
+    *[dcc.Store(id=get_bundle_id(product)) for product in PRODUCTS if CLIENTSIDE],
 ])
 
+
+def figure_callback(product: str, *dependencies: Union[Output, Input]) -> Callable[[Callable], Callable]:
+    """
+    Registers a callback of cache_figures that draws `product`'s charts from the year dropdown, its first input. In
+    clientside mode the server instead sends the outputs for every input at once, with charts as the series they are
+    drawn from, when the product's tab is opened. The browser picks the outputs for the selected inputs from this
+    bundle and draws their charts. The bundle is sent again when the tab is opened on another page, or after the
+    exports changed.
+    """
+    def decorator(cached_callback: Callable) -> Callable:
+        if not CLIENTSIDE:
+            return app.callback(*dependencies)(cached_callback)
+        cached = next(cached for cached in cached_callbacks if cached.callback is cached_callback.__wrapped__)
+        bundle_id = get_bundle_id(product)
+        app.clientside_callback(
+            ClientsideFunction(namespace='bundles', function_name='select'),
+            *dependencies,
+            Input(bundle_id, 'data'),
+        )
+
+        @app.callback(
+            Output(bundle_id, 'data'),
+            Input('tabs', 'value'),
+            Input('url', 'pathname'),
+            State('year-dropdown', 'value'),
+            State(bundle_id, 'data'),
+        )
+        def update_bundle(tab: str, pathname: Optional[str], year: Optional[int], bundle: Optional[Dict[str, Any]]):
+            if tab != '{0}-tab'.format(product):
+                raise PreventUpdate
+            data_root = get_page_data_root(pathname)
+            version = get_bundle_version(cached, pathname, data_root)
+            if bundle is not None and bundle.get('version') == version:
+                raise PreventUpdate
+            inputs = cached.get_inputs(data_root)
+            if year not in {args[0] for args in inputs}:  # The dropdown starts on a year that may not be in the data
+                inputs += [(year,) + args[1:] for args in inputs if args[0] is None]
+            return {
+                'version': version,
+                'pathname': pathname,
+                'template': get_chart_template(),
+                'outputs': {get_bundle_key(args): cached.get_charts(args, data_root) for args in inputs},
+            }
+
+        return cached_callback
+    return decorator
+
+
+@app.callback(
+    Output('year-dropdown', 'options'),
+    Input('tabs', 'value'),
+    Input('url', 'pathname'),
+)
+@cache_figures(get_parser_classes=lambda tab: PARSERS_BY_TAB[tab], get_inputs=lambda data_root: [(tab,) for tab in PARSERS_BY_TAB])
+def update_year_options(tab, data_root: str):
+    return get_year_options(PARSERS_BY_TAB[tab], data_root)
+
 @app.callback(
     Output('tabs-content', 'children'),
-    Input('tabs', 'value')
+    Input('tabs', 'value'),
+    Input('url', 'pathname'),
 )
-def render(tab):
+@cache_figures(get_parser_classes=lambda tab: PARSERS_BY_TAB[tab], get_inputs=lambda data_root: [(tab,) for tab in PARSERS_BY_TAB])
+def render(tab, data_root: str):
     if tab == 'Netflix-tab':
+        profiles = get_netflix_profiles(data_root)
         return html.Div(className='tab-content', children=[
-            input(id='Netflix-profile-input', placeholder='Profile'),
+            dropdown(id='Netflix-profile-input', placeholder='Profile', options=profiles),
             html.H1(id='Netflix-total-hours'),
             html.Div(className='tab-content-list', children=[
                 html.H2(children='Most Watched TV Shows', className='list-title'),
@@ -153,14 +472,32 @@ def render(tab):
 
 
 
+def get_netflix_profiles(data_root: str) -> List[str]:
+    """
+    Profiles in the Netflix export, none if there is no export so the tab still shows
+    """
+    try:
+        return NetflixViewsParser(data_root=data_root).profiles
+    except FileNotFoundError:
+        return []
+
+
 ############### YOUTUBE ###############
 
-@app.callback(
+@figure_callback(
+    'YouTube',
     Output('YouTube-weekday-bar-chart', 'figure'),
-    Input('year-dropdown', 'value')
+    Output('YouTube-month-bar-chart', 'figure'),
+    Input('year-dropdown', 'value'),
+    Input('url', 'pathname'),
 )
-def update_youtube_weekday(year: Optional[int]):
-    parser = YoutubeViewsParser(year=year)
+@cache_figures(YoutubeViewsParser)
+def update_youtube(year: Optional[int], data_root: str):
+    parser = YoutubeViewsParser(year=year, data_root=data_root)
+    return update_youtube_weekday(parser), update_youtube_month(parser)
+
+def update_youtube_weekday(parser: YoutubeViewsParser):
+    year = parser.year
     views_by_weekday = parser.get_views_by_weekday()
     types: List[str] = []
     weekdays: List[str] = []
@@ -171,28 +508,17 @@ def update_youtube_weekday(year: Optional[int]):
         weekdays.append(WEEKDAYS[i])
         view_counts.append(round(len(views) / num_days_in_year, 2))
 
-    figure = px.bar(
-        pd.DataFrame({
+    return bar_chart(
+        columns={
             'Day': weekdays,
             'Views (Average)': view_counts,
-        }),
+        },
         x='Day',
         y='Views (Average)',
+        categories=WEEKDAYS,
     )
-    figure.update_layout({
-        'xaxis':{
-            'categoryorder': 'array',
-            'categoryarray': WEEKDAYS
-        }
-    })
-    return figure
 
-@app.callback(
-    Output('YouTube-month-bar-chart', 'figure'),
-    Input('year-dropdown', 'value')
-)
-def update_youtube_month(year: Optional[int]):
-    parser = YoutubeViewsParser(year=year)
+def update_youtube_month(parser: YoutubeViewsParser):
     channels_by_month = parser.get_channels_by_month()
     channel_names: List[str] = []
     months: List[str] = []
@@ -203,35 +529,49 @@ def update_youtube_month(year: Optional[int]):
         view_counts += [len(channel.views) for channel in channels]
         months += [MONTHS[i]] * len(channels)
 
-    figure = px.bar(
-        pd.DataFrame({
+    return bar_chart(
+        columns={
             'Month': months,
             'Views (Total)': view_counts,
             'Channel': channel_names,
-        }),
+        },
         x='Month',
         y='Views (Total)',
         color='Channel',
+        categories=MONTHS,
     )
-    figure.update_layout({
-        'xaxis':{
-            'categoryorder': 'array',
-            'categoryarray': MONTHS
-        }
-    })
-    return figure
 
 
 
 ############### NETFLIX ###############
 
-@app.callback(
+@figure_callback(
+    'Netflix',
     Output('Netflix-total-hours', 'children'),
+    Output('Netflix-top-tv-shows', 'children'),
+    Output('Netflix-weekday-bar-chart', 'figure'),
+    Output('Netflix-month-bar-chart', 'figure'),
     Input('year-dropdown', 'value'),
     Input('Netflix-profile-input', 'value'),
+    Input('url', 'pathname'),
 )
-def update_netflix_total_hours(year: Optional[int], profile: Optional[str]):
-    netflix_views_parser = NetflixViewsParser(year=year, profile=profile)
+@cache_figures(NetflixViewsParser, get_inputs=lambda data_root: [
+    (year, profile)
+    for (year,) in get_year_inputs([NetflixViewsParser], data_root)
+    for profile in [None] + get_netflix_profiles(data_root)
+])
+def update_netflix(year: Optional[int], profile: Optional[str], data_root: str):
+    netflix_views_parser = NetflixViewsParser(year=year, profile=profile, data_root=data_root)
+    return (
+        update_netflix_total_hours(netflix_views_parser),
+        update_netflix_top_tv_shows(netflix_views_parser),
+        update_netflix_weekday(netflix_views_parser),
+        update_netflix_month(netflix_views_parser),
+    )
+
+def update_netflix_total_hours(netflix_views_parser: NetflixViewsParser):
+    year = netflix_views_parser.year
+    profile = netflix_views_parser.profile
     seconds = netflix_views_parser.get_view_duration_seconds()
     hours = round(seconds / 60 / 60, 2)
     if year:
@@ -240,13 +580,13 @@ def update_netflix_total_hours(year: Optional[int], profile: Optional[str]):
     name = profile or 'You'
     return '{0} watched a total of {1} hours'.format(name, hours)
 
-@app.callback(
-    Output('Netflix-top-tv-shows', 'children'),
-    Input('year-dropdown', 'value'),
-    Input('Netflix-profile-input', 'value'),
-)
-def update_netflix_top_tv_shows(year: Optional[int], profile: Optional[str]):
-    netflix_views_parser = NetflixViewsParser(year=year, profile=profile)
+def update_netflix_top_tv_shows(netflix_views_parser: NetflixViewsParser):
+    if USE_SKETCHES:
+        return [
+            html.Li(
+                children='{0}: ~{1} hours'.format(show.key, round(show.count / 60 / 60, 2))
+            ) for show in netflix_views_parser.get_most_viewed_shows_by_duration_seconds_estimate(limit=10)
+        ]
     shows = netflix_views_parser.get_most_viewed_shows_by_duration_seconds()[:10]
     return [
         html.Li(
@@ -254,13 +594,8 @@ def update_netflix_top_tv_shows(year: Optional[int], profile: Optional[str]):
         ) for show in shows
     ]
 
-@app.callback(
-    Output('Netflix-weekday-bar-chart', 'figure'),
-    Input('year-dropdown', 'value'),
-    Input('Netflix-profile-input', 'value'),
-)
-def update_netflix_weekday(year: Optional[int], profile: Optional[str]):
-    netflix_views_parser = NetflixViewsParser(year=year, profile=profile)
+def update_netflix_weekday(netflix_views_parser: NetflixViewsParser):
+    year = netflix_views_parser.year
     views_by_weekday = netflix_views_parser.get_views_by_weekday()
     types: List[str] = []
     weekdays: List[str] = []
@@ -269,7 +604,7 @@ def update_netflix_weekday(year: Optional[int], profile: Optional[str]):
         views = views_by_weekday[i]
         show_views = [view for view in views if bool(view.show_title)]
         movie_views = [view for view in views if not bool(view.show_title)]
-        num_days_in_year = np.busday_count(str(year - 1), str(year), weekmask=WEEKDAYS[i][:3])
+        num_days_in_year = np.busday_count(str(year - 1), str(year), weekmask=WEEKDAYS[i][:3]) if year else 52
 
         types.append('Show')
         weekdays.append(WEEKDAYS[i])
@@ -281,31 +616,19 @@ def update_netflix_weekday(year: Optional[int], profile: Optional[str]):
         total_hours = round(sum([view.duration_seconds / 60 / 60 for view in movie_views]), 2)
         duration_hours.append(round(total_hours / num_days_in_year, 2))
 
-    figure = px.bar(
-        pd.DataFrame({
+    return bar_chart(
+        columns={
             'Day': weekdays,
             'Hours (Average)': duration_hours,
             'Type': types
-        }),
+        },
         x='Day',
         y='Hours (Average)',
         color='Type',
+        categories=WEEKDAYS,
     )
-    figure.update_layout({
-        'xaxis':{
-            'categoryorder': 'array',
-            'categoryarray': WEEKDAYS
-        }
-    })
-    return figure
 
-@app.callback(
-    Output('Netflix-month-bar-chart', 'figure'),
-    Input('year-dropdown', 'value'),
-    Input('Netflix-profile-input', 'value'),
-)
-def update_netflix_month(year: Optional[int], profile: Optional[str]):
-    netflix_views_parser = NetflixViewsParser(year=year, profile=profile)
+def update_netflix_month(netflix_views_parser: NetflixViewsParser):
     shows_by_month = netflix_views_parser.get_shows_by_month()
     show_titles: List[str] = []
     months: List[str] = []
@@ -316,243 +639,208 @@ def update_netflix_month(year: Optional[int], profile: Optional[str]):
         duration_hours += [round(show.duration_seconds / 60 / 60, 0) for show in shows]
         months += [MONTHS[i]] * len(shows)
 
-    figure = px.bar(
-        pd.DataFrame({
+    return bar_chart(
+        columns={
             'Month': months,
             'Hours (Total)': duration_hours,
             'Shows': show_titles,
-        }),
+        },
         x='Month',
         y='Hours (Total)',
         color='Shows',
+        categories=MONTHS,
     )
-    figure.update_layout({
-        'xaxis':{
-            'categoryorder': 'array',
-            'categoryarray': MONTHS
-        }
-    })
-    return figure
 
 
 
 ############### HINGE ###############
 
-@app.callback(
+HINGE_MATCH_TYPES = [
+    ('like_accepted', 'Likes sent that were accepted'),
+    ('user_accepted', 'Likes received that you accepted'),
+    ('like_rejected', 'Likes sent that were not accepted'),
+    ('user_rejected', 'Rejections given'),
+]
+
+@figure_callback(
+    'Hinge',
     Output('Hinge-matches-weekday-bar-chart', 'figure'),
-    Input('year-dropdown', 'value')
+    Output('Hinge-matches-month-bar-chart', 'figure'),
+    Output('Hinge-messages-weekday-bar-chart', 'figure'),
+    Output('Hinge-messages-month-bar-chart', 'figure'),
+    Input('year-dropdown', 'value'),
+    Input('url', 'pathname'),
 )
-def update_hinge_matches_weekday(year: Optional[int]):
-    parser = HingeMatchesParser(year=year)
-    matches_by_weekday = parser.get_matches_by_weekday()
+@cache_figures(HingeMatchesParser)
+def update_hinge(year: Optional[int], data_root: str):
+    parser = HingeMatchesParser(year=year, data_root=data_root)
+    return (
+        update_hinge_matches_weekday(parser),
+        update_hinge_matches_month(parser),
+        update_hinge_messages_weekday(parser),
+        update_hinge_messages_month(parser),
+    )
+
+def update_hinge_matches_weekday(parser: HingeMatchesParser):
+    counts_by_outcome = parser.get_match_counts_by_weekday()
     types: List[str] = []
     weekdays: List[str] = []
     match_counts: List[int] = []
 
     for i in range(7):
-        matches = matches_by_weekday[i]
-        like_accepted_matches = [match for match in matches if match.like_accepted]
-        user_accepted_matches = [match for match in matches if match.user_accepted]
-        like_rejected_matches = [match for match in matches if match.like_rejected]
-        user_rejected_matches = [match for match in matches if match.user_rejected]
-
-        types.append('Likes sent that were accepted')
-        weekdays.append(WEEKDAYS[i])
-        match_counts.append(len(like_accepted_matches))
+        for outcome, type in HINGE_MATCH_TYPES:
+            types.append(type)
+            weekdays.append(WEEKDAYS[i])
+            match_counts.append(counts_by_outcome[outcome][i])
 
-        types.append('Likes received that you accepted')
-        weekdays.append(WEEKDAYS[i])
-        match_counts.append(len(user_accepted_matches))
-
-        types.append('Likes sent that were not accepted')
-        weekdays.append(WEEKDAYS[i])
-        match_counts.append(len(like_rejected_matches))
-
-        types.append('Rejections given')
-        weekdays.append(WEEKDAYS[i])
-        match_counts.append(len(user_rejected_matches))
-
-    figure = px.bar(
-        pd.DataFrame({
+    return bar_chart(
+        columns={
             'Weekday': weekdays,
             'Matches': match_counts,
             'Type': types,
-        }),
+        },
         x='Weekday',
         y='Matches',
-        color='Type'
+        color='Type',
+        categories=WEEKDAYS,
     )
-    figure.update_layout({
-        'xaxis':{
-            'categoryorder': 'array',
-            'categoryarray': WEEKDAYS
-        }
-    })
-    return figure
 
-@app.callback(
-    Output('Hinge-matches-month-bar-chart', 'figure'),
-    Input('year-dropdown', 'value')
-)
-def update_hinge_matches_month(year: Optional[int]):
-    parser = HingeMatchesParser(year=year)
-    matches_by_month = parser.get_matches_by_month()
+def update_hinge_matches_month(parser: HingeMatchesParser):
+    counts_by_outcome = parser.get_match_counts_by_month()
     types: List[str] = []
     months: List[str] = []
     match_counts: List[int] = []
 
     for i in range(12):
-        matches = matches_by_month[i]
-        like_accepted_matches = [match for match in matches if match.like_accepted]
-        user_accepted_matches = [match for match in matches if match.user_accepted]
-        like_rejected_matches = [match for match in matches if match.like_rejected]
-        user_rejected_matches = [match for match in matches if match.user_rejected]
-
-        types.append('Likes sent that were accepted')
-        months.append(MONTHS[i])
-        match_counts.append(len(like_accepted_matches))
-
-        types.append('Likes received that you accepted')
-        months.append(MONTHS[i])
-        match_counts.append(len(user_accepted_matches))
-
-        types.append('Likes sent that were not accepted')
-        months.append(MONTHS[i])
-        match_counts.append(len(like_rejected_matches))
-
-        types.append('Rejections given')
-        months.append(MONTHS[i])
-        match_counts.append(len(user_rejected_matches))
-
-    figure = px.bar(
-        pd.DataFrame({
+        for outcome, type in HINGE_MATCH_TYPES:
+            types.append(type)
+            months.append(MONTHS[i])
+            match_counts.append(counts_by_outcome[outcome][i])
+
+    return bar_chart(
+        columns={
             'Month': months,
             'Matches': match_counts,
             'Type': types,
-        }),
+        },
         x='Month',
         y='Matches',
-        color='Type'
+        color='Type',
+        categories=MONTHS,
     )
-    figure.update_layout({
-        'xaxis':{
-            'categoryorder': 'array',
-            'categoryarray': MONTHS
-        }
-    })
-    return figure
 
 
-@app.callback(
-    Output('Hinge-messages-weekday-bar-chart', 'figure'),
-    Input('year-dropdown', 'value')
-)
-def update_hinge_messages_weekday(year: Optional[int]):
-    parser = HingeMatchesParser(year=year)
-    chats_by_weekday = parser.get_chats_by_weekday()
-    figure = px.bar(
-        pd.DataFrame({
+def update_hinge_messages_weekday(parser: HingeMatchesParser):
+    return bar_chart(
+        columns={
             'Weekday': WEEKDAYS,
-            'Messages Sent (Total)': [len(chats) for chats in chats_by_weekday],
-        }),
+            'Messages Sent (Total)': parser.get_chat_counts_by_weekday(),
+        },
         x='Weekday',
         y='Messages Sent (Total)',
+        categories=WEEKDAYS,
     )
-    figure.update_layout({
-        'xaxis':{
-            'categoryorder': 'array',
-            'categoryarray': WEEKDAYS
-        }
-    })
-    return figure
 
-@app.callback(
-    Output('Hinge-messages-month-bar-chart', 'figure'),
-    Input('year-dropdown', 'value')
-)
-def update_hinge_messages_month(year: Optional[int]):
-    parser = HingeMatchesParser(year=year)
-    chats_by_month = parser.get_chats_by_month()
-    figure = px.bar(
-        pd.DataFrame({
+def update_hinge_messages_month(parser: HingeMatchesParser):
+    return bar_chart(
+        columns={
             'Month': MONTHS,
-            'Messages Sent (Total)': [len(chats) for chats in chats_by_month],
-        }),
+            'Messages Sent (Total)': parser.get_chat_counts_by_month(),
+        },
         x='Month',
         y='Messages Sent (Total)',
+        categories=MONTHS,
     )
-    figure.update_layout({
-        'xaxis':{
-            'categoryorder': 'array',
-            'categoryarray': MONTHS
-        }
-    })
-    return figure
 
 
 
 ############### INSTAGRAM ###############
 
-@app.callback(
+@figure_callback(
+    'Instagram',
     Output('Instagram-connections-month-bar-chart', 'figure'),
-    Input('year-dropdown', 'value')
+    Output('Instagram-likes-month-bar-chart', 'figure'),
+    Input('year-dropdown', 'value'),
+    Input('url', 'pathname'),
 )
-def update_instagram_connections_month(year: Optional[int]):
-    parser = InstagramConnectionsParser(year=year)
+@cache_figures(InstagramConnectionsParser, InstagramLikesParser)
+def update_instagram(year: Optional[int], data_root: str):
+    return (
+        update_instagram_connections_month(InstagramConnectionsParser(year=year, data_root=data_root)),
+        update_instagram_likes_month(InstagramLikesParser(year=year, data_root=data_root)),
+    )
+
+def update_instagram_connections_month(parser: InstagramConnectionsParser):
     followers_by_month = parser.get_followers_by_month()
     following_by_month = parser.get_following_by_month()
 
-    figure = px.bar(
-        pd.DataFrame({
+    return bar_chart(
+        columns={
             'Month': MONTHS*2,
             'Connections': [len(followers) for followers in followers_by_month] + [len(following) for following in following_by_month],
             'Type': ['Followers']*12 + ['Following']*12
-        }),
+        },
         x='Month',
         y='Connections',
-        color='Type'
+        color='Type',
+        categories=MONTHS,
     )
-    figure.update_layout({
-        'xaxis':{
-            'categoryorder': 'array',
-            'categoryarray': MONTHS
-        }
-    })
-    return figure
 
-@app.callback(
-    Output('Instagram-likes-month-bar-chart', 'figure'),
-    Input('year-dropdown', 'value'),
-)
-def update_instagram_likes_month(year: Optional[int]):
-    parser = InstagramLikesParser(year=year)
+def update_instagram_likes_month(parser: InstagramLikesParser):
     likes_by_month = parser.get_likes_by_month()
-    figure = px.bar(
-        pd.DataFrame({
+    return bar_chart(
+        columns={
             'Month': MONTHS,
             'Likes': [len(likes) for likes in likes_by_month],
-        }),
+        },
         x='Month',
         y='Likes',
+        categories=MONTHS,
     )
-    figure.update_layout({
-        'xaxis':{
-            'categoryorder': 'array',
-            'categoryarray': MONTHS
-        }
-    })
-    return figure
 
 
 
 ############### SPOTIFY ###############
 
-@app.callback(
+@figure_callback(
+    'Spotify',
     Output('Spotify-top-artists', 'children'),
+    Output('Spotify-top-tracks', 'children'),
+    Output('Spotify-streaming-weekday-bar-chart', 'figure'),
+    Output('Spotify-streaming-month-bar-chart', 'figure'),
+    Output('Spotify-artists-month-bar-chart', 'figure'),
+    Output('Spotify-tracks-month-bar-chart', 'figure'),
+    Output('Spotify-artists-month-sunburst', 'figure'),
     Input('year-dropdown', 'value'),
+    Input('url', 'pathname'),
 )
-def update_spotify_top_artists(year: Optional[int]):
-    streaming_history_parser = SpotifyStreamingHistoryParser(year=year)
+@cache_figures(SpotifyStreamingHistoryParser)
+def update_spotify(year: Optional[int], data_root: str):
+    """
+    Every list and chart of the tab shares one parser, so streams are only grouped once per year
+    """
+    streaming_history_parser = SpotifyStreamingHistoryParser(year=year, data_root=data_root)
+    tracks_by_month = streaming_history_parser.get_tracks_by_month(min_threshold_stream_duration_seconds=30*60)  # Exlude tracks listened less than 30 minutes
+    return (
+        update_spotify_top_artists(streaming_history_parser),
+        update_spotify_top_tracks(streaming_history_parser),
+        update_spotify_streaming_weekday(streaming_history_parser),
+        update_spotify_streaming_month(streaming_history_parser),
+        update_spotify_artists_month(streaming_history_parser),
+        update_spotify_tracks_month(tracks_by_month),
+        update_spotify_artists_month_sunburst([
+            [track for track in tracks if track.streamed_duration_seconds >= 60*60]  # Exlude tracks listened less than an hour
+            for tracks in tracks_by_month
+        ]),
+    )
+
+def update_spotify_top_artists(streaming_history_parser: StreamingHistoryParser):
+    if USE_SKETCHES:
+        return [
+            html.Li(
+                children='{0}: ~{1} hours'.format(artist.key, round(artist.count / 1000 / 60 / 60, 1))
+            ) for artist in streaming_history_parser.get_most_streamed_artists_by_duration_estimate(limit=10)
+        ]
     artists = streaming_history_parser.get_most_streamed_artists_by_duration()[:10]
     return [
         html.Li(
@@ -560,12 +848,13 @@ def update_spotify_top_artists(year: Optional[int]):
         ) for artist in artists
     ]
 
-@app.callback(
-    Output('Spotify-top-tracks', 'children'),
-    Input('year-dropdown', 'value'),
-)
-def update_spotify_top_tracks(year: Optional[int]):
-    streaming_history_parser = SpotifyStreamingHistoryParser(year=year)
+def update_spotify_top_tracks(streaming_history_parser: StreamingHistoryParser):
+    if USE_SKETCHES:
+        return [
+            html.Li(
+                children='{0}: ~{1} hours'.format(track.key[1], round(track.count / 1000 / 60 / 60, 1))
+            ) for track in streaming_history_parser.get_most_streamed_tracks_by_duration_estimate(limit=10)
+        ]
     tracks = streaming_history_parser.get_most_streamed_tracks_by_duration()[:10]
     return [
         html.Li(
@@ -573,58 +862,31 @@ def update_spotify_top_tracks(year: Optional[int]):
         ) for track in tracks
     ]
 
-@app.callback(
-    Output('Spotify-streaming-weekday-bar-chart', 'figure'),
-    Input('year-dropdown', 'value'),
-)
-def update_spotify_streaming_weekday(year: Optional[int]):
-    streaming_history_parser = SpotifyStreamingHistoryParser(year=year)
+def update_spotify_streaming_weekday(streaming_history_parser: StreamingHistoryParser):
     stream_duration_by_weekday = streaming_history_parser.get_stream_duration_by_weekday()
-    figure = px.bar(
-        pd.DataFrame({
+    return bar_chart(
+        columns={
             'Weekday': WEEKDAYS,
             'Duration (Hours)': [round(stream_duration / 60 / 60, 0) for stream_duration in stream_duration_by_weekday],
-        }),
+        },
         x='Weekday',
         y='Duration (Hours)',
+        categories=WEEKDAYS,
     )
-    figure.update_layout({
-        'xaxis':{
-            'categoryorder': 'array',
-            'categoryarray': WEEKDAYS
-        }
-    })
-    return figure
 
-@app.callback(
-    Output('Spotify-streaming-month-bar-chart', 'figure'),
-    Input('year-dropdown', 'value'),
-)
-def update_spotify_streaming_month(year: Optional[int]):
-    streaming_history_parser = SpotifyStreamingHistoryParser(year=year)
+def update_spotify_streaming_month(streaming_history_parser: StreamingHistoryParser):
     stream_duration_by_month = streaming_history_parser.get_stream_duration_by_month()
-    figure = px.bar(
-        pd.DataFrame({
+    return bar_chart(
+        columns={
             'Month': MONTHS,
             'Duration (Hours)': [round(stream_duration / 60 / 60, 0) for stream_duration in stream_duration_by_month],
-        }),
+        },
         x='Month',
         y='Duration (Hours)',
+        categories=MONTHS,
     )
-    figure.update_layout({
-        'xaxis':{
-            'categoryorder': 'array',
-            'categoryarray': MONTHS
-        }
-    })
-    return figure
 
-@app.callback(
-    Output('Spotify-artists-month-bar-chart', 'figure'),
-    Input('year-dropdown', 'value'),
-)
-def update_spotify_artists_month(year: Optional[int]):
-    streaming_history_parser = SpotifyStreamingHistoryParser(year=year)
+def update_spotify_artists_month(streaming_history_parser: StreamingHistoryParser):
     artists_by_month = streaming_history_parser.get_artists_by_month(min_threshold_stream_duration_seconds=60*60)  # Exclude artists listened less than an hour
     artist_names: List[str] = []
     months: List[str] = []
@@ -635,31 +897,19 @@ def update_spotify_artists_month(year: Optional[int]):
         duration_hours += [round(artist.streamed_duration_seconds / 60 / 60, 1) for artist in artists]
         months += [MONTHS[i]] * len(artists)
 
-    figure = px.bar(
-        pd.DataFrame({
+    return bar_chart(
+        columns={
             'Month': months,
             'Hours (Total)': duration_hours,
             'Artists': artist_names,
-        }),
+        },
         x='Month',
         y='Hours (Total)',
         color='Artists',
+        categories=MONTHS,
     )
-    figure.update_layout({
-        'xaxis':{
-            'categoryorder': 'array',
-            'categoryarray': MONTHS
-        }
-    })
-    return figure
 
-@app.callback(
-    Output('Spotify-tracks-month-bar-chart', 'figure'),
-    Input('year-dropdown', 'value'),
-)
-def update_spotify_tracks_month(year: Optional[int]):
-    streaming_history_parser = SpotifyStreamingHistoryParser(year=year)
-    tracks_by_month = streaming_history_parser.get_tracks_by_month(min_threshold_stream_duration_seconds=30*60)  # Exlude tracks listened less than 30 minutes
+def update_spotify_tracks_month(tracks_by_month: List[List['Track']]):
     track_names: List[str] = []
     months: List[str] = []
     duration_hours: List[int] = []
@@ -669,32 +919,20 @@ def update_spotify_tracks_month(year: Optional[int]):
         duration_hours += [round(track.streamed_duration_seconds / 60 / 60, 1) for track in tracks]
         months += [MONTHS[i]] * len(tracks)
 
-    figure = px.bar(
-        pd.DataFrame({
+    return bar_chart(
+        columns={
             'Month': months,
             'Hours (Total)': duration_hours,
             'Track': [track_name[:25] for track_name in track_names],
-        }),
+        },
         x='Month',
         y='Hours (Total)',
         color='Track',
+        categories=MONTHS,
     )
-    figure.update_layout({
-        'xaxis':{
-            'categoryorder': 'array',
-            'categoryarray': MONTHS
-        }
-    })
-    return figure
 
 
-@app.callback(
-    Output('Spotify-artists-month-sunburst', 'figure'),
-    Input('year-dropdown', 'value'),
-)
-def update_spotify_artists_month_sunburst(year: Optional[int]):
-    streaming_history_parser = SpotifyStreamingHistoryParser(year=year)
-    tracks_by_month = streaming_history_parser.get_tracks_by_month(min_threshold_stream_duration_seconds=60*60)  # Exlude tracks listened less than an hour
+def update_spotify_artists_month_sunburst(tracks_by_month: List[List['Track']]):
     track_names: List[str] = []
     artist_names: List[str] = []
     months: List[str] = []
@@ -706,17 +944,16 @@ def update_spotify_artists_month_sunburst(year: Optional[int]):
         duration_hours += [round(track.streamed_duration_seconds / 60 / 60, 1) for track in tracks]
         months += [MONTHS[i]] * len(tracks)
 
-    figure = px.sunburst(
-        pd.DataFrame({
+    return sunburst_chart(
+        columns={
             'Month': months,
             'Hours (Total)': duration_hours,
             'Artist': artist_names,
             'Track': [track_name[:25] for track_name in track_names],
-        }),
+        },
         path=['Month', 'Artist', 'Track'],
         values='Hours (Total)',
     )
-    return figure
 
 
 @app.callback(
@@ -730,5 +967,40 @@ def update_spotify_artists_month_gantt(year: Optional[int]):
     pass
 
 
+@app.server.before_request
+def start_warm_up():
+    """
+    Starts the warm-up in the process serving requests on its first one, which is each worker under a WSGI server,
+    where the block below never runs
+    """
+    if WARM_UP and TENANTS_ROOT is None:
+        warm_up.start()
+
+
+@app.server.route('/figure-cache')
+def figure_cache_stats():
+    return cache.figure_cache.stats
+
+
+@app.server.route('/dataset-cache')
+def dataset_cache_stats():
+    return cache.dataset_cache.stats
+
+
+@app.server.route('/startup')
+def startup_stats():
+    return startup_report.stats
+
+
+@app.server.route('/warm-up')
+def warm_up_stats():
+    return warm_up.stats
+
+
+startup_report.mark('app')
+
 if __name__ == '__main__':
+    startup_report.print()
+    if WARM_UP and TENANTS_ROOT is None and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':  # In debug mode the server runs in a reloader's child process
+        warm_up.start()
     app.run_server(debug=True, host='0.0.0.0')
@@ -0,0 +1,78 @@
+"""
+Loads every source in the background as soon as the dashboard starts (or, under a WSGI server, as soon as each worker
+gets its first request), so the first visit to a tab finds its data already parsed and aggregated instead of building
+it behind a loading spinner. Sources load concurrently, one thread each. A callback that needs data still being loaded
+waits for that load (see DatasetCache.get) rather than starting the same work again.
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+WAITING = 'waiting'
+LOADING = 'loading'
+READY = 'ready'
+MISSING = 'missing'  # No export found for this source
+FAILED = 'failed'
+
+
+class WarmUp:
+    """
+    Background loads of every source, by name. `parser_classes_by_source` lists the parsers each source's charts read.
+    """
+    parser_classes_by_source: Dict[str, List[Callable[[], Any]]]
+    states_by_source: Dict[str, str]
+    seconds_by_source: Dict[str, float]
+    futures_by_source: Dict[str, 'Future[None]']
+
+    def __init__(self, parser_classes_by_source: Dict[str, List[Callable[[], Any]]]) -> None:
+        self.parser_classes_by_source = parser_classes_by_source
+        self.states_by_source = {source: WAITING for source in parser_classes_by_source}
+        self.seconds_by_source = {}
+        self.futures_by_source = {}
+        self.lock = threading.Lock()
+
+    def start(self) -> None:
+        if self.futures_by_source:  # Already started, checked first without the lock as this runs before every request
+            return
+        with self.lock:
+            if self.futures_by_source:
+                return
+            executor = ThreadPoolExecutor(max_workers=max(len(self.parser_classes_by_source), 1), thread_name_prefix='warm-up')
+            for source, parser_classes in self.parser_classes_by_source.items():
+                self.futures_by_source[source] = executor.submit(self.load, source, parser_classes)
+            executor.shutdown(wait=False)
+
+    def load(self, source: str, parser_classes: List[Callable[[], Any]]) -> None:
+        self.states_by_source[source] = LOADING
+        start = time.perf_counter()
+        try:
+            for parser_class in parser_classes:
+                parser_class().warm_up()
+            state = READY
+        except FileNotFoundError:
+            state = MISSING
+        except Exception as error:
+            print('Could not warm up {0}: {1!r}'.format(source, error))
+            state = FAILED
+        self.seconds_by_source[source] = time.perf_counter() - start
+        self.states_by_source[source] = state
+        if state == READY:
+            print('{0} ready in {1} seconds'.format(source, round(self.seconds_by_source[source], 2)))
+
+    def wait(self, source: str, timeout: Optional[float] = None) -> str:
+        """
+        Blocks until `source` has finished loading (if the warm-up was started) and returns its state
+        """
+        future = self.futures_by_source.get(source)
+        if future is not None:
+            future.result(timeout=timeout)
+        return self.states_by_source[source]
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            source: {'state': state, 'seconds': round(self.seconds_by_source[source], 3) if source in self.seconds_by_source else None}
+            for source, state in self.states_by_source.items()
+        }